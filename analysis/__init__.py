@@ -2,30 +2,86 @@
 Performance attribution and contribution analysis functions.
 """
 
-from .brinson_fachler import brinson_fachler, brinson_fachler_instrument
-from .brinson_hood_beebower import brinson_hood_beebower, brinson_hood_beebower_instrument
-from .contribution import contribution, contribution_instrument
-from .effects_analysis import effects_analysis, effects_analysis_instrument
+from .brinson_fachler import (
+    brinson_fachler,
+    brinson_fachler_instrument,
+    brinson_fachler_vectorized,
+    brinson_fachler_instrument_vectorized,
+    brinson_fachler_instrument_all_segments
+)
+from .brinson_hood_beebower import (
+    brinson_hood_beebower,
+    brinson_hood_beebower_instrument,
+    brinson_hood_beebower_vectorized,
+    brinson_hood_beebower_instrument_vectorized,
+    brinson_hood_beebower_instrument_all_segments
+)
+from .contribution import contribution, contribution_instrument, contribution_instrument_all_segments
+from .effects_analysis import (
+    effects_analysis,
+    effects_analysis_instrument,
+    effects_analysis_vectorized,
+    effects_analysis_instrument_vectorized,
+    effects_analysis_instrument_all_segments
+)
 from .data_preparation import prepare_data
+from .date_index import DatePartitionedFrame
+from .portfolio_arrays import PortfolioArrays
+from .streaming import ChunkedCsvInput
+from .classification_table import ClassificationTable
+from .attribution_cube import AttributionCube, build_attribution_cube
 from .grap_smoothing import grap_smoothing
-from .modified_frongello_smoothing import modified_frongello_smoothing
+from .modified_frongello_smoothing import modified_frongello_smoothing, modified_frongello_smoothing_vectorized
+from .closed_form_smoothing import carino_smoothing, menchero_smoothing
 from .contribution_smoothing import contribution_smoothing
-from .measurement_analytics import calculate_measurement_analytics, measurement_analytics_master, measurement_analytics_instrument
+from .linked_attribution import LinkedAttributionAccumulator
+from .period_query import PeriodQueryEngine, period_end_dates
+from .measurement_analytics import (
+    calculate_measurement_analytics,
+    measurement_analytics_master,
+    measurement_analytics_instrument,
+    rolling_risk_analytics
+)
+from .risk_analytics import rolling_risk_metrics
 
 __all__ = [
     'brinson_fachler',
     'brinson_fachler_instrument',
+    'brinson_fachler_vectorized',
+    'brinson_fachler_instrument_vectorized',
+    'brinson_fachler_instrument_all_segments',
     'brinson_hood_beebower',
     'brinson_hood_beebower_instrument',
+    'brinson_hood_beebower_vectorized',
+    'brinson_hood_beebower_instrument_vectorized',
+    'brinson_hood_beebower_instrument_all_segments',
     'contribution',
     'contribution_instrument',
+    'contribution_instrument_all_segments',
     'effects_analysis',
     'effects_analysis_instrument',
+    'effects_analysis_vectorized',
+    'effects_analysis_instrument_vectorized',
+    'effects_analysis_instrument_all_segments',
     'prepare_data',
+    'DatePartitionedFrame',
+    'PortfolioArrays',
+    'ChunkedCsvInput',
+    'ClassificationTable',
+    'AttributionCube',
+    'build_attribution_cube',
     'grap_smoothing',
     'modified_frongello_smoothing',
+    'modified_frongello_smoothing_vectorized',
+    'carino_smoothing',
+    'menchero_smoothing',
     'contribution_smoothing',
+    'LinkedAttributionAccumulator',
+    'PeriodQueryEngine',
+    'period_end_dates',
     'calculate_measurement_analytics',
     'measurement_analytics_master',
     'measurement_analytics_instrument',
+    'rolling_risk_analytics',
+    'rolling_risk_metrics',
 ]
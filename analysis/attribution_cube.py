@@ -0,0 +1,240 @@
+import threading
+import numpy as np
+import pandas as pd
+from .data_preparation import prepare_data
+
+
+# Per-date totals computed by prepare_data, they are stored once per date in the cube
+TOTAL_COLUMNS = ["TotalPreviousMv_portfolio",
+                 "TotalPreviousMv_benchmark",
+                 "TotalDeltaMv_portfolio",
+                 "TotalDeltaMv_benchmark",
+                 "TotalReturn_portfolio",
+                 "TotalReturn_benchmark"]
+
+
+class AttributionCube:
+    """
+    Prepared attribution data for one (portfolios, benchmark, date range) selection.
+
+    The instrument rows of prepare_data are held as integer date codes, categorical codes for every
+    descriptive column (instrument, taxonomy and classifications) and contiguous float arrays for the
+    market values. Per-date totals are stored once per date. Models reduce the cube per date and segment
+    with code-based sums, so switching the classification criterion or the model does not require
+    preparing the data again.
+
+    Codes use the smallest integer dtype that fits. Measured on the sample data (one to two portfolios,
+    16 dates), the prepare_data DataFrame takes about 1,290 bytes per instrument-period with
+    memory_usage(deep=True), mostly Python strings, against about 205 bytes for the cube: 160 for the
+    20 float64 market value columns, 40 for the 15 categorical columns (codes and categories), 2 for the
+    date codes and less than 1 for the per-date totals (see memory_usage).
+    """
+
+    def __init__(self, merged_df):
+        self.columns = merged_df.columns.tolist()
+        self.n_rows = len(merged_df)
+
+        # Dates are coded in sorted order, which is the order used by groupby on "Start Date"
+        date_codes, self.dates = pd.factorize(merged_df["Start Date"], sort=True)
+        self.date_codes = date_codes.astype(code_dtype(len(self.dates)))
+
+        # Categorical codes for every descriptive column, -1 marks a missing value
+        self.segments = {}
+        for column in self.columns:
+            if column == "Start Date" or column in TOTAL_COLUMNS or pd.api.types.is_float_dtype(merged_df[column]):
+                continue
+            codes, categories = pd.factorize(merged_df[column], sort=True)
+            self.segments[column] = (codes.astype(code_dtype(len(categories))), categories)
+
+        self.values = {
+            column: np.ascontiguousarray(merged_df[column].to_numpy(dtype=float))
+            for column in self.columns
+            if column not in self.segments and column != "Start Date" and column not in TOTAL_COLUMNS
+        }
+
+        # Keep the first value of each total per date
+        first_rows = np.unique(self.date_codes, return_index=True)[1]
+        self.totals = {
+            column: merged_df[column].to_numpy(dtype=float)[first_rows]
+            for column in TOTAL_COLUMNS
+        }
+
+        # Per-criteria segment sums, filled on demand by segment_sums under the lock: cubes are cached and
+        # shared by the sessions and the worker threads of a run
+        self._segment_sums = {}
+        self._segment_sums_lock = threading.Lock()
+
+    def segment_sums(self, classification_criteria):
+        """
+        Sums of every market value column per (date, segment) of a classification criteria.
+
+        The reduction is done once per criteria with code-based segmented sums and cached, later
+        aggregations on the same criteria only select columns.
+        """
+        sums = self._segment_sums.get(classification_criteria)
+        if sums is not None:
+            return sums
+
+        with self._segment_sums_lock:
+            if classification_criteria not in self._segment_sums:
+                self._segment_sums[classification_criteria] = self._reduce_segments(classification_criteria)
+        return self._segment_sums[classification_criteria]
+
+    def _reduce_segments(self, classification_criteria):
+        codes, categories = self.segments[classification_criteria]
+        n_categories = len(categories)
+
+        # Rows without a classification value are dropped, as groupby does
+        classified = codes >= 0
+        keys = self.date_codes[classified].astype(np.int64) * n_categories + codes[classified]
+        n_keys = len(self.dates) * n_categories
+
+        present_keys = np.flatnonzero(np.bincount(keys, minlength=n_keys))
+        date_index, segment_index = np.divmod(present_keys, n_categories)
+        sums = {
+            column: np.bincount(keys, weights=values[classified], minlength=n_keys)[present_keys]
+            for column, values in self.values.items()
+        }
+        return date_index, segment_index, sums
+
+    def precompute_segment_sums(self, criteria_list):
+        """
+        Reduce the instrument rows for every classification criteria of the list in one pass.
+        """
+        for classification_criteria in criteria_list:
+            self.segment_sums(classification_criteria)
+
+    def aggregate(self, classification_criteria, sum_columns, first_columns=()):
+        """
+        Equivalent of data_df.groupby(["Start Date", classification_criteria]).agg(...).reset_index()
+        where sum_columns are summed and first_columns are per-date totals.
+        """
+        date_index, segment_index, sums = self.segment_sums(classification_criteria)
+        categories = self.segments[classification_criteria][1]
+
+        aggregated = {
+            "Start Date": self.dates.take(date_index),
+            classification_criteria: categories.take(segment_index)
+        }
+        for column in sum_columns:
+            aggregated[column] = sums[column]
+        for column in first_columns:
+            aggregated[column] = self.totals[column][date_index]
+
+        return pd.DataFrame(aggregated)
+
+    def segment_rows(self, classification_criteria, classification_value):
+        """
+        Instrument rows of one classification value, as data_df[data_df[classification_criteria] == classification_value].
+        """
+        codes, categories = self.segments[classification_criteria]
+        segment_code = categories.get_indexer([classification_value])[0]
+        rows = np.flatnonzero(codes == segment_code) if segment_code >= 0 else np.array([], dtype=np.int64)
+        return self._frame(rows)
+
+    def classified_rows(self, classification_criteria):
+        """
+        Instrument rows with a value for the classification, as data_df[data_df[classification_criteria].notna()].
+        """
+        return self._frame(np.flatnonzero(self.segments[classification_criteria][0] >= 0))
+
+    def date_returns(self):
+        """
+        Total portfolio and benchmark returns, one row per date in date order.
+        """
+        return pd.DataFrame({
+            "Start Date": self.dates,
+            "TotalReturn_portfolio": self.totals["TotalReturn_portfolio"],
+            "TotalReturn_benchmark": self.totals["TotalReturn_benchmark"]
+        })
+
+    def memory_usage(self):
+        """
+        Bytes held by the cube, per component (dates, segment codes and categories, values and totals).
+        """
+        return {
+            "dates": self.date_codes.nbytes + self.dates.memory_usage(deep=True),
+            "segments": sum(codes.nbytes + categories.memory_usage(deep=True)
+                            for codes, categories in self.segments.values()),
+            "values": sum(values.nbytes for values in self.values.values()),
+            "totals": sum(totals.nbytes for totals in self.totals.values())
+        }
+
+    def to_frame(self):
+        """
+        Rebuild the DataFrame returned by prepare_data.
+        """
+        return self._frame(np.arange(self.n_rows))
+
+    def _frame(self, rows):
+        date_codes = self.date_codes[rows]
+        frame = {}
+        for column in self.columns:
+            if column == "Start Date":
+                frame[column] = self.dates.take(date_codes)
+            elif column in self.segments:
+                codes, categories = self.segments[column]
+                frame[column] = categories.take(codes[rows], allow_fill=True, fill_value=np.nan)
+            elif column in TOTAL_COLUMNS:
+                frame[column] = self.totals[column][date_codes]
+            else:
+                frame[column] = self.values[column][rows]
+
+        return pd.DataFrame(frame, index=rows)
+
+
+def code_dtype(n_categories):
+    """
+    Smallest signed integer dtype holding the codes of n_categories values and the -1 missing code.
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def build_attribution_cube(ptf_list, bm, ptf_df, bm_df, classifications_df, start_date, end_date):
+    merged_df = prepare_data(ptf_list, bm, ptf_df, bm_df, classifications_df, start_date, end_date)
+    return AttributionCube(merged_df)
+
+
+def aggregate_by_segment(data, classification_criteria, sum_columns, first_columns):
+    # Sum all values across the instruments, from a prepared cube or from the prepare_data DataFrame
+    if isinstance(data, AttributionCube):
+        return data.aggregate(classification_criteria, sum_columns, first_columns)
+
+    aggregations = {column: "sum" for column in sum_columns}
+    aggregations.update({column: "first" for column in first_columns})
+    return data.groupby(["Start Date", classification_criteria]).agg(aggregations).reset_index()
+
+
+def select_segment(data, classification_criteria, classification_value):
+    # Filter on the value of the classification
+    if isinstance(data, AttributionCube):
+        return data.segment_rows(classification_criteria, classification_value)
+
+    return data[data[classification_criteria] == classification_value]
+
+
+def classified_rows(data, classification_criteria):
+    # Rows with a value for the classification, in row order
+    if isinstance(data, AttributionCube):
+        return data.classified_rows(classification_criteria)
+
+    return data[data[classification_criteria].notna()]
+
+
+def split_by_segment(df, segment_values):
+    # Split the rows of df by classification value, each part keeps the row order of df
+    return {
+        classification_value: segment_df.reset_index(drop=True)
+        for classification_value, segment_df in df.groupby(np.asarray(segment_values), sort=False)
+    }
+
+
+def date_returns(data):
+    # Total returns per date, sorted by date
+    if isinstance(data, AttributionCube):
+        return data.date_returns()
+
+    return data[["Start Date", "TotalReturn_portfolio", "TotalReturn_benchmark"]].drop_duplicates(subset=["Start Date"]).sort_values("Start Date").reset_index(drop=True)
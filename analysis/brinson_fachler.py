@@ -1,3 +1,7 @@
+import numpy as np
+from .attribution_cube import aggregate_by_segment, classified_rows, select_segment, split_by_segment
+
+
 def compute_allocation(delta_mv_ptf,
                        previous_mv_ptf,
                        total_previous_mv_ptf,
@@ -56,6 +60,7 @@ def compute_selection_by_instrument(delta_mv_ptf,
 
 
 def brinson_fachler(data_df, classification_criteria):
+    # Row-wise reference of brinson_fachler_vectorized: the app runs the vectorized functions, this one is the oracle of the tests
     # Sum all values across the instruments
     attribution_df = data_df.groupby(["Start Date", classification_criteria]).agg({
         "DeltaMv_portfolio": "sum",
@@ -108,6 +113,7 @@ def brinson_fachler(data_df, classification_criteria):
 
 
 def brinson_fachler_instrument(data_df, classification_criteria, classification_value):
+    # Row-wise reference of brinson_fachler_instrument_vectorized, kept as the oracle of the tests
     # Filter on the value of the classification
     data_df = data_df[data_df[classification_criteria] == classification_value]
 
@@ -147,4 +153,151 @@ def brinson_fachler_instrument(data_df, classification_criteria, classification_
 
     instruments_df = instruments_df[selection_columns]
 
-    return instruments_df
\ No newline at end of file
+    return instruments_df
+
+
+def compute_allocation_array(delta_mv_ptf,
+                             previous_mv_ptf,
+                             total_previous_mv_ptf,
+                             delta_mv_bm,
+                             previous_mv_bm,
+                             total_previous_mv_bm,
+                             total_return_bm
+                             ):
+    # Both branches are evaluated over the whole arrays, the benchmark weight mask picks the result per row
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight_ptf = previous_mv_ptf / total_previous_mv_ptf
+        weight_bm = previous_mv_bm / total_previous_mv_bm
+        return_bm = delta_mv_bm / previous_mv_bm
+
+        # Standard Brinson-Fachler formula
+        allocation_effect = (weight_ptf - weight_bm) * (return_bm - total_return_bm)
+
+        # Exception case: contribution_i - w_i * B
+        exception_effect = delta_mv_ptf / total_previous_mv_ptf - weight_ptf * total_return_bm
+
+    return np.where(previous_mv_bm != 0, allocation_effect, exception_effect)
+
+
+def compute_selection_array(delta_mv_ptf,
+                            previous_mv_ptf,
+                            total_previous_mv_ptf,
+                            delta_mv_bm,
+                            previous_mv_bm,
+                            ):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight_ptf = previous_mv_ptf / total_previous_mv_ptf
+        return_ptf = delta_mv_ptf / previous_mv_ptf
+        return_bm = delta_mv_bm / previous_mv_bm
+
+        # Standard Brinson-Fachler formula
+        selection_effect = weight_ptf * (return_ptf - return_bm)
+
+    # Exception case: selection is zero
+    return np.where((previous_mv_ptf != 0) & (previous_mv_bm != 0), selection_effect, 0.0)
+
+
+def compute_selection_by_instrument_array(delta_mv_ptf,
+                                          previous_mv_ptf,
+                                          total_previous_mv_ptf,
+                                          delta_mv_classif_benchmark,
+                                          previous_mv_classif_benchmark
+                                          ):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight_ptf = previous_mv_ptf / total_previous_mv_ptf
+        return_ptf = delta_mv_ptf / previous_mv_ptf
+        return_classif_bm = delta_mv_classif_benchmark / previous_mv_classif_benchmark
+        selection = weight_ptf * (return_ptf - return_classif_bm)
+
+    return np.where((previous_mv_ptf != 0) & (previous_mv_classif_benchmark != 0), selection, 0.0)
+
+
+def brinson_fachler_vectorized(data_df, classification_criteria):
+    # Sum all values across the instruments, data_df can be the prepare_data DataFrame or an AttributionCube
+    attribution_df = aggregate_by_segment(
+        data_df,
+        classification_criteria,
+        ["DeltaMv_portfolio", "PreviousMv_portfolio", "DeltaMv_benchmark", "PreviousMv_benchmark"],
+        ["TotalPreviousMv_portfolio", "TotalReturn_portfolio", "TotalPreviousMv_benchmark", "TotalReturn_benchmark"]
+    )
+
+    delta_mv_ptf = attribution_df["DeltaMv_portfolio"].to_numpy(dtype=float)
+    previous_mv_ptf = attribution_df["PreviousMv_portfolio"].to_numpy(dtype=float)
+    total_previous_mv_ptf = attribution_df["TotalPreviousMv_portfolio"].to_numpy(dtype=float)
+    delta_mv_bm = attribution_df["DeltaMv_benchmark"].to_numpy(dtype=float)
+    previous_mv_bm = attribution_df["PreviousMv_benchmark"].to_numpy(dtype=float)
+    total_previous_mv_bm = attribution_df["TotalPreviousMv_benchmark"].to_numpy(dtype=float)
+    total_return_bm = attribution_df["TotalReturn_benchmark"].to_numpy(dtype=float)
+
+    # Compute allocation and selection effects for all dates and segments at once
+    allocation = compute_allocation_array(delta_mv_ptf,
+                                          previous_mv_ptf,
+                                          total_previous_mv_ptf,
+                                          delta_mv_bm,
+                                          previous_mv_bm,
+                                          total_previous_mv_bm,
+                                          total_return_bm)
+    selection = compute_selection_array(delta_mv_ptf,
+                                        previous_mv_ptf,
+                                        total_previous_mv_ptf,
+                                        delta_mv_bm,
+                                        previous_mv_bm)
+
+    attribution_df["Allocation"] = allocation
+    attribution_df["Selection"] = selection
+    attribution_df["Excess return"] = allocation + selection
+
+    attribution_columns = ["Start Date",
+                           classification_criteria,
+                           "Excess return",
+                           "Allocation",
+                           "Selection",
+                           "TotalReturn_portfolio",
+                           "TotalReturn_benchmark"
+                           ]
+    attribution_df = attribution_df[attribution_columns]
+
+    return attribution_df
+
+
+def brinson_fachler_instrument_vectorized(data_df, classification_criteria, classification_value):
+    # Filter on the value of the classification
+    data_df = select_segment(data_df, classification_criteria, classification_value)
+
+    return _brinson_fachler_instruments(data_df, ["Start Date"])
+
+
+def brinson_fachler_instrument_all_segments(data_df, classification_criteria):
+    # Instrument selection of every classification value in one grouped pass, split by classification value
+    data_df = classified_rows(data_df, classification_criteria)
+    instruments_df = _brinson_fachler_instruments(data_df, [classification_criteria, "Start Date"])
+
+    return split_by_segment(instruments_df, data_df[classification_criteria])
+
+
+def _brinson_fachler_instruments(data_df, segment_date_columns):
+    instruments_df = data_df[["Start Date",
+                              "Product description",
+                              "TotalReturn_portfolio",
+                              "TotalReturn_benchmark"]].copy()
+
+    # Compute delta and previous MVs per date (and classification value) for the benchmark
+    classif_mv_benchmark = data_df.groupby(segment_date_columns)[["PreviousMv_benchmark", "DeltaMv_benchmark"]].transform("sum")
+
+    instruments_df["Selection"] = compute_selection_by_instrument_array(
+        data_df["DeltaMv_portfolio"].to_numpy(dtype=float),
+        data_df["PreviousMv_portfolio"].to_numpy(dtype=float),
+        data_df["TotalPreviousMv_portfolio"].to_numpy(dtype=float),
+        classif_mv_benchmark["DeltaMv_benchmark"].to_numpy(dtype=float),
+        classif_mv_benchmark["PreviousMv_benchmark"].to_numpy(dtype=float)
+    )
+
+    selection_columns = ["Start Date",
+                         "Product description",
+                         "Selection",
+                         "TotalReturn_portfolio",
+                         "TotalReturn_benchmark"]
+
+    instruments_df = instruments_df[selection_columns]
+
+    return instruments_df
@@ -1,3 +1,7 @@
+import numpy as np
+from .attribution_cube import aggregate_by_segment, classified_rows, select_segment, split_by_segment
+
+
 def compute_allocation(delta_mv_ptf,
                        previous_mv_ptf,
                        total_previous_mv_ptf,
@@ -95,6 +99,7 @@ def compute_interaction_by_instrument(previous_mv_ptf,
 
 
 def brinson_hood_beebower(data_df, classification_criteria):
+    # Row-wise reference of brinson_hood_beebower_vectorized: the app runs the vectorized functions, this one is the oracle of the tests
     # Sum all values across the instruments
     attribution_df = data_df.groupby(["Start Date", classification_criteria]).agg({
         "DeltaMv_portfolio": "sum",
@@ -158,6 +163,7 @@ def brinson_hood_beebower(data_df, classification_criteria):
 
 
 def brinson_hood_beebower_instrument(data_df, classification_criteria, classification_value):
+    # Row-wise reference of brinson_hood_beebower_instrument_vectorized, kept as the oracle of the tests
     data_df = data_df[data_df[classification_criteria] == classification_value]
 
     instruments_columns = ["Start Date",
@@ -214,4 +220,152 @@ def brinson_hood_beebower_instrument(data_df, classification_criteria, classific
                            "TotalReturn_benchmark"]
     instruments_df = instruments_df[instruments_columns]
 
-    return instruments_df
\ No newline at end of file
+    return instruments_df
+
+
+def compute_effects_array(delta_mv_ptf,
+                          previous_mv_ptf,
+                          total_previous_mv_ptf,
+                          delta_mv_bm,
+                          previous_mv_bm,
+                          total_previous_mv_bm
+                          ):
+    # Weights and returns are computed once and shared by the three effects
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight_ptf = previous_mv_ptf / total_previous_mv_ptf
+        weight_bm = previous_mv_bm / total_previous_mv_bm
+        return_ptf = delta_mv_ptf / previous_mv_ptf
+        return_bm = delta_mv_bm / previous_mv_bm
+
+        # Standard Brinson-Hood-Beebower formulas
+        allocation_effect = (weight_ptf - weight_bm) * return_bm
+        selection_effect = weight_bm * (return_ptf - return_bm)
+        interaction_effect = (weight_ptf - weight_bm) * (return_ptf - return_bm)
+
+        # Exception case for allocation: contribution_i
+        allocation_exception = delta_mv_ptf / total_previous_mv_ptf
+
+    # Exception case for selection and interaction: effects are zero
+    standard_mask = (previous_mv_ptf != 0) & (previous_mv_bm != 0)
+
+    allocation_effect = np.where(previous_mv_bm != 0, allocation_effect, allocation_exception)
+    selection_effect = np.where(standard_mask, selection_effect, 0.0)
+    interaction_effect = np.where(standard_mask, interaction_effect, 0.0)
+
+    return allocation_effect, selection_effect, interaction_effect
+
+
+def compute_instrument_effects_array(previous_mv_ptf,
+                                     total_previous_mv_ptf,
+                                     delta_mv_bm,
+                                     previous_mv_bm,
+                                     total_previous_mv_bm,
+                                     delta_mv_classif_ptf,
+                                     previous_mv_classif_ptf,
+                                     delta_mv_classif_bm,
+                                     previous_mv_classif_bm
+                                     ):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight_ptf = previous_mv_ptf / total_previous_mv_ptf
+        weight_bm = previous_mv_bm / total_previous_mv_bm
+        return_bm = delta_mv_bm / previous_mv_bm
+        return_classif_ptf = delta_mv_classif_ptf / previous_mv_classif_ptf
+        return_classif_bm = delta_mv_classif_bm / previous_mv_classif_bm
+
+        selection = weight_bm * (return_classif_ptf - return_bm)
+        interaction = (weight_ptf - weight_bm) * (return_classif_ptf - return_classif_bm)
+
+    selection = np.where((previous_mv_bm != 0) & (previous_mv_classif_ptf != 0), selection, 0.0)
+    interaction = np.where((previous_mv_classif_ptf != 0) & (previous_mv_classif_bm != 0), interaction, 0.0)
+
+    return selection, interaction
+
+
+def brinson_hood_beebower_vectorized(data_df, classification_criteria):
+    # Sum all values across the instruments, data_df can be the prepare_data DataFrame or an AttributionCube
+    attribution_df = aggregate_by_segment(
+        data_df,
+        classification_criteria,
+        ["DeltaMv_portfolio", "PreviousMv_portfolio", "DeltaMv_benchmark", "PreviousMv_benchmark"],
+        ["TotalPreviousMv_portfolio", "TotalReturn_portfolio", "TotalPreviousMv_benchmark", "TotalReturn_benchmark"]
+    )
+
+    # Compute allocation, selection and interaction effects for all dates and segments in one pass
+    allocation, selection, interaction = compute_effects_array(
+        attribution_df["DeltaMv_portfolio"].to_numpy(dtype=float),
+        attribution_df["PreviousMv_portfolio"].to_numpy(dtype=float),
+        attribution_df["TotalPreviousMv_portfolio"].to_numpy(dtype=float),
+        attribution_df["DeltaMv_benchmark"].to_numpy(dtype=float),
+        attribution_df["PreviousMv_benchmark"].to_numpy(dtype=float),
+        attribution_df["TotalPreviousMv_benchmark"].to_numpy(dtype=float)
+    )
+
+    attribution_df["Allocation"] = allocation
+    attribution_df["Selection"] = selection
+    attribution_df["Interaction"] = interaction
+    attribution_df["Excess return"] = allocation + selection + interaction
+
+    attribution_columns = ["Start Date",
+                           classification_criteria,
+                           "Excess return",
+                           "Allocation",
+                           "Selection",
+                           "Interaction",
+                           "TotalReturn_portfolio",
+                           "TotalReturn_benchmark"
+                           ]
+    attribution_df = attribution_df[attribution_columns]
+
+    return attribution_df
+
+
+def brinson_hood_beebower_instrument_vectorized(data_df, classification_criteria, classification_value):
+    data_df = select_segment(data_df, classification_criteria, classification_value)
+
+    return _brinson_hood_beebower_instruments(data_df, ["Start Date"])
+
+
+def brinson_hood_beebower_instrument_all_segments(data_df, classification_criteria):
+    # Instrument effects of every classification value in one grouped pass, split by classification value
+    data_df = classified_rows(data_df, classification_criteria)
+    instruments_df = _brinson_hood_beebower_instruments(data_df, [classification_criteria, "Start Date"])
+
+    return split_by_segment(instruments_df, data_df[classification_criteria])
+
+
+def _brinson_hood_beebower_instruments(data_df, segment_date_columns):
+    instruments_df = data_df[["Start Date",
+                              "Product description",
+                              "TotalReturn_portfolio",
+                              "TotalReturn_benchmark"]].copy()
+
+    # Compute delta and previous MVs per date (and classification value) in a single grouped pass
+    classif_mv = data_df.groupby(segment_date_columns)[["PreviousMv_portfolio",
+                                                        "DeltaMv_portfolio",
+                                                        "PreviousMv_benchmark",
+                                                        "DeltaMv_benchmark"]].transform("sum")
+
+    selection, interaction = compute_instrument_effects_array(
+        data_df["PreviousMv_portfolio"].to_numpy(dtype=float),
+        data_df["TotalPreviousMv_portfolio"].to_numpy(dtype=float),
+        data_df["DeltaMv_benchmark"].to_numpy(dtype=float),
+        data_df["PreviousMv_benchmark"].to_numpy(dtype=float),
+        data_df["TotalPreviousMv_benchmark"].to_numpy(dtype=float),
+        classif_mv["DeltaMv_portfolio"].to_numpy(dtype=float),
+        classif_mv["PreviousMv_portfolio"].to_numpy(dtype=float),
+        classif_mv["DeltaMv_benchmark"].to_numpy(dtype=float),
+        classif_mv["PreviousMv_benchmark"].to_numpy(dtype=float)
+    )
+
+    instruments_df["Selection"] = selection
+    instruments_df["Interaction"] = interaction
+
+    instruments_columns = ["Start Date",
+                           "Product description",
+                           "Selection",
+                           "Interaction",
+                           "TotalReturn_portfolio",
+                           "TotalReturn_benchmark"]
+    instruments_df = instruments_df[instruments_columns]
+
+    return instruments_df
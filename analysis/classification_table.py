@@ -0,0 +1,113 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# Map taxonomies to product types, taxonomies that aren't in the dictionary are derivatives
+# (all versions of derivatives will be caught)
+TAXONOMY_TO_PRODUCT_TYPE = {
+    "Equities": "Equity",
+    "Fund S/R asset": "Equity",
+    "Exchange Traded Funds": "Equity",
+    "Bonds": "Bond",
+    "Callable Bonds": "Bond",
+    "Convertible Bonds": "Bond",
+    "Fund fee": "Fees",
+    "Fund share fee": "Fees",
+    "Cash": "Cash"
+}
+DEFAULT_PRODUCT_TYPE = "Derivative"
+
+# Classification columns that are not classification criteria
+DESCRIPTIVE_COLUMNS = ["Product", "Product description", "Product type", "Issuer"]
+
+# Product types classified under their own name, with the instrument as product description,
+# whether or not they are in the classifications file
+INSTRUMENT_OVERRIDE_TYPES = ["Derivative", "Fees"]
+
+
+class ClassificationTable:
+    """
+    Immutable lookup table of the classifications, built once per classifications file.
+
+    Rows are indexed by (Product, Product type) and every column is stored as categorical codes. The
+    overrides of non-securities are precomputed: Cash products are classified as "Cash" and every
+    Derivative and Fees instrument is classified under its product type, through a default row when it
+    is not in the file. Instrument rows get their classifications with a single indexer into the table.
+    The classifications DataFrame is not modified. When a (Product, Product type) pair has several rows,
+    the first one is used and a warning is issued.
+    """
+
+    def __init__(self, classifications_df):
+        duplicates = duplicated_classifications(classifications_df)
+        if duplicates:
+            warnings.warn(f"Duplicated classifications for (Product, Product type), the first row is used: {duplicates}")
+            classifications_df = classifications_df.drop_duplicates(["Product", "Product type"])
+
+        # Output columns, as added by a left merge on (Instrument, Product type)
+        self.columns = [col for col in classifications_df.columns if col != "Product type"]
+        self.criteria_columns = [col for col in classifications_df.columns if col not in DESCRIPTIVE_COLUMNS]
+
+        # Put Cash, Fees and Derivatives as classification for all products that are not securities
+        table_df = classifications_df.reset_index(drop=True)
+        for product_type in ["Cash"] + INSTRUMENT_OVERRIDE_TYPES:
+            table_df.loc[table_df["Product type"] == product_type, self.criteria_columns] = product_type
+
+        # Default rows of the instrument override types, for instruments that are not in the file
+        default_rows = pd.DataFrame({"Product type": INSTRUMENT_OVERRIDE_TYPES})
+        for col in self.criteria_columns:
+            default_rows[col] = INSTRUMENT_OVERRIDE_TYPES
+        self.default_rows = dict(zip(INSTRUMENT_OVERRIDE_TYPES, range(len(table_df), len(table_df) + len(default_rows))))
+        table_df = pd.concat([table_df, default_rows], ignore_index=True)
+
+        self.index = pd.MultiIndex.from_frame(classifications_df[["Product", "Product type"]])
+        self.codes = {}
+        for col in self.columns:
+            codes, categories = pd.factorize(table_df[col], sort=True)
+            codes.flags.writeable = False
+            self.codes[col] = (codes, categories)
+
+    def attach(self, instrument_df):
+        """
+        Classifications of the instrument rows, with the columns of a left merge on (Instrument, Product type).
+
+        Returns a new DataFrame, instrument_df is not modified.
+        """
+        instruments = instrument_df["Instrument"].to_numpy(dtype=object)
+        product_types = instrument_df["Product type"].to_numpy(dtype=object)
+
+        indexer = self.index.get_indexer(pd.MultiIndex.from_arrays([instruments, product_types]))
+        for product_type, row in self.default_rows.items():
+            indexer[(indexer == -1) & (product_types == product_type)] = row
+
+        columns = {}
+        for col in self.columns:
+            codes, categories = self.codes[col]
+            row_codes = np.where(indexer == -1, -1, codes[indexer])
+            columns[col] = categories.take(row_codes, allow_fill=True, fill_value=np.nan)
+
+        # The instrument is the product description of the override types
+        override = np.isin(product_types, INSTRUMENT_OVERRIDE_TYPES)
+        columns["Product description"] = np.where(override, instruments, np.asarray(columns["Product description"], dtype=object))
+
+        classified_df = pd.DataFrame({col: np.asarray(values, dtype=object) for col, values in columns.items()},
+                                     index=instrument_df.index)
+        return pd.concat([instrument_df, classified_df], axis=1)
+
+
+def duplicated_classifications(classifications_df):
+    """
+    (Product, Product type) pairs with several rows in the classifications DataFrame.
+    """
+    keys = classifications_df[["Product", "Product type"]]
+    return list(keys[keys.duplicated()].drop_duplicates().itertuples(index=False, name=None))
+
+
+def map_product_types(taxonomies):
+    """
+    Product type of every taxonomy, mapped once per distinct taxonomy.
+    """
+    codes, uniques = pd.factorize(taxonomies)
+    # Missing taxonomies (code -1) take the last entry, the default product type
+    product_types = np.array([TAXONOMY_TO_PRODUCT_TYPE.get(taxonomy, DEFAULT_PRODUCT_TYPE) for taxonomy in uniques]
+                             + [DEFAULT_PRODUCT_TYPE], dtype=object)
+    return product_types[codes]
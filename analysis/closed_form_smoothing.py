@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+
+def carino_smoothing(df, breakdown):
+    """
+    Carino (logarithmic) linking of the per-period effects.
+
+    Each period's effects are scaled by k_t / K, with k_t = ln((1 + R_t) / (1 + B_t)) / (R_t - B_t) the
+    logarithmic coefficient of the period and K the same coefficient over the whole period, so that the
+    linked effects add up to the compounded excess return R - B.
+    """
+    returns_df = _period_returns(df)
+    ptf_returns = returns_df["TotalReturn_portfolio"].to_numpy(dtype=float)
+    bm_returns = returns_df["TotalReturn_benchmark"].to_numpy(dtype=float)
+
+    total_ptf_return = np.prod(1 + ptf_returns) - 1
+    total_bm_return = np.prod(1 + bm_returns) - 1
+    linking_factor = log_linking_coefficient(ptf_returns, bm_returns) / log_linking_coefficient(total_ptf_return, total_bm_return)
+
+    return _link_effects(df, breakdown, returns_df["Start Date"], linking_factor)
+
+
+def menchero_smoothing(df, breakdown):
+    """
+    Menchero linking of the per-period effects.
+
+    Each period's effects are scaled by M + A_t: M = ((R - B) / T) / ((1 + R)^(1/T) - (1 + B)^(1/T)) is
+    the constant scaling of the T periods, and A_t = C * (R_t - B_t) distributes the residual
+    (R - B) - M * sum(R_t - B_t) in proportion to the excess return of the period, with
+    C = ((R - B) - M * sum(R_t - B_t)) / sum((R_t - B_t)^2).
+    """
+    returns_df = _period_returns(df)
+    ptf_returns = returns_df["TotalReturn_portfolio"].to_numpy(dtype=float)
+    bm_returns = returns_df["TotalReturn_benchmark"].to_numpy(dtype=float)
+    n_periods = len(returns_df)
+
+    total_ptf_return = np.prod(1 + ptf_returns) - 1
+    total_bm_return = np.prod(1 + bm_returns) - 1
+    excess_returns = ptf_returns - bm_returns
+    scaling, residual_factor = menchero_coefficients(total_ptf_return, total_bm_return, n_periods,
+                                                     excess_returns.sum(), np.sum(excess_returns ** 2))
+
+    linking_factor = scaling + residual_factor * excess_returns
+
+    return _link_effects(df, breakdown, returns_df["Start Date"], linking_factor)
+
+
+def menchero_coefficients(total_ptf_return, total_bm_return, n_periods, excess_sum, squared_excess_sum):
+    """
+    Menchero scaling M and residual factor C of n_periods periods, from the compounded returns and the sum
+    and sum of squares of the per-period excess returns.
+    """
+    total_excess = total_ptf_return - total_bm_return
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if total_excess == 0:
+            # Limit of M when B tends to R
+            scaling = (1 + total_ptf_return) ** ((n_periods - 1) / n_periods) if n_periods else 1.0
+        else:
+            scaling = (total_excess / n_periods) / (
+                    (1 + total_ptf_return) ** (1 / n_periods) - (1 + total_bm_return) ** (1 / n_periods))
+
+        residual_factor = (total_excess - scaling * excess_sum) / squared_excess_sum if squared_excess_sum else 0.0
+
+    return scaling, residual_factor
+
+
+def log_linking_coefficient(ptf_return, bm_return):
+    """
+    Carino coefficient ln((1 + R) / (1 + B)) / (R - B), whose limit when B tends to R is 1 / (1 + R).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coefficient = (np.log1p(ptf_return) - np.log1p(bm_return)) / (ptf_return - bm_return)
+    return np.where(ptf_return == bm_return, 1 / (1 + np.asarray(ptf_return, dtype=float)), coefficient)
+
+
+def _period_returns(df):
+    # Portfolio and benchmark returns of every period, sorted by Start Date
+    return df.groupby("Start Date", as_index=False)[["TotalReturn_portfolio", "TotalReturn_benchmark"]].first()
+
+
+def _link_effects(df, breakdown, dates, linking_factor):
+    # Multiply every row by the linking factor of its period in one array operation and sum per breakdown,
+    # with the output layout of grap_smoothing: a Total row followed by one row per breakdown value
+    excluded_cols = ["Start Date", "TotalReturn_portfolio", "TotalReturn_benchmark", breakdown]
+    cols_to_multiply = [col for col in df.columns if col not in excluded_cols]
+
+    date_positions = pd.Index(dates).get_indexer(df["Start Date"])
+    linked_values = df[cols_to_multiply].to_numpy(dtype=float) * np.asarray(linking_factor)[date_positions, np.newaxis]
+    linked_df = pd.DataFrame(linked_values, columns=cols_to_multiply, index=df.index)
+
+    # Sum outputs across all dates
+    result_df = linked_df.groupby(df[breakdown]).sum().reset_index()
+
+    # Create the "Total" row
+    total_row = {breakdown: "Total"}
+    for col in cols_to_multiply:
+        total_row[col] = linked_df[col].sum()
+    # Prepend the row to the DataFrame
+    result_df = pd.concat([pd.DataFrame([total_row]), result_df], ignore_index=True)
+
+    return result_df
@@ -1,3 +1,6 @@
+from .attribution_cube import aggregate_by_segment, classified_rows, select_segment, split_by_segment
+
+
 def compute_return( delta_mv,
                     total_return
                     ):
@@ -7,33 +10,25 @@ def compute_return( delta_mv,
 
 def contribution(data_df, classification_criteria):
 
-    # Sum all values across the instruments
-    contribution_df = data_df.groupby(["Start Date", classification_criteria]).agg({
-        "DeltaMv_portfolio": "sum",
-        "DeltaMv_benchmark": "sum",
-        "TotalPreviousMv_portfolio": "first",
-        "TotalReturn_portfolio": "first",
-        "TotalPreviousMv_benchmark": "first",
-        "TotalReturn_benchmark": "first"
-    }).reset_index()
+    # Sum all values across the instruments, data_df can be the prepare_data DataFrame or an AttributionCube
+    contribution_df = aggregate_by_segment(
+        data_df,
+        classification_criteria,
+        ["DeltaMv_portfolio", "DeltaMv_benchmark"],
+        ["TotalPreviousMv_portfolio", "TotalReturn_portfolio", "TotalPreviousMv_benchmark", "TotalReturn_benchmark"]
+    )
 
     # Compute contribution of Return for each date
-    contribution_df["Return"] = contribution_df.apply(
-        lambda row: compute_return(
-            row["DeltaMv_portfolio"],
-            row["TotalPreviousMv_portfolio"]
-        ),
-        axis = 1)
+    contribution_df["Return"] = compute_return(
+        contribution_df["DeltaMv_portfolio"],
+        contribution_df["TotalPreviousMv_portfolio"]
+    )
 
     # Compute contribution of BM Return for each date
-    contribution_df["BM Return"] = contribution_df.apply(
-        lambda row: compute_return(
-            row["DeltaMv_benchmark"],
-            row["TotalPreviousMv_benchmark"]
-        ),
-        axis=1)
-
-    contribution_df = contribution_df.reset_index()
+    contribution_df["BM Return"] = compute_return(
+        contribution_df["DeltaMv_benchmark"],
+        contribution_df["TotalPreviousMv_benchmark"]
+    )
 
     contribution_columns = ["Start Date",
                            classification_criteria,
@@ -48,10 +43,24 @@ def contribution(data_df, classification_criteria):
 
 def contribution_instrument(data_df, classification_criteria, classification_value):
     # Filter on the value of the classification
-    data_df = data_df[data_df[classification_criteria] == classification_value]
+    data_df = select_segment(data_df, classification_criteria, classification_value)
+
+    return _contribution_instruments(data_df, [])
+
+
+def contribution_instrument_all_segments(data_df, classification_criteria):
+    # Instrument contributions of every classification value in one grouped pass, split by classification value
+    data_df = classified_rows(data_df, classification_criteria)
+    instruments_df = _contribution_instruments(data_df, [classification_criteria])
 
+    segment_values = instruments_df.pop(classification_criteria)
+
+    return split_by_segment(instruments_df, segment_values)
+
+
+def _contribution_instruments(data_df, segment_columns):
     # Sum all values across the instruments
-    instruments_df = data_df.groupby(["Start Date", "Product description"]).agg({
+    instruments_df = data_df.groupby(segment_columns + ["Start Date", "Product description"]).agg({
         "DeltaMv_portfolio": "sum",
         "DeltaMv_benchmark": "sum",
         "TotalPreviousMv_portfolio": "first",
@@ -61,24 +70,18 @@ def contribution_instrument(data_df, classification_criteria, classification_val
     }).reset_index()
 
     # Compute contribution of Return for each date
-    instruments_df["Return"] = instruments_df.apply(
-        lambda row: compute_return(
-            row["DeltaMv_portfolio"],
-            row["TotalPreviousMv_portfolio"]
-        ),
-        axis = 1)
+    instruments_df["Return"] = compute_return(
+        instruments_df["DeltaMv_portfolio"],
+        instruments_df["TotalPreviousMv_portfolio"]
+    )
 
     # Compute contribution of BM Return for each date
-    instruments_df["BM Return"] = instruments_df.apply(
-        lambda row: compute_return(
-            row["DeltaMv_benchmark"],
-            row["TotalPreviousMv_benchmark"]
-        ),
-        axis=1)
-
-    instruments_df = instruments_df.reset_index()
+    instruments_df["BM Return"] = compute_return(
+        instruments_df["DeltaMv_benchmark"],
+        instruments_df["TotalPreviousMv_benchmark"]
+    )
 
-    instrument_contribution_columns = ["Start Date",
+    instrument_contribution_columns = segment_columns + ["Start Date",
                             "Product description",
                             "Return",
                             "BM Return",
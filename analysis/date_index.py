@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# Ordinal of a missing End Date, so that the row never passes the "End Date <= end_date" filter
+_MISSING_END_ORDINAL = np.iinfo(np.int64).max
+
+
+class DatePartitionedFrame:
+    """
+    Input DataFrame (portfolios or benchmarks) partitioned by name, with sorted date ordinals per partition.
+
+    Each partition holds the row positions of one portfolio or benchmark sorted by Start Date, with the
+    Start Date and End Date as int64 nanosecond ordinals. Selecting names and a date range is then a
+    dictionary lookup and a binary search per name, so its cost follows the number of rows returned
+    instead of the size of the input file. Dates are parsed once, when the index is built.
+
+    Rows are returned in the order of the input DataFrame, as with boolean masks, so that the sums of
+    prepare_data are computed in the same order. End Date is assumed not to be before Start Date.
+    """
+
+    def __init__(self, df, key_column):
+        self.df = df
+        self.key_column = key_column
+
+        start_ordinals = _date_ordinals(df["Start Date"])
+        end_ordinals = _date_ordinals(df["End Date"])
+        end_ordinals[end_ordinals == np.iinfo(np.int64).min] = _MISSING_END_ORDINAL
+
+        self.partitions = {}
+        for key, positions in df.groupby(key_column, observed=True, sort=False).indices.items():
+            order = np.argsort(start_ordinals[positions], kind="stable")
+            positions = positions[order]
+            self.partitions[key] = (positions, start_ordinals[positions], end_ordinals[positions])
+
+    def select(self, keys, start_date, end_date):
+        """
+        Rows of the given names with Start Date >= start_date and End Date <= end_date.
+        """
+        start_ordinal = pd.to_datetime(start_date).value
+        end_ordinal = pd.to_datetime(end_date).value
+
+        selected = []
+        for key in dict.fromkeys(keys):
+            if key not in self.partitions:
+                continue
+            positions, start_ordinals, end_ordinals = self.partitions[key]
+            # Start dates are sorted: rows starting in [start_date, end_date] form a contiguous slice
+            lo = np.searchsorted(start_ordinals, start_ordinal, side="left")
+            hi = np.searchsorted(start_ordinals, end_ordinal, side="right")
+            selected.append(positions[lo:hi][end_ordinals[lo:hi] <= end_ordinal])
+
+        if not selected:
+            return self.df.iloc[:0]
+        return self.df.take(np.sort(np.concatenate(selected)))
+
+
+def _date_ordinals(dates):
+    # int64 nanoseconds since epoch, missing dates are the minimum int64
+    return pd.to_datetime(dates).to_numpy(dtype="datetime64[ns]").view(np.int64).copy()
+
+
+def select_rows(data, key_column, keys, start_date, end_date):
+    # Filter the input on the names in keys and on the date range, from a DataFrame or from an
+    # indexed (DatePartitionedFrame) or streamed (ChunkedCsvInput) input on key_column
+    if not isinstance(data, pd.DataFrame):
+        return data.select(keys, start_date, end_date)
+
+    return filter_rows(data, key_column, keys, start_date, end_date)
+
+
+def filter_rows(data, key_column, keys, start_date, end_date):
+    # Boolean mask filter, rows are kept in input order
+    data = data[data[key_column].isin(keys)]
+    return data[(pd.to_datetime(data["Start Date"]) >= pd.to_datetime(start_date)) &
+                (pd.to_datetime(data["End Date"]) <= pd.to_datetime(end_date))]
@@ -1,4 +1,7 @@
-from .brinson_fachler import brinson_fachler
+import numpy as np
+from config.settings import FIXED_INCOME_EFFECTS
+from .attribution_cube import aggregate_by_segment, classified_rows, select_segment, split_by_segment
+from .brinson_fachler import brinson_fachler, brinson_fachler_vectorized
 
 def excess_return(row, effect):
     delta_mv_ptf = "DeltaMv" + effect + "_portfolio"
@@ -10,6 +13,7 @@ def excess_return(row, effect):
 
 
 def effects_analysis(data_df, classification_criteria, effects, credit_mode):
+    # Row-wise reference of effects_analysis_vectorized: the app runs the vectorized functions, this one is the oracle of the tests
     # Sum all values across the instruments
     attribution_df = data_df.groupby(["Start Date", classification_criteria]).agg({
                            "DeltaMv_portfolio": "sum",
@@ -82,6 +86,7 @@ def effects_analysis(data_df, classification_criteria, effects, credit_mode):
 
 
 def effects_analysis_instrument(data_df, classification_criteria, classification_value, effects):
+    # Row-wise reference of effects_analysis_instrument_vectorized, kept as the oracle of the tests
     data_df = data_df[data_df[classification_criteria] == classification_value]
     instruments_columns = ["Start Date",
                            "Product description",
@@ -128,4 +133,97 @@ def effects_analysis_instrument(data_df, classification_criteria, classification
 
     instruments_df = instruments_df[instruments_columns]
 
-    return instruments_df
\ No newline at end of file
+    return instruments_df
+
+
+def compute_excess_returns_matrix(df, effect_columns):
+    # Stack the DeltaMv<suffix> columns of all effects and divide each block by its total previous MV at once
+    delta_mv_ptf = df[["DeltaMv" + suffix + "_portfolio" for suffix in effect_columns.values()]].to_numpy(dtype=float)
+    delta_mv_bm = df[["DeltaMv" + suffix + "_benchmark" for suffix in effect_columns.values()]].to_numpy(dtype=float)
+    total_previous_mv_ptf = df["TotalPreviousMv_portfolio"].to_numpy(dtype=float)[:, np.newaxis]
+    total_previous_mv_bm = df["TotalPreviousMv_benchmark"].to_numpy(dtype=float)[:, np.newaxis]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        excess_returns = delta_mv_ptf / total_previous_mv_ptf - delta_mv_bm / total_previous_mv_bm
+
+    return excess_returns
+
+
+def effects_analysis_vectorized(data_df, classification_criteria, effects, credit_mode):
+    # Effects to compute and their DeltaMv column suffixes, the excess return uses the unsuffixed DeltaMv columns
+    effect_columns = dict(FIXED_INCOME_EFFECTS["columns"])
+    if credit_mode == "brinson":
+        del effect_columns["Credit"]
+    delta_mv_columns = [
+        "DeltaMv" + suffix + side
+        for suffix in ["", *FIXED_INCOME_EFFECTS["columns"].values()]
+        for side in ("_portfolio", "_benchmark")
+    ]
+
+    # Sum all values across the instruments
+    attribution_df = aggregate_by_segment(
+        data_df,
+        classification_criteria,
+        delta_mv_columns + ["PreviousMv_portfolio", "PreviousMv_benchmark"],
+        ["TotalPreviousMv_portfolio", "TotalPreviousMv_benchmark", "TotalReturn_portfolio", "TotalReturn_benchmark"]
+    )
+
+    excess_returns = compute_excess_returns_matrix(attribution_df, {**effect_columns, "Excess return": ""})
+    attribution_df[list(effect_columns) + ["Excess return"]] = excess_returns
+
+    if credit_mode == "brinson":
+        # Prepare credit-specific DataFrame for brinson_fachler
+        credit_df = attribution_df[["Start Date", classification_criteria,
+                                    "DeltaMvCredit_portfolio", "PreviousMv_portfolio", "DeltaMvCredit_benchmark",
+                                    "PreviousMv_benchmark", "TotalPreviousMv_portfolio", "TotalReturn_portfolio",
+                                    "TotalPreviousMv_benchmark", "TotalReturn_benchmark"]].copy()
+        credit_df = credit_df.rename(columns={
+            "DeltaMvCredit_portfolio": "DeltaMv_portfolio",
+            "DeltaMvCredit_benchmark": "DeltaMv_benchmark"
+        })
+        credit_brinson = brinson_fachler_vectorized(credit_df, classification_criteria)
+        # The credit frame has one row per date and segment, in the same order as the attribution frame
+        attribution_df["Credit allocation"] = credit_brinson["Allocation"].to_numpy()
+        attribution_df["Credit selection"] = credit_brinson["Selection"].to_numpy()
+
+    attribution_df["Residual"] = attribution_df["Excess return"] - attribution_df[effects].sum(axis=1)
+
+    attribution_columns = ["Start Date", classification_criteria] + effects + ["Residual", "Excess return", "TotalReturn_portfolio", "TotalReturn_benchmark"]
+
+    attribution_df = attribution_df[attribution_columns]
+
+    return attribution_df
+
+
+def effects_analysis_instrument_vectorized(data_df, classification_criteria, classification_value, effects):
+    data_df = select_segment(data_df, classification_criteria, classification_value)
+
+    return _effects_analysis_instruments(data_df, effects)
+
+
+def effects_analysis_instrument_all_segments(data_df, classification_criteria, effects):
+    # Instrument effects only depend on the instrument rows: computed once for every classification value
+    data_df = classified_rows(data_df, classification_criteria)
+    instruments_df = _effects_analysis_instruments(data_df, effects)
+
+    return split_by_segment(instruments_df, data_df[classification_criteria])
+
+
+def _effects_analysis_instruments(data_df, effects):
+    effect_columns = FIXED_INCOME_EFFECTS["columns"]
+
+    instruments_df = data_df[["Start Date",
+                              "Product description",
+                              "TotalReturn_portfolio",
+                              "TotalReturn_benchmark"]].copy()
+
+    excess_returns = compute_excess_returns_matrix(data_df, {**effect_columns, "Excess return": ""})
+    instruments_df[list(effect_columns) + ["Excess return"]] = excess_returns
+
+    instruments_df["Residual"] = instruments_df["Excess return"] - instruments_df[effects].sum(axis=1)
+
+    instruments_columns = ["Start Date", "Product description"] + effects + ["Residual", "Excess return", "TotalReturn_portfolio", "TotalReturn_benchmark"]
+
+    instruments_df = instruments_df[instruments_columns]
+
+    return instruments_df
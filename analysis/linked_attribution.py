@@ -0,0 +1,127 @@
+import pandas as pd
+
+
+class LinkedAttributionAccumulator:
+    """
+    Linked (smoothed) attribution maintained one period at a time.
+
+    The accumulator keeps the cumulative portfolio and benchmark growth factors and the linked sums of
+    every segment, so a new period is absorbed in O(rows of the period) and result() gives the same
+    table as running the smoothing over the whole history:
+      - "Frongello": grap_smoothing, whose Total row also counts the rows without a breakdown value
+      - "Modified Frongello": modified_frongello_smoothing, which compounds the rows of a segment one
+        after another, so a segment with several rows on a date is linked row by row
+      - "Contribution": contribution_smoothing
+
+    Periods are the outputs of a model master function (or contribution) for a single Start Date.
+    The accumulator holds plain Python and pandas objects, so it can be pickled between runs.
+    """
+
+    def __init__(self, breakdown, method="Frongello"):
+        if method not in LINKING_UPDATES:
+            raise ValueError(f"Unknown linking method: {method}")
+
+        self.breakdown = breakdown
+        self.method = method
+        self.cumulative_portfolio = 1.0
+        self.cumulative_benchmark = 1.0
+        self.last_date = None
+        self.linked_df = None
+
+    def add_period(self, period_df):
+        """
+        Absorb the attribution of one period, which must be later than the periods already absorbed.
+        """
+        start_dates = period_df["Start Date"].unique()
+        if len(start_dates) != 1:
+            raise ValueError("A period must contain a single Start Date")
+        start_date = start_dates[0]
+        if self.last_date is not None and start_date <= self.last_date:
+            raise ValueError(f"Period {start_date} is not after the last absorbed period {self.last_date}")
+
+        return_ptf = period_df["TotalReturn_portfolio"].iloc[0]
+        return_bm = period_df["TotalReturn_benchmark"].iloc[0]
+
+        # Period values per segment, rows without a breakdown value are dropped as in the smoothing functions,
+        # but for the Total row of grap_smoothing (kept under a missing segment)
+        excluded_cols = ["Start Date", "TotalReturn_portfolio", "TotalReturn_benchmark", self.breakdown]
+        value_cols = [col for col in period_df.columns if col not in excluded_cols]
+        if self.method != "Frongello":
+            period_df = period_df[period_df[self.breakdown].notna()]
+        segment_rows = period_df.groupby(self.breakdown, dropna=False)
+        row_counts = segment_rows.size()
+        if self.method == "Modified Frongello":
+            # Row j of the k rows of a segment grows with the k - j rows after it, as in the row-wise recurrence
+            remaining_rows = (segment_rows.cumcount(ascending=False)).to_numpy()
+            row_growth = (1 + 0.5 * (return_ptf + return_bm)) ** remaining_rows
+            period_values = period_df[value_cols].mul(row_growth, axis=0).groupby(period_df[self.breakdown], dropna=False).sum()
+        else:
+            period_values = segment_rows[value_cols].sum()
+
+        if self.linked_df is None:
+            self.linked_df = pd.DataFrame(columns=period_values.columns, dtype=float)
+            self.linked_df.index.name = self.breakdown
+
+        # Align the linked sums and the period values on the union of the segments
+        segments = self.linked_df.index.union(period_values.index)
+        linked_df = self.linked_df.reindex(segments, fill_value=0.0)
+        row_counts = row_counts.reindex(segments, fill_value=0).to_numpy()
+        period_values = period_values.reindex(segments, fill_value=0.0)
+
+        update = LINKING_UPDATES[self.method]
+        self.linked_df = update(self, linked_df, period_values, row_counts, return_ptf, return_bm)
+
+        self.cumulative_portfolio *= 1 + return_ptf
+        self.cumulative_benchmark *= 1 + return_bm
+        self.last_date = start_date
+
+    def add_periods(self, df):
+        """
+        Absorb every period of a model output, in date order.
+        """
+        for _, period_df in df.groupby("Start Date", sort=True):
+            self.add_period(period_df)
+
+    def result(self):
+        """
+        Linked attribution per segment with the "Total" row first, as returned by the smoothing functions.
+        """
+        result_df = self.linked_df[self.linked_df.index.notna()].reset_index()
+
+        # Create the "Total" row
+        total_row = {self.breakdown: "Total"}
+        for col in self.linked_df.columns:
+            total_row[col] = self.linked_df[col].sum()
+        # Prepend the row to the DataFrame
+        return pd.concat([pd.DataFrame([total_row]), result_df], ignore_index=True)
+
+
+def _update_frongello(accumulator, linked_df, period_values, row_counts, return_ptf, return_bm):
+    # GRAP factor of a period: portfolio growth up to the previous period times benchmark growth after the period,
+    # so the linked sums of previous periods grow with the new benchmark return
+    return linked_df * (1 + return_bm) + period_values * accumulator.cumulative_portfolio
+
+
+def _update_modified_frongello(accumulator, linked_df, period_values, row_counts, return_ptf, return_bm):
+    factor_1 = 0.5 * accumulator.cumulative_portfolio + 0.5 * accumulator.cumulative_benchmark
+    factor_2 = 0.5 * (return_ptf + return_bm)
+
+    # The linked sums grow once per row of the segment in the period, segments without a row keep them.
+    # Period values are already weighted by the growth of the rows after them, see add_period.
+    growth = (1 + factor_2) ** row_counts
+    return linked_df.mul(growth, axis=0) + period_values * factor_1
+
+
+def _update_contribution(accumulator, linked_df, period_values, row_counts, return_ptf, return_bm):
+    linked_df = linked_df.copy()
+    linked_df["Return"] += period_values["Return"] * accumulator.cumulative_portfolio
+    linked_df["BM Return"] += period_values["BM Return"] * accumulator.cumulative_benchmark
+    linked_df["Excess return"] = linked_df["Return"] - linked_df["BM Return"]
+    return linked_df[["Return", "BM Return", "Excess return"]]
+
+
+LINKING_UPDATES = {
+    "Frongello": _update_frongello,
+    "Modified Frongello": _update_modified_frongello,
+    "Contribution": _update_contribution
+}
@@ -1,5 +1,12 @@
 import pandas as pd
 import numpy as np
+from config.settings import RISK_FREE_RATE, ROLLING_WINDOWS
+from .attribution_cube import date_returns
+from .risk_analytics import PERIODS_PER_YEAR, RISK_METRICS, rolling_risk_metrics
+
+# Metrics of the instrument (details) table, in display order
+INSTRUMENT_METRICS = ["Volatility", "Benchmark volatility", "Tracking error", "Max drawdown", "Beta", "Correlation",
+                      "Information ratio", "Jensen alpha", "Sharpe ratio", "Sortino ratio", "Treynor ratio"]
 
 def measurement_analytics_master(merged_df: pd.DataFrame, classification_criteria=None, frequency: str = "daily") -> pd.DataFrame:
     daily_returns = calculate_measurement_analytics(merged_df, frequency=frequency)
@@ -33,57 +40,55 @@ def measurement_analytics_master(merged_df: pd.DataFrame, classification_criteri
 
 def measurement_analytics_instrument(merged_df: pd.DataFrame, classification_criteria=None, classification_value=None, frequency: str = "daily"):
     daily_returns = calculate_measurement_analytics(merged_df, frequency=frequency)
-    # keep csv export for debugging
-    daily_returns.to_csv("debug_measurement_instrument.csv", index=False)
-
-    # Map frequency to periods per year for annualization
-    periods_per_year = {"daily": 252, "weekly": 52, "monthly": 12}
-    n = periods_per_year.get(frequency, 252)
 
     ptf_returns = daily_returns.get("TotalReturn_portfolio", pd.Series(dtype=float))
     bm_returns = daily_returns.get("TotalReturn_benchmark", pd.Series(dtype=float))
 
-    # Volatility - using population std dev for these and not annualizing - we should consider this further
-    vol = ptf_returns.std(ddof=0)
-    bmk_vol = bm_returns.std(ddof=0)
-
-    # Tracking error - std population deviation of excess returns
-    tracking_error = (ptf_returns - bm_returns).std(ddof=0)
-
-    # Max drawdown
-
-    # Beta
-    cov = np.cov(ptf_returns, bm_returns, ddof=0)[0, 1]
-    var_bmk = np.var(bm_returns, ddof=0)
-    beta = cov / var_bmk
-
-    # Correlation
-    var_ptf = np.var(ptf_returns, ddof=0)
-    correlation = cov / (np.sqrt(var_ptf) * np.sqrt(var_bmk))
-
-    # Information ratio
+    # Metrics over the whole period: a single window covering every period
+    # Volatility and tracking error use the population std dev and are not annualized - we should consider this further
+    metrics = rolling_risk_metrics(ptf_returns, bm_returns, len(ptf_returns), PERIODS_PER_YEAR.get(frequency, 252))
 
-    # Jensen alpha
+    return pd.DataFrame([
+        {"Metric": metric, "Value": metrics[metric][0] if len(metrics[metric]) else np.nan}
+        for metric in INSTRUMENT_METRICS
+    ])
 
-    # Sharpe ratio
 
-    # Sortino ratio
+def rolling_risk_analytics(merged_df, classification_criteria=None, classification_value=None,
+                           frequency: str = "daily", windows=None, risk_free_rate=RISK_FREE_RATE) -> pd.DataFrame:
+    """
+    Risk metrics of the portfolio against the benchmark over rolling windows.
 
-    # Treynor ratio
+    Args:
+        merged_df: DataFrame or AttributionCube from prepare_data
+        frequency: "daily", "weekly" or "monthly", returns are compounded to this frequency
+        windows: Dict of window label -> length in months, defaults to ROLLING_WINDOWS
+        risk_free_rate: Annual risk free rate
 
-    return pd.DataFrame([
-        {"Metric": "Volatility", "Value": vol},
-        {"Metric": "Benchmark volatility", "Value": bmk_vol,},
-        {"Metric": "Tracking error", "Value": tracking_error,},
-        # {"Metric": "Max drawdown", "Value": max_drawdown,},
-        {"Metric": "Beta", "Value": beta,},
-        {"Metric": "Correlation", "Value": correlation,}
-        # {"Metric": "Information ratio", "Value": information_ratio,},
-        # {"Metric": "Jensen alpha", "Value": jensen_alpha,},
-        # {"Metric": "Sharpe ratio", "Value": sharpe_ratio,},
-        # {"Metric": "Sortino ratio", "Value": sortino_ratio,},
-        # {"Metric": "Treynor ratio", "Value": treynor_ratio,},
-    ])
+    Returns:
+        DataFrame with columns Window, Date (start date of the last period of the window) and one
+        column per metric of RISK_METRICS. Windows longer than the analysed period have no rows.
+    """
+    windows = ROLLING_WINDOWS if windows is None else windows
+    daily_returns = calculate_measurement_analytics(merged_df, frequency=frequency)
+    periods_per_year = PERIODS_PER_YEAR.get(frequency, 252)
+    dates = pd.to_datetime(daily_returns["Start Date"]).dt.date.to_numpy()
+
+    results = []
+    for label, months in windows.items():
+        window = max(int(round(months * periods_per_year / 12)), 1)
+        metrics = rolling_risk_metrics(daily_returns["TotalReturn_portfolio"], daily_returns["TotalReturn_benchmark"],
+                                       window, periods_per_year, risk_free_rate)
+        if not len(metrics["Return"]):
+            continue
+        window_df = pd.DataFrame(metrics, columns=RISK_METRICS)
+        window_df.insert(0, "Date", dates[window - 1:])
+        window_df.insert(0, "Window", label)
+        results.append(window_df)
+
+    if not results:
+        return pd.DataFrame(columns=["Window", "Date"] + RISK_METRICS)
+    return pd.concat(results, ignore_index=True)
 
 
 def calculate_measurement_analytics(merged_df: pd.DataFrame, frequency: str = "daily") -> pd.DataFrame:
@@ -93,7 +98,8 @@ def calculate_measurement_analytics(merged_df: pd.DataFrame, frequency: str = "d
     """
 
     # Extract unique daily returns (TotalReturn_* are already aggregated at portfolio level per day in prepare_data)
-    df = merged_df[["Start Date", "TotalReturn_portfolio", "TotalReturn_benchmark"]].drop_duplicates(subset=["Start Date"]).sort_values("Start Date").reset_index(drop=True)
+    # merged_df can also be an AttributionCube, which stores them once per date
+    df = date_returns(merged_df)
     df["Start Date"] = pd.to_datetime(df["Start Date"])
     
     # Compound daily returns to requested frequency
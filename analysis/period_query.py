@@ -0,0 +1,242 @@
+import numpy as np
+import pandas as pd
+from .closed_form_smoothing import log_linking_coefficient, menchero_coefficients
+from .date_index import select_rows
+from .modified_frongello_smoothing import modified_frongello_smoothing_vectorized
+
+# Linking methods of the engine, with the layout of grap_smoothing, modified_frongello_smoothing_vectorized,
+# carino_smoothing, menchero_smoothing and contribution_smoothing
+LINKING_METHODS = ["grap", "modified_frongello", "carino", "menchero", "contribution"]
+
+# Methods whose Total row also sums the rows without a breakdown value, as the smoothing functions do
+_TOTAL_WITH_UNCLASSIFIED = ["grap", "carino", "menchero"]
+
+CONTRIBUTION_COLUMNS = ["Return", "BM Return"]
+
+
+class PeriodQueryEngine:
+    """
+    Linked effects of any performance period, from the per-period effects of the full history.
+
+    Per-period effects (the output of a master or instrument model, before smoothing) only depend on
+    the rows of their own period, so the effects of a shorter performance period are a slice of the
+    full history ones. The engine precomputes once the prefix products of the portfolio and benchmark
+    growth factors per date, and the prefix sums of the effects times the linking terms of each
+    method per segment. A (start, end) query then links the effects of the periods in between with a
+    few prefix differences per segment: its cost follows the number of segments, not the length of
+    the history, and it gives the result of the smoothing function on the sliced data.
+
+    Periods are selected as in prepare_data: Start Date >= start and End Date <= end. period_ends is a
+    Series of the End Date of every Start Date (see period_end_dates), periods that are not in it end on
+    their Start Date. Periods are assumed not to overlap, so that the selected periods are contiguous.
+
+    Modified Frongello links in log space the average growth 1 + (R_t + B_t) / 2 of the periods. When it
+    is not positive for some period, queries smooth the rows of the window with
+    modified_frongello_smoothing_vectorized instead, which falls back to the row-wise recursion.
+    """
+
+    def __init__(self, effects_df, breakdown, linking, period_ends=None):
+        if linking not in LINKING_METHODS:
+            raise ValueError(f"Unknown linking method {linking}, expected one of {LINKING_METHODS}")
+        self.breakdown = breakdown
+        self.linking = linking
+
+        returns_df = effects_df.groupby("Start Date", as_index=False)[["TotalReturn_portfolio", "TotalReturn_benchmark"]].first()
+        dates = returns_df["Start Date"]
+        self.start_ordinals = pd.to_datetime(dates).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        self.end_ordinals = self.start_ordinals
+        if period_ends is not None:
+            period_ends = pd.Series(pd.to_datetime(period_ends.to_numpy()), index=pd.to_datetime(period_ends.index))
+            end_dates = period_ends.reindex(pd.to_datetime(dates)).to_numpy(dtype="datetime64[ns]").view(np.int64)
+            self.end_ordinals = np.where(end_dates == np.iinfo(np.int64).min, self.start_ordinals, end_dates)
+        # Running maximum of the end dates, equal to them when periods don't overlap, for binary searches
+        self.sorted_end_ordinals = np.maximum.accumulate(self.end_ordinals) if len(dates) else self.end_ordinals
+        n_dates = len(dates)
+
+        ptf_returns = returns_df["TotalReturn_portfolio"].to_numpy(dtype=float)
+        bm_returns = returns_df["TotalReturn_benchmark"].to_numpy(dtype=float)
+        excess_returns = ptf_returns - bm_returns
+
+        # Prefix products of the growth factors, growth[k] = prod_{u < k} (1 + r_u)
+        self.ptf_growth = np.concatenate(([1.0], np.cumprod(1 + ptf_returns)))
+        self.bm_growth = np.concatenate(([1.0], np.cumprod(1 + bm_returns)))
+        self.excess_sums = np.concatenate(([0.0], np.cumsum(excess_returns)))
+        self.squared_excess_sums = np.concatenate(([0.0], np.cumsum(excess_returns ** 2)))
+
+        if linking == "contribution":
+            self.columns = CONTRIBUTION_COLUMNS
+        else:
+            excluded_cols = ["Start Date", "TotalReturn_portfolio", "TotalReturn_benchmark", breakdown]
+            self.columns = [col for col in effects_df.columns if col not in excluded_cols]
+
+        # Rows sorted by (segment, date), keyed by segment * n_dates + date position so that the rows of a
+        # segment within a window are found with one binary search for all segments
+        segment_codes, self.segments = pd.factorize(effects_df[breakdown], sort=True)
+        self.n_segments = len(self.segments)
+        if linking in _TOTAL_WITH_UNCLASSIFIED:
+            # Rows without a breakdown value form a last segment, only counted in the Total row
+            segment_codes = np.where(segment_codes == -1, self.n_segments, segment_codes)
+        keep = segment_codes >= 0
+        segment_codes = segment_codes[keep]
+        date_positions = pd.Index(dates).get_indexer(effects_df["Start Date"])[keep]
+        values = effects_df[self.columns].to_numpy(dtype=float)[keep]
+
+        order = np.lexsort((date_positions, segment_codes))
+        segment_codes = segment_codes[order].astype(np.int64)
+        date_positions = date_positions[order].astype(np.int64)
+        values = values[order]
+        self.n_dates = n_dates
+        self.row_keys = segment_codes * n_dates + date_positions
+
+        # Effects smoothed per query when the average growth has no logarithm, see the class docstring
+        self.unlinked_df = None
+        if linking == "modified_frongello" and (0.5 * (ptf_returns + bm_returns) <= -1).any():
+            self.unlinked_df = effects_df
+            self.prefix_sums = []
+            return
+
+        if linking == "grap":
+            # Factor of period t within [s, e]: growth_ptf[t] / growth_ptf[s] * growth_bm[e + 1] / growth_bm[t + 1]
+            terms = [values * (self.ptf_growth[date_positions] / self.bm_growth[date_positions + 1])[:, np.newaxis]]
+        elif linking == "carino":
+            # Factor k_t / K, K only depends on the compounded returns of the window
+            coefficients = log_linking_coefficient(ptf_returns, bm_returns)
+            terms = [values * coefficients[date_positions, np.newaxis]]
+        elif linking == "menchero":
+            # Factor M + C * (R_t - B_t), M and C only depend on sums over the window
+            terms = [values, values * excess_returns[date_positions, np.newaxis]]
+        elif linking == "modified_frongello":
+            # The smoothed sum of a segment is G_e * sum_t x_t * f1_t / G_t, with G the growth of the
+            # segment over its own periods and f1_t = (growth_ptf[t] / growth_ptf[s] + growth_bm[t] / growth_bm[s]) / 2
+            log_growth = np.log1p(0.5 * (ptf_returns + bm_returns))[date_positions]
+            cumulative = np.cumsum(log_growth)
+            # Log growth of the segment up to each of its rows, from its first row
+            segment_starts = np.flatnonzero(np.diff(segment_codes, prepend=-1))
+            segment_lengths = np.diff(np.append(segment_starts, len(segment_codes)))
+            self.segment_log_growth = cumulative - np.repeat(cumulative[segment_starts] - log_growth[segment_starts], segment_lengths)
+            discount = np.exp(-self.segment_log_growth)
+            terms = [values * (self.ptf_growth[date_positions] * discount)[:, np.newaxis],
+                     values * (self.bm_growth[date_positions] * discount)[:, np.newaxis]]
+        else:
+            # Compounded contributions: returns are scaled by the growth of their side up to the period
+            terms = [values[:, [0]] * self.ptf_growth[date_positions, np.newaxis],
+                     values[:, [1]] * self.bm_growth[date_positions, np.newaxis]]
+
+        self.prefix_sums = [np.concatenate((np.zeros((1, term.shape[1])), np.cumsum(term, axis=0))) for term in terms]
+
+    def __len__(self):
+        # Number of per-period rows the engine was built from
+        return len(self.row_keys)
+
+    def window(self, start_date, end_date):
+        """
+        Positions (first, last) of the periods with Start Date >= start_date and End Date <= end_date, None if there are none.
+        """
+        first = np.searchsorted(self.start_ordinals, pd.to_datetime(start_date).value, side="left")
+        last = np.searchsorted(self.sorted_end_ordinals, pd.to_datetime(end_date).value, side="right") - 1
+        if first > last:
+            return None
+        return first, last
+
+    def cumulative_returns(self, start_date, end_date):
+        """
+        Compounded portfolio and benchmark returns of the periods between start_date and end_date.
+
+        Returns:
+            Tuple of (portfolio_return, benchmark_return)
+        """
+        window = self.window(start_date, end_date)
+        if window is None:
+            return 0.0, 0.0
+        first, last = window
+        return (self.ptf_growth[last + 1] / self.ptf_growth[first] - 1,
+                self.bm_growth[last + 1] / self.bm_growth[first] - 1)
+
+    def query(self, start_date, end_date):
+        """
+        Linked effects of the periods between start_date and end_date.
+
+        Returns:
+            DataFrame with the layout of the smoothing function: a Total row followed by one row per
+            breakdown value with rows in the window
+        """
+        window = self.window(start_date, end_date)
+        if self.unlinked_df is not None:
+            return self._smooth_window(window)
+        n_codes = self.n_segments + (1 if self.linking in _TOTAL_WITH_UNCLASSIFIED else 0)
+        if window is None:
+            linked = np.zeros((n_codes, len(self.columns)))
+            present = np.zeros(n_codes, dtype=bool)
+        else:
+            linked, present = self._link(*window, n_codes)
+
+        segments_linked = linked[:self.n_segments][present[:self.n_segments]]
+        result_df = pd.DataFrame(segments_linked, columns=self.columns)
+        if self.linking == "contribution":
+            result_df["Excess return"] = result_df["Return"] - result_df["BM Return"]
+        result_df.insert(0, self.breakdown, np.asarray(self.segments)[present[:self.n_segments]])
+
+        # Create the "Total" row
+        total_row = {self.breakdown: "Total"}
+        total_values = linked[present].sum(axis=0) if self.linking in _TOTAL_WITH_UNCLASSIFIED else segments_linked.sum(axis=0)
+        for col, value in zip(self.columns, total_values):
+            total_row[col] = value
+        if self.linking == "contribution":
+            total_row["Excess return"] = total_row["Return"] - total_row["BM Return"]
+        # Prepend the row to the DataFrame
+        return pd.concat([pd.DataFrame([total_row]), result_df], ignore_index=True)
+
+    def _smooth_window(self, window):
+        # Smoothing of the rows of the window, for effects that can't be linked with prefix sums
+        start_dates = pd.to_datetime(self.unlinked_df["Start Date"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        in_window = np.zeros(len(start_dates), dtype=bool)
+        if window is not None:
+            first, last = window
+            in_window = (start_dates >= self.start_ordinals[first]) & (start_dates <= self.start_ordinals[last])
+        return modified_frongello_smoothing_vectorized(self.unlinked_df[in_window], self.breakdown)
+
+    def _link(self, first, last, n_codes):
+        # Rows of every segment within the window, as [lo, hi) ranges of the sorted rows
+        segment_keys = np.arange(n_codes, dtype=np.int64) * self.n_dates
+        lo = np.searchsorted(self.row_keys, segment_keys + first, side="left")
+        hi = np.searchsorted(self.row_keys, segment_keys + last, side="right")
+        present = hi > lo
+        sums = [prefix[hi] - prefix[lo] for prefix in self.prefix_sums]
+
+        ptf_growth = self.ptf_growth[last + 1] / self.ptf_growth[first]
+        bm_growth = self.bm_growth[last + 1] / self.bm_growth[first]
+
+        if self.linking == "grap":
+            linked = sums[0] * (self.bm_growth[last + 1] / self.ptf_growth[first])
+        elif self.linking == "carino":
+            linked = sums[0] / log_linking_coefficient(ptf_growth - 1, bm_growth - 1)
+        elif self.linking == "menchero":
+            scaling, residual_factor = menchero_coefficients(
+                ptf_growth - 1, bm_growth - 1, last - first + 1,
+                self.excess_sums[last + 1] - self.excess_sums[first],
+                self.squared_excess_sums[last + 1] - self.squared_excess_sums[first]
+            )
+            linked = scaling * sums[0] + residual_factor * sums[1]
+        elif self.linking == "modified_frongello":
+            # Growth of each segment up to its last row in the window
+            final_growth = np.exp(self.segment_log_growth[np.where(present, hi - 1, 0)]) if len(self.row_keys) else np.ones(n_codes)
+            linked = 0.5 * final_growth[:, np.newaxis] * (sums[0] / self.ptf_growth[first] + sums[1] / self.bm_growth[first])
+        else:
+            linked = np.hstack([sums[0] / self.ptf_growth[first], sums[1] / self.bm_growth[first]])
+
+        return np.where(present[:, np.newaxis], linked, 0.0), present
+
+
+def period_end_dates(ptf_list, bm, ptf_df, bm_df):
+    """
+    End Date of every period of the portfolios and benchmark, as a Series indexed by Start Date.
+
+    ptf_df and bm_df can be DataFrames or indexed or streamed inputs, as in prepare_data.
+    """
+    rows = [
+        select_rows(ptf_df, "Portfolio", ptf_list, pd.Timestamp.min, pd.Timestamp.max),
+        select_rows(bm_df, "Benchmark", [bm], pd.Timestamp.min, pd.Timestamp.max)
+    ]
+    dates_df = pd.concat([df[["Start Date", "End Date"]] for df in rows], ignore_index=True)
+    dates_df = dates_df.apply(pd.to_datetime)
+    return dates_df.groupby("Start Date")["End Date"].max()
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from .date_index import DatePartitionedFrame, _date_ordinals, _MISSING_END_ORDINAL, select_rows
+
+# Keys of the instrument-period rows of prepare_data
+INSTRUMENT_PERIOD_COLUMNS = ["Start Date", "Instrument", "ProductTaxonomy"]
+
+
+class PortfolioArrays:
+    """
+    Portfolio input aggregated once per portfolio and instrument-period, for composites of any portfolios.
+
+    The rows of every portfolio are summed per (Start Date, Instrument, ProductTaxonomy) when the input
+    is indexed, with the instrument-periods of all portfolios numbered on one shared, sorted index. The
+    instrument-periods of a composite of portfolios are then the per-portfolio arrays of the selected
+    portfolios added on that index: its cost follows the number of rows of the selected portfolios, and
+    the raw rows are not filtered nor grouped again for each new combination.
+
+    prepare_data accepts it in place of the portfolio DataFrame. The result of a single portfolio is the
+    same as with the DataFrame to the last bit. Composites add the per-portfolio sums in the order the
+    portfolios appear in the input, where prepare_data sums the raw rows with pandas' compensated
+    summation, so they can differ from it by rounding. Inputs with instrument-periods of a portfolio
+    ending on several End Dates are selected and aggregated row by row, as a DataFrame.
+    """
+
+    def __init__(self, df, key_column="Portfolio"):
+        self.key_column = key_column
+        self.value_columns = [col for col in df.columns if col not in [key_column, "End Date"] + INSTRUMENT_PERIOD_COLUMNS]
+
+        # Shared index of the instrument-periods of all portfolios, in the order of the groupby of prepare_data
+        groups = df.groupby(INSTRUMENT_PERIOD_COLUMNS, observed=True)
+        row_keys = groups.ngroup().to_numpy()
+        self.keys_df = groups.size().reset_index()[INSTRUMENT_PERIOD_COLUMNS]
+        self.start_ordinals = _date_ordinals(self.keys_df["Start Date"])
+
+        end_ordinals = _date_ordinals(df["End Date"])
+        end_ordinals[end_ordinals == np.iinfo(np.int64).min] = _MISSING_END_ORDINAL
+
+        # Sums per portfolio and instrument-period, rows without a key are dropped as by the groupby
+        keep = row_keys >= 0
+        portfolio_codes, portfolios = pd.factorize(df[key_column])
+        portfolio_sums = df[self.value_columns][keep].groupby(
+            [portfolio_codes[keep], row_keys[keep]]
+        ).sum()
+        self.value_dtypes = portfolio_sums.dtypes
+        end_ranges = pd.Series(end_ordinals[keep]).groupby([portfolio_codes[keep], row_keys[keep]]).agg(["min", "max"])
+
+        self.row_by_row = bool((end_ranges["min"] != end_ranges["max"]).any())
+        if self.row_by_row:
+            self.rows = DatePartitionedFrame(df, key_column)
+            self.portfolios = {}
+            return
+
+        # Portfolios in order of appearance in the input, each with its sorted keys, End Dates and sums
+        codes = portfolio_sums.index.get_level_values(0).to_numpy()
+        keys = portfolio_sums.index.get_level_values(1).to_numpy()
+        ends = end_ranges["max"].to_numpy()
+        values = portfolio_sums.to_numpy(dtype=float)
+        bounds = np.searchsorted(codes, np.arange(len(portfolios) + 1))
+        self.portfolios = {
+            portfolio: (keys[bounds[code]:bounds[code + 1]], ends[bounds[code]:bounds[code + 1]],
+                        values[bounds[code]:bounds[code + 1]])
+            for code, portfolio in enumerate(portfolios)
+        }
+
+    def composite(self, keys, start_date, end_date):
+        """
+        Instrument-periods of the composite of the given portfolios with Start Date >= start_date and
+        End Date <= end_date, as aggregated by prepare_data.
+
+        Returns:
+            DataFrame with the Start Date, Instrument and ProductTaxonomy columns followed by the sums
+            of the value columns, sorted by the three keys
+        """
+        if self.row_by_row:
+            return aggregate_instrument_periods(select_rows(self.rows, self.key_column, keys, start_date, end_date),
+                                                self.key_column)
+
+        start_ordinal = pd.to_datetime(start_date).value
+        end_ordinal = pd.to_datetime(end_date).value
+
+        selected = set(keys)
+        selected_keys, selected_values = [], []
+        for portfolio in [portfolio for portfolio in self.portfolios if portfolio in selected]:
+            portfolio_keys, portfolio_ends, portfolio_values = self.portfolios[portfolio]
+            in_period = (self.start_ordinals[portfolio_keys] >= start_ordinal) & (portfolio_ends <= end_ordinal)
+            selected_keys.append(portfolio_keys[in_period])
+            selected_values.append(portfolio_values[in_period])
+
+        if len(selected_keys) == 1:
+            row_keys, values = selected_keys[0], selected_values[0]
+        elif selected_keys:
+            # Stable sort on the shared index: the sums of an instrument-period are added in portfolio order
+            all_keys = np.concatenate(selected_keys)
+            order = np.argsort(all_keys, kind="stable")
+            all_keys = all_keys[order]
+            starts = np.flatnonzero(np.diff(all_keys, prepend=-1))
+            row_keys = all_keys[starts]
+            values = np.concatenate(selected_values)[order]
+            values = np.add.reduceat(values, starts, axis=0) if len(starts) else values
+        else:
+            row_keys, values = np.empty(0, dtype=np.int64), np.empty((0, len(self.value_columns)))
+
+        composite_df = self.keys_df.iloc[row_keys].reset_index(drop=True)
+        values_df = pd.DataFrame(values, columns=self.value_columns).astype(self.value_dtypes)
+        return pd.concat([composite_df, values_df], axis=1)
+
+
+def aggregate_instrument_periods(rows, key_column="Portfolio"):
+    """
+    Sum selected portfolio rows per instrument-period, the names and End Dates being dropped.
+    """
+    rows = rows.drop([key_column, "End Date"], axis=1)
+    return rows.groupby(INSTRUMENT_PERIOD_COLUMNS, observed=True).sum().reset_index()
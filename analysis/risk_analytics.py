@@ -0,0 +1,118 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from config.settings import RISK_FREE_RATE
+
+# Periods per year of each measurement frequency, for annualization
+PERIODS_PER_YEAR = {"daily": 252, "weekly": 52, "monthly": 12}
+
+RISK_METRICS = ["Return", "Benchmark return", "Volatility", "Benchmark volatility", "Tracking error", "Max drawdown",
+                "Beta", "Correlation", "Information ratio", "Jensen alpha", "Sharpe ratio", "Sortino ratio",
+                "Treynor ratio"]
+
+# Largest number of values in one strided block of the max drawdown, blocks of windows are processed in turn
+_DRAWDOWN_BLOCK_SIZE = 4_000_000
+
+
+def rolling_risk_metrics(ptf_returns, bm_returns, window, periods_per_year=252, risk_free_rate=RISK_FREE_RATE):
+    """
+    Risk metrics of every window of consecutive periods, in a single pass over the returns.
+
+    The moments of each window come from differences of cumulative sums (returns, squares, cross
+    products and squared downside returns), so every window costs O(1) whatever its length. Returns
+    are centered on their mean before the squares are summed, which keeps the variances accurate.
+    The max drawdown depends on the path, it is computed on a strided view of the cumulative wealth.
+
+    Volatilities and tracking error are population standard deviations per period, as in
+    measurement_analytics_instrument. Ratios and Jensen alpha are annualized with periods_per_year,
+    risk_free_rate is an annual rate.
+
+    Args:
+        ptf_returns: Portfolio returns per period
+        bm_returns: Benchmark returns per period
+        window: Number of periods per window
+        periods_per_year: Periods per year of the returns
+        risk_free_rate: Annual risk free rate
+
+    Returns:
+        Dict of metric name -> array with one value per window, the window ending at period
+        window - 1 + i being at position i. Arrays are empty when there are fewer periods than window.
+    """
+    ptf = np.asarray(ptf_returns, dtype=np.float64)
+    bm = np.asarray(bm_returns, dtype=np.float64)
+    n_windows = len(ptf) - window + 1
+    if window < 1 or n_windows < 1:
+        return {metric: np.empty(0) for metric in RISK_METRICS}
+
+    rf = (1 + risk_free_rate) ** (1 / periods_per_year) - 1
+
+    def window_sums(values):
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        return cumulative[window:] - cumulative[:-window]
+
+    ptf_mean = window_sums(ptf) / window
+    bm_mean = window_sums(bm) / window
+
+    # Second moments on centered returns: var = E[(x - c)^2] - (E[x] - c)^2 for any constant c
+    ptf_centered = ptf - ptf.mean()
+    bm_centered = bm - bm.mean()
+    excess_centered = ptf_centered - bm_centered
+    ptf_shift = window_sums(ptf_centered) / window
+    bm_shift = window_sums(bm_centered) / window
+    excess_shift = ptf_shift - bm_shift
+
+    def window_variance(centered, shift):
+        squares = centered ** 2
+        variance = window_sums(squares) / window - shift ** 2
+        # Differences of cumulative sums carry rounding errors up to about eps * n * total, below which
+        # the variance is zero (e.g. constant returns, or one period windows)
+        noise = np.finfo(np.float64).eps * len(squares) * squares.sum() / window
+        return np.where(variance > noise, variance, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var_ptf = window_variance(ptf_centered, ptf_shift)
+        var_bm = window_variance(bm_centered, bm_shift)
+        var_excess = window_variance(excess_centered, excess_shift)
+        cov = window_sums(ptf_centered * bm_centered) / window - ptf_shift * bm_shift
+        downside_deviation = np.sqrt(window_sums(np.minimum(ptf - rf, 0.0) ** 2) / window)
+
+        vol = np.sqrt(var_ptf)
+        bm_vol = np.sqrt(var_bm)
+        tracking_error = np.sqrt(var_excess)
+        beta = cov / var_bm
+        correlation = cov / (vol * bm_vol)
+
+        ptf_premium = (ptf_mean - rf) * periods_per_year
+        bm_premium = (bm_mean - rf) * periods_per_year
+        annualization = np.sqrt(periods_per_year)
+
+        wealth = np.concatenate(([1.0], np.cumprod(1 + ptf)))
+        bm_wealth = np.concatenate(([1.0], np.cumprod(1 + bm)))
+
+        return {
+            "Return": wealth[window:] / wealth[:-window] - 1,
+            "Benchmark return": bm_wealth[window:] / bm_wealth[:-window] - 1,
+            "Volatility": vol,
+            "Benchmark volatility": bm_vol,
+            "Tracking error": tracking_error,
+            "Max drawdown": _rolling_max_drawdown(wealth, window),
+            "Beta": beta,
+            "Correlation": correlation,
+            "Information ratio": (ptf_mean - bm_mean) * periods_per_year / (tracking_error * annualization),
+            "Jensen alpha": ptf_premium - beta * bm_premium,
+            "Sharpe ratio": ptf_premium / (vol * annualization),
+            "Sortino ratio": ptf_premium / (downside_deviation * annualization),
+            "Treynor ratio": ptf_premium / beta
+        }
+
+
+def _rolling_max_drawdown(wealth, window):
+    # Largest fall from a running peak within each window of returns, as a negative return. The window
+    # of returns i..i+window-1 covers the wealth values i..i+window, drawdowns being ratios of wealth
+    # values they don't depend on the wealth at the start of the window.
+    views = sliding_window_view(wealth, window + 1)
+    block = max(_DRAWDOWN_BLOCK_SIZE // (window + 1), 1)
+    max_drawdown = np.empty(len(views))
+    for start in range(0, len(views), block):
+        values = views[start:start + block]
+        max_drawdown[start:start + block] = (values / np.maximum.accumulate(values, axis=1) - 1).min(axis=1)
+    return max_drawdown
@@ -0,0 +1,59 @@
+import pandas as pd
+from config.settings import STREAMING_CHUNK_SIZE
+from .date_index import filter_rows
+from .portfolio_arrays import INSTRUMENT_PERIOD_COLUMNS
+
+
+class ChunkedCsvInput:
+    """
+    Portfolio or benchmark csv export streamed in chunks, for exports larger than memory.
+
+    prepare_data accepts it in place of the DataFrame. Each selection reads the file in chunks of
+    chunksize rows, applies the name and date filters to every chunk and sums the selected rows of the
+    chunk per instrument-period, name and End Date. The partial sums of the chunks are then added, so
+    only one chunk and one row per selected instrument-period are held in memory. prepare_data sums
+    the raw rows of a DataFrame with pandas' compensated summation: when an instrument-period has rows
+    in several chunks, the streamed result can differ from it by rounding.
+
+    Chunks are parsed with the read_csv arguments given (dtype, ...) and the prepared data matches the
+    one of a DataFrame loaded with the same arguments.
+    """
+
+    def __init__(self, path, key_column, chunksize=STREAMING_CHUNK_SIZE, **read_csv_kwargs):
+        self.path = path
+        self.key_column = key_column
+        self.chunksize = chunksize
+        self.read_csv_kwargs = read_csv_kwargs
+
+    def chunks(self, usecols=None):
+        """
+        Iterate over the chunks of the file, restricted to usecols if given.
+        """
+        with pd.read_csv(self.path, chunksize=self.chunksize, usecols=usecols, **self.read_csv_kwargs) as reader:
+            yield from reader
+
+    def select(self, keys, start_date, end_date):
+        """
+        Rows of the given names with Start Date >= start_date and End Date <= end_date, summed per
+        instrument-period, name and End Date.
+        """
+        partial_sums = []
+        empty = None
+        for chunk in self.chunks():
+            rows = filter_rows(chunk, self.key_column, keys, start_date, end_date)
+            if empty is None:
+                empty = rows.iloc[:0]
+            if len(rows):
+                partial_sums.append(self._sum_rows(rows))
+
+        if not partial_sums:
+            # A file without rows gives no chunk, its header still gives the columns
+            return empty if empty is not None else pd.read_csv(self.path, nrows=0, **self.read_csv_kwargs)
+        if len(partial_sums) == 1:
+            return partial_sums[0]
+        return self._sum_rows(pd.concat(partial_sums, ignore_index=True))
+
+    def _sum_rows(self, rows):
+        # Sum per instrument-period, name and End Date, keeping the columns of the file in their order
+        sums = rows.groupby(INSTRUMENT_PERIOD_COLUMNS + [self.key_column, "End Date"], observed=True, dropna=False).sum()
+        return sums.reset_index()[rows.columns]
@@ -6,12 +6,15 @@ using various attribution models and contribution analysis methods.
 """
 import streamlit as st
 import datetime
+import time
 import numpy as np
 import pandas as pd
-from config.settings import PAGE_CONFIG, CLASSIFICATION_CRITERIA
-from utils import load_csv_files, validate_dataframes, style_dataframe, dataframe_height
-from ui.components import render_settings
-from ui.analysis_runner import run_analysis
+from config.settings import PAGE_CONFIG, CLASSIFICATION_CRITERIA, FIXED_INCOME_EFFECTS, PROFILE_OUTPUT_DIR, ANALYSIS_POLL_INTERVAL
+from utils import load_csv_files, validate_dataframes
+from ui.components import render_debug_panel, render_attribution_results, render_measurement_results
+from ui.analysis_cache import analysis_run_key, warm_analysis_results
+from ui.background import session_run, cancel_run, discard_run
+from utils.instrumentation import instrumented_run
 
 # Configure Streamlit page
 st.set_page_config(**PAGE_CONFIG)
@@ -41,7 +44,7 @@ classifications_df, portfolio_df, benchmark_df = load_csv_files(
 # Validate dataframes
 correct_format = False
 if not portfolio_df.empty and not benchmark_df.empty:
-    correct_format = validate_dataframes(portfolio_df, benchmark_df)
+    correct_format = validate_dataframes(portfolio_df, benchmark_df, classifications_df)
 
 # Main application logic
 if correct_format:
@@ -56,7 +59,7 @@ if correct_format:
         else:
             model = settings_row1[3].pills("Model", ["Standard fixed income attribution", "with Brinson Fachler on credit (POC)"], default="Standard fixed income attribution", key="model_fixed_income")
             # Define effects list based on fixed income model
-            effects_full_list = ["Income", "Yield curve", "Credit", "Rolldown", "Trading", "Global other"]
+            effects_full_list = FIXED_INCOME_EFFECTS["full_list"]
             if model == "Standard fixed income attribution":
                 effects = st.multiselect("Effects", effects_full_list, ["Rolldown", "Income", "Yield curve", "Credit"])
             else:
@@ -65,9 +68,9 @@ if correct_format:
                 effects_brinson[credit_index:credit_index+1] = ["Credit allocation", "Credit selection"]
                 effects = st.multiselect("Effects", effects_brinson, ["Rolldown", "Income", "Yield curve", "Credit allocation", "Credit selection"])
                 effects_brinson_instrument = list(dict.fromkeys(["Credit" if effect in ["Credit allocation", "Credit selection"] else effect for effect in effects]))
-        smoothing_algorithm = settings_row1[4].pills("Smoothing algorithm", ["Frongello", "Modified Frongello"], default="Frongello", key="smoothing_algorithm")
+        smoothing_algorithm = settings_row1[4].pills("Smoothing algorithm", ["Frongello", "Modified Frongello", "Carino", "Menchero"], default="Frongello", key="smoothing_algorithm")
 
-    # Second row of user settings: portfolios, benchmarks, performance period and decimals
+    # Second row of user settings: portfolios, benchmarks, performance period and frequency
     settings_row2 = st.columns(5)
 
     # Portfolios and benchmark to be loaded
@@ -114,30 +117,24 @@ if correct_format:
         start_date = performance_period_date_dict[performance_period]
         end_date = pd.to_datetime(portfolio_df["End Date"]).max()
 
-    decimal_places = settings_row2[3].segmented_control("Decimal places", [2, 4, 8, 12], default=2)
+    if contribution_attribution == "Measurement & Analytics":
+        frequency = settings_row2[3].pills("Frequency", ["daily", "weekly", "monthly"], default="daily", key="measurement_frequency")
+    else:
+        frequency = "daily"
 
     # Add some vertical space
     st.text("")
     st.text("")
 
-    # Create 2 rows and 2 columns, left column is for allocation criteria/instrument, right for analysis results
-    analysis_master_row = st.columns([0.25, 0.75])
-    analysis_details_row = st.columns([0.25, 0.75])
+    # Optional instrumentation of the run, switched on in the debug panel
+    debug_timings = st.session_state.get('debug_timings', False)
+    debug_trace_memory = st.session_state.get('debug_trace_memory', False)
+    debug_profile = st.session_state.get('debug_profile', False)
 
+    run = None
+    render_recorder = None
     if len(selected_portfolios) > 0:
-        if contribution_attribution == "Measurement & Analytics":
-            frequency = analysis_master_row[0].pills("Frequency", ["daily", "weekly", "monthly"], default="daily", key="measurement_frequency")
-            classification_criteria = None
-        else:
-            frequency = "daily"
-            # Render classification criteria selector on the left column (only for attribution/contribution)
-            classification_criteria = analysis_master_row[0].radio(
-                "Allocation criteria",
-                CLASSIFICATION_CRITERIA[asset_class],
-                key="classification_criteria"
-            )
-
-        # Create settings dict for analysis
+        # Create settings dict for analysis, the decimal places are chosen in the results fragments
         settings = {
             'asset_class': asset_class,
             'analysis_type': contribution_attribution,
@@ -145,7 +142,6 @@ if correct_format:
             'benchmark': selected_benchmark,
             'start_date': start_date,
             'end_date': end_date,
-            'decimals': decimal_places,
             'frequency': frequency
         }
 
@@ -155,61 +151,49 @@ if correct_format:
             if asset_class == "Fixed income":
                 settings['effects'] = effects
 
-        # Run the analysis
-        master_df, get_instruments = run_analysis(
-            settings,
-            portfolio_df,
-            benchmark_df,
-            classifications_df,
-            classification_criteria
-        )
-
-        # Display results depending on analysis type
         if contribution_attribution == "Measurement & Analytics":
-            analysis_master_row[1].markdown("**Return vs Benchmark chart**")
-            chart_df = master_df.set_index("Date")
-            analysis_master_row[1].line_chart(chart_df)
-            # Display instrument-level measurement analytics (volatility table, etc.)
-            analysis_details_row[1].markdown("**Measurement analytics:**")
-            details_df = get_instruments(None)
-            analysis_details_row[1].dataframe(
-                style_dataframe(details_df, settings['decimals']),
-                hide_index=True,
-                width=1000,
-                height=dataframe_height(details_df)
-            )
+            classification_criteria = None
         else:
-            # Display master-level results for Attribution/Contribution
-            analysis_master_row[1].markdown("**Performance analysis:**")
-            analysis_master_row[1].dataframe(
-                style_dataframe(master_df, settings['decimals']),
-                hide_index=True,
-                width=1000,
-                height=dataframe_height(master_df)
-            )
-
-            # Get classification values for drill-down
-            classification_values = [
-                val for val in master_df[classification_criteria].to_list()
-                if val not in ["Total"]
-            ]
-
-            # Render classification value selector
-            classification_value = analysis_details_row[0].radio(
-                f"Select a {classification_criteria}:",
-                classification_values,
-                key="classification_value"
-            )
-
-            # Get instrument-level details
-            details_df = get_instruments(classification_value)
-
-            # Display instrument-level results
-            analysis_details_row[1].markdown("**Instruments details:**")
-            analysis_details_row[1].dataframe(
-                style_dataframe(details_df, settings['decimals']),
-                hide_index=True,
-                width=1000,
-                height=dataframe_height(details_df)
-            )
+            # Criteria displayed first, the results of the other criteria are computed by the same run
+            classification_criteria = st.session_state.get('classification_criteria')
+            if classification_criteria not in CLASSIFICATION_CRITERIA[asset_class]:
+                classification_criteria = CLASSIFICATION_CRITERIA[asset_class][0]
+
+        # Run the analysis in the background, the run is kept across reruns with the same settings and
+        # cancelled when they change. Prepared data and results are cached across reruns and sessions.
+        run = session_run(
+            st.session_state,
+            (analysis_run_key(settings, portfolio_df, benchmark_df, classifications_df), debug_timings, debug_trace_memory, debug_profile),
+            lambda: warm_analysis_results(settings, portfolio_df, benchmark_df, classifications_df, classification_criteria),
+            trace_memory=debug_trace_memory,
+            profile_dir=PROFILE_OUTPUT_DIR if debug_profile else None
+        )
 
+        # Wait for the run, any widget change interrupts the wait and reruns the script
+        if not run.done():
+            waiting = st.empty()
+            with waiting.container():
+                progress = st.empty()
+                st.button("Cancel analysis", on_click=cancel_run, args=(st.session_state,), key="cancel_analysis")
+            while not run.done():
+                progress.info(run.progress_text())
+                time.sleep(ANALYSIS_POLL_INTERVAL)
+            waiting.empty()
+
+        if run.cancelled():
+            st.info("Analysis cancelled.")
+            st.button("Run the analysis", on_click=discard_run, args=(st.session_state,), key="restart_analysis")
+        else:
+            # Raise the error of the run, if any
+            run.result()
+            with instrumented_run(record=debug_timings, trace_memory=debug_trace_memory) as (render_recorder, _):
+                if contribution_attribution == "Measurement & Analytics":
+                    render_measurement_results(settings, portfolio_df, benchmark_df, classifications_df)
+                else:
+                    render_attribution_results(settings, portfolio_df, benchmark_df, classifications_df)
+
+    render_debug_panel(
+        run.recorder if run is not None and debug_timings else None,
+        run.profile if run is not None else None,
+        render_recorder
+    )
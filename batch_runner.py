@@ -0,0 +1,265 @@
+"""
+Headless batch runner for Performance Attribution and Contribution
+
+Runs the attribution and contribution models over a grid of portfolios x benchmarks x classification
+criteria x models x smoothing algorithms, without Streamlit. Each (portfolio, benchmark) pair is prepared
+once and processed in a worker of a process pool; results are written as columnar files, one per
+(portfolio, benchmark, model, smoothing) with the classification criteria stacked. The asset class of a
+pair is the one of the holdings of both its portfolio and its benchmark: only the attribution models of
+that asset class are run on it, and only Contribution when the portfolio and benchmark don't share one
+and no models are given.
+
+Example:
+    python batch_runner.py --models Brinson-Fachler Contribution --smoothing Frongello --output-dir results
+"""
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from analysis import ChunkedCsvInput, ClassificationTable, DatePartitionedFrame, PortfolioArrays
+from config.settings import CLASSIFICATION_CRITERIA
+from ui.analysis_runner import run_analysis, prepare_cube
+from ui.model_registry import MODEL_REGISTRY, SMOOTHING_REGISTRY, model_effects
+from utils.ingestion import read_csv_cached
+
+# Contribution is run through CONTRIBUTION_REGISTRY, it has no smoothing choice
+CONTRIBUTION_MODEL = "Contribution"
+
+# Asset class of each attribution model, used for the default classification criteria and effects
+MODEL_ASSET_CLASS = {
+    "Brinson-Fachler": "Equity",
+    "Brinson-Hood-Beebower": "Equity",
+    "Standard fixed income attribution": "Fixed income",
+    "with Brinson Fachler on credit (POC)": "Fixed income"
+}
+
+# Product taxonomies of the holdings of each asset class, a portfolio or benchmark holding those of only
+# one asset class is of that asset class
+ASSET_CLASS_TAXONOMIES = {
+    "Equity": ["Equities"],
+    "Fixed income": ["Bonds"]
+}
+
+# Input frames, loaded once per worker process by _init_worker
+_WORKER_DATA = {}
+
+
+def _init_worker(data_dir, chunk_size=None):
+    # Indexed once, every pair of the worker is then selected from per-portfolio sums or by binary search and classified by lookup
+    _WORKER_DATA["classifications_df"] = ClassificationTable(read_csv_cached(os.path.join(data_dir, "classifications.csv")))
+    if chunk_size:
+        # Exports larger than memory are streamed for every pair instead
+        _WORKER_DATA["portfolio_df"] = ChunkedCsvInput(os.path.join(data_dir, "portfolios.csv"), "Portfolio", chunk_size)
+        _WORKER_DATA["benchmark_df"] = ChunkedCsvInput(os.path.join(data_dir, "benchmarks.csv"), "Benchmark", chunk_size)
+    else:
+        _WORKER_DATA["portfolio_df"] = PortfolioArrays(read_csv_cached(os.path.join(data_dir, "portfolios.csv")), "Portfolio")
+        _WORKER_DATA["benchmark_df"] = DatePartitionedFrame(read_csv_cached(os.path.join(data_dir, "benchmarks.csv")), "Benchmark")
+
+
+def _input_summary(data_dir, chunk_size=None):
+    # Product taxonomies of every portfolio and benchmark, and date range of the inputs
+    if not chunk_size:
+        portfolio_df = read_csv_cached(os.path.join(data_dir, "portfolios.csv"))
+        benchmark_df = read_csv_cached(os.path.join(data_dir, "benchmarks.csv"))
+        portfolios, benchmarks = {}, {}
+        _add_taxonomies(portfolios, portfolio_df, "Portfolio")
+        _add_taxonomies(benchmarks, benchmark_df, "Benchmark")
+        return portfolios, benchmarks, portfolio_df["Start Date"].min(), portfolio_df["End Date"].max()
+
+    portfolios, benchmarks, start_dates, end_dates = {}, {}, [], []
+    portfolio_input = ChunkedCsvInput(os.path.join(data_dir, "portfolios.csv"), "Portfolio", chunk_size)
+    for chunk in portfolio_input.chunks(usecols=["Portfolio", "ProductTaxonomy", "Start Date", "End Date"]):
+        _add_taxonomies(portfolios, chunk, "Portfolio")
+        start_dates.append(pd.to_datetime(chunk["Start Date"]).min())
+        end_dates.append(pd.to_datetime(chunk["End Date"]).max())
+    benchmark_input = ChunkedCsvInput(os.path.join(data_dir, "benchmarks.csv"), "Benchmark", chunk_size)
+    for chunk in benchmark_input.chunks(usecols=["Benchmark", "ProductTaxonomy"]):
+        _add_taxonomies(benchmarks, chunk, "Benchmark")
+    return portfolios, benchmarks, min(start_dates), max(end_dates)
+
+
+def _add_taxonomies(taxonomies_by_name, df, key_column):
+    for name, taxonomies in df.groupby(key_column, observed=True)["ProductTaxonomy"].unique().items():
+        taxonomies_by_name.setdefault(name, set()).update(taxonomies)
+
+
+def _asset_class(taxonomies):
+    # Asset class of holdings with the product taxonomies, None when they are those of none or several
+    asset_classes = [asset_class for asset_class, names in ASSET_CLASS_TAXONOMIES.items() if taxonomies & set(names)]
+    return asset_classes[0] if len(asset_classes) == 1 else None
+
+
+def _pair_asset_class(portfolio_taxonomies, benchmark_taxonomies):
+    # Asset class shared by the portfolio and the benchmark, None when they don't share one
+    asset_class = _asset_class(benchmark_taxonomies)
+    return asset_class if _asset_class(portfolio_taxonomies) == asset_class else None
+
+
+def _pair_models(models, asset_class, explicit_models):
+    # Attribution models of the asset class of the pair and Contribution. When the asset class is unknown,
+    # the models given explicitly are all run and the default ones are reduced to Contribution.
+    if asset_class is None:
+        return models if explicit_models else [CONTRIBUTION_MODEL]
+    return [model for model in models if model == CONTRIBUTION_MODEL or MODEL_ASSET_CLASS[model] == asset_class]
+
+
+def _file_name(*parts):
+    return "__".join(re.sub(r"[^A-Za-z0-9._-]+", "_", part) for part in parts)
+
+
+def run_pair(portfolio, benchmark, start_date, end_date, criteria, models, smoothings, output_dir, output_format,
+             asset_class=None):
+    """
+    Run every criteria x model x smoothing combination for one portfolio and benchmark.
+
+    asset_class is the asset class of the pair, whose criteria are the default ones of Contribution
+    (the criteria of every asset class when None).
+
+    Returns the list of written files.
+    """
+    portfolio_df = _WORKER_DATA["portfolio_df"]
+    benchmark_df = _WORKER_DATA["benchmark_df"]
+    classifications_df = _WORKER_DATA["classifications_df"]
+
+    selection = {
+        'portfolios': [portfolio],
+        'benchmark': benchmark,
+        'start_date': start_date,
+        'end_date': end_date
+    }
+    cube = prepare_cube(selection, portfolio_df, benchmark_df, classifications_df)
+
+    written_files = []
+    for model in models:
+        if model == CONTRIBUTION_MODEL:
+            runs = [(None, {**selection, 'asset_class': asset_class, 'analysis_type': "Contribution"})]
+            asset_classes = [asset_class] if asset_class is not None else list(CLASSIFICATION_CRITERIA)
+        else:
+            runs = [
+                (smoothing, {**selection, 'asset_class': MODEL_ASSET_CLASS[model], 'analysis_type': "Attribution",
+                             'model': model, 'smoothing': smoothing, 'effects': model_effects(model)})
+                for smoothing in smoothings
+            ]
+            asset_classes = [MODEL_ASSET_CLASS[model]]
+
+        # Default criteria: every criteria of the model's asset class
+        model_criteria = criteria or list(dict.fromkeys(
+            criterion for asset_class in asset_classes for criterion in CLASSIFICATION_CRITERIA[asset_class]
+        ))
+
+        for smoothing, settings in runs:
+            results = []
+            for classification_criteria in model_criteria:
+                master_df, _ = run_analysis(settings, portfolio_df, benchmark_df, classifications_df,
+                                            classification_criteria, cube=cube)
+                master_df = master_df.rename(columns={classification_criteria: "Segment"})
+                master_df.insert(0, "Classification criteria", classification_criteria)
+                results.append(master_df)
+
+            result_df = pd.concat(results, ignore_index=True)
+            for column, value in (("Smoothing", smoothing or ""), ("Model", model),
+                                  ("Benchmark", benchmark), ("Portfolio", portfolio)):
+                result_df.insert(0, column, value)
+
+            file_path = os.path.join(output_dir, _file_name(portfolio, benchmark, model, smoothing or "none"))
+            if output_format == "parquet":
+                file_path += ".parquet"
+                result_df.to_parquet(file_path, index=False)
+            else:
+                file_path += ".csv"
+                result_df.to_csv(file_path, index=False)
+            written_files.append(file_path)
+
+    return written_files
+
+
+def run_batch(data_dir, output_dir, portfolios=None, benchmarks=None, criteria=None, models=None, smoothings=None,
+              start_date=None, end_date=None, output_format="parquet", max_workers=None, chunk_size=None):
+    """
+    Run the batch over the grid of portfolios x benchmarks in a process pool.
+
+    Portfolios and benchmarks default to all the ones in the input files, models to every model of
+    MODEL_REGISTRY plus Contribution, smoothings to every algorithm of SMOOTHING_REGISTRY and the date
+    range to the full history. Each pair only runs the attribution models of the asset class of its
+    portfolio and benchmark (see ASSET_CLASS_TAXONOMIES), pairs without a shared asset class run the
+    models given or Contribution by default. With a chunk_size, the portfolio and benchmark files are streamed in
+    chunks of that many rows instead of being loaded in memory.
+    """
+    # Typed load, it also fills the columnar cache used by the workers
+    read_csv_cached(os.path.join(data_dir, "classifications.csv"))
+    all_portfolios, all_benchmarks, first_date, last_date = _input_summary(data_dir, chunk_size)
+
+    portfolios = portfolios or sorted(all_portfolios)
+    benchmarks = benchmarks or sorted(all_benchmarks)
+    explicit_models = bool(models)
+    models = models or list(MODEL_REGISTRY) + [CONTRIBUTION_MODEL]
+    smoothings = smoothings or list(SMOOTHING_REGISTRY)
+    start_date = start_date or first_date
+    end_date = end_date or last_date
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    written_files = []
+    pairs = []
+    for portfolio in portfolios:
+        for benchmark in benchmarks:
+            asset_class = _pair_asset_class(all_portfolios.get(portfolio, set()), all_benchmarks.get(benchmark, set()))
+            pair_models = _pair_models(models, asset_class, explicit_models)
+            if asset_class is None and not explicit_models:
+                print(f"{portfolio} / {benchmark}: no shared asset class, only {CONTRIBUTION_MODEL} is run "
+                      f"(use --models to run attribution models)")
+            if not pair_models:
+                print(f"{portfolio} / {benchmark}: no model of the {asset_class} asset class selected, skipped")
+                continue
+            pairs.append((portfolio, benchmark, asset_class, pair_models))
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data_dir, chunk_size)) as executor:
+        futures = {
+            executor.submit(run_pair, portfolio, benchmark, start_date, end_date, criteria, pair_models, smoothings,
+                            output_dir, output_format, asset_class): (portfolio, benchmark)
+            for portfolio, benchmark, asset_class, pair_models in pairs
+        }
+        for future in as_completed(futures):
+            portfolio, benchmark = futures[future]
+            files = future.result()
+            print(f"{portfolio} / {benchmark}: {len(files)} files written")
+            written_files.extend(files)
+
+    return written_files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run performance attribution and contribution in batch.")
+    parser.add_argument("--data-dir", default="./data", help="Directory with portfolios.csv, benchmarks.csv and classifications.csv")
+    parser.add_argument("--output-dir", default="./results", help="Directory for the result files")
+    parser.add_argument("--portfolios", nargs="+", help="Portfolios to run (default: all)")
+    parser.add_argument("--benchmarks", nargs="+", help="Benchmarks to run (default: all)")
+    parser.add_argument("--criteria", nargs="+", help="Classification criteria (default: all criteria of each model's asset class)")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_REGISTRY) + [CONTRIBUTION_MODEL], help="Models to run, attribution models only on the pairs of their asset class (default: all)")
+    parser.add_argument("--smoothing", nargs="+", choices=list(SMOOTHING_REGISTRY), help="Smoothing algorithms (default: all)")
+    parser.add_argument("--start-date", type=pd.Timestamp, help="Start of the analysis period (default: first date)")
+    parser.add_argument("--end-date", type=pd.Timestamp, help="End of the analysis period (default: last date)")
+    parser.add_argument("--format", dest="output_format", choices=["parquet", "csv"], default="parquet", help="Result file format")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--chunk-size", type=int, help="Stream the portfolio and benchmark files in chunks of this many rows")
+    args = parser.parse_args(argv)
+
+    run_batch(
+        args.data_dir,
+        args.output_dir,
+        portfolios=args.portfolios,
+        benchmarks=args.benchmarks,
+        criteria=args.criteria,
+        models=args.models,
+        smoothings=args.smoothing,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        output_format=args.output_format,
+        max_workers=args.workers,
+        chunk_size=args.chunk_size
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,19 @@ from .settings import (
     DEFAULT_PORTFOLIOS,
     CLASSIFICATION_CRITERIA,
     FIXED_INCOME_EFFECTS,
-    PAGE_CONFIG
+    PAGE_CONFIG,
+    INGESTION_CACHE_DIR,
+    RESULT_STORE_PATH,
+    RESULT_STORE_MAX_MIB,
+    STREAMING_CHUNK_SIZE,
+    ANALYSIS_WORKERS,
+    ANALYSIS_POLL_INTERVAL,
+    STYLED_ROWS_LIMIT,
+    DISPLAY_PAGE_SIZE,
+    DATAFRAME_MAX_ROWS,
+    PROFILE_OUTPUT_DIR,
+    RISK_FREE_RATE,
+    ROLLING_WINDOWS
 )
 
 __all__ = [
@@ -15,5 +27,17 @@ __all__ = [
     'DEFAULT_PORTFOLIOS',
     'CLASSIFICATION_CRITERIA',
     'FIXED_INCOME_EFFECTS',
-    'PAGE_CONFIG'
+    'PAGE_CONFIG',
+    'INGESTION_CACHE_DIR',
+    'RESULT_STORE_PATH',
+    'RESULT_STORE_MAX_MIB',
+    'STREAMING_CHUNK_SIZE',
+    'ANALYSIS_WORKERS',
+    'ANALYSIS_POLL_INTERVAL',
+    'STYLED_ROWS_LIMIT',
+    'DISPLAY_PAGE_SIZE',
+    'DATAFRAME_MAX_ROWS',
+    'PROFILE_OUTPUT_DIR',
+    'RISK_FREE_RATE',
+    'ROLLING_WINDOWS'
 ]
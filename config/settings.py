@@ -60,7 +60,18 @@ CLASSIFICATION_CRITERIA = {
 # Fixed income effects analysis options
 FIXED_INCOME_EFFECTS = {
     "full_list": ["Income", "Yield curve", "Credit", "Rolldown", "Trading", "Global other"],
-    "default": ["Income", "Yield curve", "Credit"]
+    "default": ["Income", "Yield curve", "Credit"],
+    # Effects computed by the effects analysis and the suffix of their DeltaMv<suffix>_portfolio/_benchmark columns
+    "columns": {
+        "Price": "Price",
+        "Trading": "Trading",
+        "Currency": "Currency",
+        "Global other": "GlobalOther",
+        "Rolldown": "Rolldown",
+        "Income": "Income",
+        "Yield curve": "YieldCurves",
+        "Credit": "Credit"
+    }
 }
 
 # Custom date range defaults (for custom period selection)
@@ -68,3 +79,35 @@ CUSTOM_DATE_DEFAULTS = {
     "start_date": datetime.date(2020, 1, 1),
     "end_date": datetime.date(2020, 10, 6)
 }
+
+# Directory of the columnar cache of uploaded input files (local csv files are cached next to them)
+INGESTION_CACHE_DIR = "./data/.cache"
+
+# Persistent store of the analysis outputs shared by the app sessions and processes, None to disable it
+RESULT_STORE_PATH = "./data/.cache/results.sqlite"
+RESULT_STORE_MAX_MIB = 512
+
+# Rows per chunk when the portfolio and benchmark exports are streamed instead of loaded in memory
+STREAMING_CHUNK_SIZE = 200_000
+
+# Threads running the analyses of the app sessions in the background
+ANALYSIS_WORKERS = 4
+
+# Seconds between two refreshes of the progress of a background analysis
+ANALYSIS_POLL_INTERVAL = 0.1
+
+# Result tables with more rows are displayed page by page, only the displayed page being styled
+STYLED_ROWS_LIMIT = 1_000
+DISPLAY_PAGE_SIZE = 500
+
+# Rows shown at once in a result table, longer tables scroll
+DATAFRAME_MAX_ROWS = 25
+
+# Directory of the cProfile files saved from the debug panel
+PROFILE_OUTPUT_DIR = "./profiles"
+
+# Annual risk free rate of the Sharpe, Sortino and Treynor ratios and of Jensen alpha
+RISK_FREE_RATE = 0.0
+
+# Rolling windows of the risk analytics, label -> length in months
+ROLLING_WINDOWS = {"3M": 3, "6M": 6, "12M": 12, "36M": 36}
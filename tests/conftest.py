@@ -0,0 +1,90 @@
+"""
+Shared fixtures: the sample input files in data/, prepared once per test session, and a synthetic
+instrument-period frame with zero weights.
+"""
+import datetime
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import prepare_data
+from config.settings import FIXED_INCOME_EFFECTS
+from utils.ingestion import read_csv_cached
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# Full history of the sample data
+SAMPLE_START_DATE = datetime.date(2019, 10, 1)
+SAMPLE_END_DATE = datetime.date(2020, 10, 6)
+
+# Portfolio and benchmark pairs of the sample data per asset class
+SAMPLE_PAIRS = {
+    "Equity": (["EUR EQ LARGE CP"], "EURO STOXX 50"),
+    "Fixed income": (["LIQ EUR CORP"], "IBOXX E LIQ COR")
+}
+
+
+@pytest.fixture(scope="session")
+def sample_inputs():
+    """
+    Portfolios, benchmarks and classifications DataFrames of the sample data.
+    """
+    return tuple(read_csv_cached(os.path.join(DATA_DIR, name))
+                 for name in ("portfolios.csv", "benchmarks.csv", "classifications.csv"))
+
+
+@pytest.fixture(scope="session")
+def equity_data(sample_inputs):
+    """
+    prepare_data output of the equity sample pair over the full history.
+    """
+    portfolio_df, benchmark_df, classifications_df = sample_inputs
+    portfolios, benchmark = SAMPLE_PAIRS["Equity"]
+    return prepare_data(portfolios, benchmark, portfolio_df, benchmark_df, classifications_df,
+                        SAMPLE_START_DATE, SAMPLE_END_DATE)
+
+
+@pytest.fixture(scope="session")
+def fixed_income_data(sample_inputs):
+    """
+    prepare_data output of the fixed income sample pair over the full history.
+    """
+    portfolio_df, benchmark_df, classifications_df = sample_inputs
+    portfolios, benchmark = SAMPLE_PAIRS["Fixed income"]
+    return prepare_data(portfolios, benchmark, portfolio_df, benchmark_df, classifications_df,
+                        SAMPLE_START_DATE, SAMPLE_END_DATE)
+
+
+@pytest.fixture(scope="session")
+def zero_weight_data():
+    """
+    Synthetic prepare_data output over three dates, classified by "Segment", with a segment only held by the
+    portfolio, a segment only held by the benchmark, an instrument not held by the portfolio and an unclassified
+    instrument.
+    """
+    rng = np.random.default_rng(0)
+    instruments = [
+        ("Bond A", "Held by both", True, True),
+        ("Bond B", "Held by both", False, True),
+        ("Bond C", "Zero benchmark weight", True, False),
+        ("Bond D", "Zero portfolio weight", False, True),
+        ("Bond E", None, True, True)
+    ]
+    delta_mv_suffixes = ["", *FIXED_INCOME_EFFECTS["columns"].values()]
+    rows = []
+    for date in pd.date_range("2020-01-01", periods=3, freq="MS"):
+        for description, segment, in_portfolio, in_benchmark in instruments:
+            row = {"Start Date": date, "Product description": description, "Segment": segment}
+            for side, held in (("_portfolio", in_portfolio), ("_benchmark", in_benchmark)):
+                row["PreviousMv" + side] = rng.uniform(50, 150) if held else 0.0
+                for suffix in delta_mv_suffixes:
+                    row["DeltaMv" + suffix + side] = rng.normal(0, 2) if held else 0.0
+            rows.append(row)
+
+    data_df = pd.DataFrame(rows)
+    for side in ("_portfolio", "_benchmark"):
+        totals = data_df.groupby("Start Date")[["PreviousMv" + side, "DeltaMv" + side]].transform("sum")
+        data_df["TotalPreviousMv" + side] = totals["PreviousMv" + side]
+        data_df["TotalDeltaMv" + side] = totals["DeltaMv" + side]
+        data_df["TotalReturn" + side] = totals["DeltaMv" + side] / totals["PreviousMv" + side]
+    return data_df
@@ -0,0 +1,229 @@
+"""
+Performance benchmark suite for data preparation, attribution models, smoothing and measurement.
+
+Synthetic inputs are generated for every point of a scaling grid (instruments x periods x portfolios x
+classification values). Each step is timed (best of --repeat runs) and memory-profiled (peak traced
+allocation of one more run with tracemalloc). Results are written to a csv file in --output-dir, and
+compared with a previous results file given as --baseline: steps slower or larger than --tolerance
+times the baseline are reported and the exit status is 1.
+
+Example:
+    python -m tests.performance.benchmark_suite --instruments 500 2000 --periods 12 60
+    python -m tests.performance.benchmark_suite --baseline benchmark_results/benchmark_20250101_120000.csv
+"""
+import argparse
+import datetime
+import itertools
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from analysis import AttributionCube, PeriodQueryEngine, PortfolioArrays, prepare_data
+from config.settings import FIXED_INCOME_EFFECTS
+from ui.model_registry import (
+    MODEL_REGISTRY,
+    CONTRIBUTION_REGISTRY,
+    SMOOTHING_REGISTRY,
+    CONTRIBUTION_SMOOTHING,
+    MEASUREMENT_REGISTRY,
+    PERIOD_LINKING,
+    model_effects
+)
+from utils import style_dataframe
+from .synthetic_data import BENCHMARK_NAME, generate_inputs
+
+GRID_COLUMNS = ["instruments", "periods", "portfolios", "segments"]
+
+# Steps faster or smaller than this are not compared with the baseline, their measures are mostly noise
+MIN_COMPARED_SECONDS = 0.05
+MIN_COMPARED_MIB = 1.0
+
+BRINSON_CREDIT_EFFECTS = model_effects("with Brinson Fachler on credit (POC)", FIXED_INCOME_EFFECTS["default"])
+
+# Classification criteria, extra master arguments and extra instrument arguments of each model
+MODEL_ARGUMENTS = {
+    "Brinson-Fachler": ("GICS sector", (), ()),
+    "Brinson-Hood-Beebower": ("GICS sector", (), ()),
+    "Standard fixed income attribution": ("S&P rating", (FIXED_INCOME_EFFECTS["default"], "standard"), (FIXED_INCOME_EFFECTS["default"],)),
+    "with Brinson Fachler on credit (POC)": ("S&P rating", (BRINSON_CREDIT_EFFECTS, "brinson"), (FIXED_INCOME_EFFECTS["default"],))
+}
+
+
+def measure(func, repeat, setup=None):
+    """
+    Best wall time over repeat runs and peak traced memory of one more run.
+
+    When setup is given, it is called before every run, outside of the measurement, and its result
+    is passed to func.
+
+    Returns:
+        Tuple of (seconds, peak_bytes, result)
+    """
+    timings = []
+    for _ in range(repeat):
+        arguments = (setup(),) if setup is not None else ()
+        start = time.perf_counter()
+        result = func(*arguments)
+        timings.append(time.perf_counter() - start)
+
+    arguments = (setup(),) if setup is not None else ()
+    tracemalloc.start()
+    try:
+        func(*arguments)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak_bytes, result
+
+
+def run_grid_point(n_instruments, n_periods, n_portfolios, n_segments, repeat, seed=0):
+    """
+    Benchmark every step on one synthetic data set.
+
+    Returns:
+        List of result rows (dicts)
+    """
+    portfolio_df, benchmark_df, classifications_df = generate_inputs(
+        n_instruments=n_instruments, n_periods=n_periods, n_portfolios=n_portfolios, n_segments=n_segments, seed=seed
+    )
+    portfolios = sorted(portfolio_df["Portfolio"].unique())
+    start_date = portfolio_df["Start Date"].min()
+    end_date = portfolio_df["End Date"].max()
+
+    rows = []
+
+    def record(step, func, setup=None):
+        seconds, peak_bytes, result = measure(func, repeat, setup)
+        rows.append({
+            "instruments": n_instruments,
+            "periods": n_periods,
+            "portfolios": n_portfolios,
+            "segments": n_segments,
+            "input_rows": len(portfolio_df) + len(benchmark_df),
+            "step": step,
+            "seconds": seconds,
+            "peak_mib": peak_bytes / 2 ** 20,
+            "output_rows": len(result) if hasattr(result, "__len__") else np.nan
+        })
+        print(f"  {step:<75} {seconds:9.4f} s {peak_bytes / 2 ** 20:9.1f} MiB")
+        return result
+
+    merged_df = record("prepare_data", lambda: prepare_data(
+        portfolios, BENCHMARK_NAME, portfolio_df, benchmark_df, classifications_df, start_date, end_date
+    ))
+    cube = record("AttributionCube", lambda: AttributionCube(merged_df))
+
+    # Composites are added up from the per-portfolio sums, computed once per input
+    portfolio_arrays = record("PortfolioArrays", lambda: PortfolioArrays(portfolio_df))
+    record("prepare_data (portfolio arrays)", lambda: prepare_data(
+        portfolios, BENCHMARK_NAME, portfolio_arrays, benchmark_df, classifications_df, start_date, end_date
+    ))
+
+    for model, model_funcs in MODEL_REGISTRY.items():
+        classification_criteria, master_args, instrument_args = MODEL_ARGUMENTS.get(model, ("GICS sector", (), ()))
+        classification_value = merged_df[classification_criteria].dropna().iloc[0]
+
+        # Segment sums are cached in the cube, every master run gets a new cube
+        master_df = record(f"{model} master",
+                           lambda new_cube: model_funcs["master"](new_cube, classification_criteria, *master_args),
+                           setup=lambda: AttributionCube(merged_df))
+        instruments_df = record(f"{model} instrument", lambda: model_funcs["instrument"](
+            cube, classification_criteria, classification_value, *instrument_args
+        ))
+        if "all_instruments" in model_funcs:
+            record(f"{model} all_instruments",
+                   lambda: model_funcs["all_instruments"](cube, classification_criteria, *instrument_args))
+
+        for smoothing, smoothing_func in SMOOTHING_REGISTRY.items():
+            record(f"{model} {smoothing} smoothing", lambda: smoothing_func(master_df, classification_criteria))
+            record(f"{model} {smoothing} instrument smoothing",
+                   lambda: smoothing_func(instruments_df, "Product description"))
+
+    # Cell styles of a drill-down table, computed as Streamlit does when it displays a Styler
+    record("Style instruments", lambda: style_dataframe(instruments_df, 4)._compute())
+
+    classification_value = merged_df["GICS sector"].dropna().iloc[0]
+    contribution_df = record("Contribution master",
+                             lambda new_cube: CONTRIBUTION_REGISTRY["master"](new_cube, "GICS sector"),
+                             setup=lambda: AttributionCube(merged_df))
+    record("Contribution instrument",
+           lambda: CONTRIBUTION_REGISTRY["instrument"](cube, "GICS sector", classification_value))
+    record("Contribution smoothing", lambda: CONTRIBUTION_SMOOTHING(contribution_df, "GICS sector"))
+
+    # Period engines are built once over the full history, then queried for any performance period
+    master_df = MODEL_REGISTRY["Brinson-Fachler"]["master"](cube, "GICS sector")
+    period_start = sorted(portfolio_df["Start Date"].unique())[n_periods // 2]
+    for smoothing, linking in PERIOD_LINKING.items():
+        engine = record(f"Period engine {smoothing}", lambda: PeriodQueryEngine(master_df, "GICS sector", linking))
+        record(f"Period query {smoothing}", lambda: engine.query(period_start, end_date))
+
+    for frequency in ("daily", "weekly"):
+        record(f"Measurement master ({frequency})", lambda: MEASUREMENT_REGISTRY["master"](cube, frequency=frequency))
+        record(f"Measurement instrument ({frequency})",
+               lambda: MEASUREMENT_REGISTRY["instrument"](cube, None, None, frequency=frequency))
+        record(f"Measurement rolling ({frequency})", lambda: MEASUREMENT_REGISTRY["rolling"](cube, frequency=frequency))
+
+    return rows
+
+
+def compare_with_baseline(results_df, baseline_df, tolerance):
+    """
+    Steps whose time or peak memory exceed tolerance times the baseline.
+    """
+    keys = GRID_COLUMNS + ["step"]
+    compared_df = results_df.merge(baseline_df[keys + ["seconds", "peak_mib"]], on=keys, suffixes=("", "_baseline"))
+    compared_df["time_ratio"] = compared_df["seconds"] / compared_df["seconds_baseline"]
+    compared_df["memory_ratio"] = compared_df["peak_mib"] / compared_df["peak_mib_baseline"]
+
+    slower = (compared_df["time_ratio"] > tolerance) & (compared_df["seconds"] >= MIN_COMPARED_SECONDS)
+    larger = (compared_df["memory_ratio"] > tolerance) & (compared_df["peak_mib"] >= MIN_COMPARED_MIB)
+    return compared_df[slower | larger]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the performance attribution pipeline on synthetic data.")
+    parser.add_argument("--instruments", nargs="+", type=int, default=[500, 2000], help="Instruments in the universe")
+    parser.add_argument("--periods", nargs="+", type=int, default=[12, 60], help="Number of monthly periods")
+    parser.add_argument("--portfolios", nargs="+", type=int, default=[1, 4], help="Number of portfolios")
+    parser.add_argument("--segments", nargs="+", type=int, default=[10], help="Values per classification criteria")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per step, the best one is kept")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument("--output-dir", default="./benchmark_results", help="Directory of the results files")
+    parser.add_argument("--baseline", help="Previous results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Time or memory ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n_instruments, n_periods, n_portfolios, n_segments in itertools.product(
+            args.instruments, args.periods, args.portfolios, args.segments):
+        print(f"{n_instruments} instruments, {n_periods} periods, {n_portfolios} portfolios, {n_segments} segments")
+        rows.extend(run_grid_point(n_instruments, n_periods, n_portfolios, n_segments, args.repeat, args.seed))
+
+    results_df = pd.DataFrame(rows)
+    results_df["python"] = platform.python_version()
+    results_df["pandas"] = pd.__version__
+    results_df["numpy"] = np.__version__
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    results_file = os.path.join(args.output_dir, f"benchmark_{datetime.datetime.now():%Y%m%d_%H%M%S}.csv")
+    results_df.to_csv(results_file, index=False)
+    print(f"Results written to {results_file}")
+
+    if args.baseline:
+        regressions_df = compare_with_baseline(results_df, pd.read_csv(args.baseline), args.tolerance)
+        if len(regressions_df):
+            print(f"Regressions against {args.baseline}:")
+            print(regressions_df[GRID_COLUMNS + ["step", "seconds", "seconds_baseline", "time_ratio",
+                                                 "peak_mib", "peak_mib_baseline", "memory_ratio"]].to_string(index=False))
+            return 1
+        print(f"No regression against {args.baseline}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
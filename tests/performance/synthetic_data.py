@@ -0,0 +1,112 @@
+"""
+Synthetic portfolios, benchmarks and classifications for the performance benchmarks.
+
+The frames have the column layout of the Performance service exports checked by
+utils.csv_loading.validate_dataframes, and the classifications the layout of data/classifications.csv.
+"""
+import numpy as np
+import pandas as pd
+
+# Column layout checked by validate_dataframes
+MV_COLUMNS = ["DeltaMv", "PreviousMv", "DeltaMvPrice", "DeltaMvTrading", "DeltaMvCurrency", "DeltaMvGlobalOther",
+              "DeltaMvRolldown", "DeltaMvIncome", "DeltaMvYieldCurves", "DeltaMvCredit"]
+PORTFOLIOS_COLUMNS = ["Portfolio", "Instrument", "ProductTaxonomy", "Start Date", "End Date"] + MV_COLUMNS
+BENCHMARKS_COLUMNS = ["Benchmark", "Instrument", "ProductTaxonomy", "Start Date", "End Date"] + MV_COLUMNS
+
+# Effects decomposing DeltaMv (every DeltaMv<effect> column but PreviousMv)
+EFFECT_COLUMNS = MV_COLUMNS[2:]
+
+CLASSIFICATION_CRITERIA_COLUMNS = ["GICS sector", "GICS industry group", "GICS industry", "GICS sub-industry",
+                                   "Region", "Country", "S&P rating", "Fitch rating", "Moody's rating"]
+CLASSIFICATIONS_COLUMNS = ["Product", "Product type", "Issuer", "Product description"] + CLASSIFICATION_CRITERIA_COLUMNS
+
+# Product types of the instruments, with their share of the instruments and their taxonomy
+PRODUCT_TYPES = {
+    "Equity": (0.45, "Equities"),
+    "Bond": (0.45, "Bonds"),
+    "Cash": (0.04, "Cash"),
+    "Fees": (0.02, "Fund fee"),
+    "Derivative": (0.04, "Equity futures")
+}
+
+BENCHMARK_NAME = "SYNTHETIC BENCHMARK"
+
+
+def generate_inputs(n_instruments=500, n_periods=12, n_portfolios=1, n_segments=10, holding_ratio=0.6, seed=0):
+    """
+    Generate portfolios, benchmarks and classifications DataFrames.
+
+    Args:
+        n_instruments: Number of instruments in the universe
+        n_periods: Number of monthly periods
+        n_portfolios: Number of portfolios, each holding a random subset of the instruments
+        n_segments: Number of distinct values of every classification criteria
+        holding_ratio: Share of the universe held by each portfolio and by the benchmark
+        seed: Seed of the random generator
+
+    Returns:
+        Tuple of (portfolios_df, benchmarks_df, classifications_df), with dates as "YYYY-MM-DD" strings
+        as read from the csv files
+    """
+    rng = np.random.default_rng(seed)
+
+    instruments = np.array([f"INSTR{i:07d}" for i in range(n_instruments)], dtype=object)
+    shares = np.array([share for share, _ in PRODUCT_TYPES.values()])
+    product_types = np.array(list(PRODUCT_TYPES), dtype=object)[
+        rng.choice(len(PRODUCT_TYPES), size=n_instruments, p=shares / shares.sum())
+    ]
+    taxonomies = np.array([PRODUCT_TYPES[product_type][1] for product_type in product_types], dtype=object)
+
+    classifications_df = _generate_classifications(rng, instruments, product_types, n_segments)
+
+    # Monthly periods, each ending the day before the next one starts
+    period_starts = pd.date_range("2015-01-01", periods=n_periods + 1, freq="MS")
+    start_dates = period_starts[:-1].strftime("%Y-%m-%d").to_numpy(dtype=object)
+    end_dates = (period_starts[1:] - pd.Timedelta(days=1)).strftime("%Y-%m-%d").to_numpy(dtype=object)
+
+    portfolios_df = pd.concat([
+        _generate_holdings(rng, "Portfolio", f"SYNTHETIC PTF {p + 1}", instruments, taxonomies, start_dates, end_dates, holding_ratio)
+        for p in range(n_portfolios)
+    ], ignore_index=True)[PORTFOLIOS_COLUMNS]
+    benchmarks_df = _generate_holdings(
+        rng, "Benchmark", BENCHMARK_NAME, instruments, taxonomies, start_dates, end_dates, holding_ratio
+    )[BENCHMARKS_COLUMNS]
+
+    return portfolios_df, benchmarks_df, classifications_df
+
+
+def _generate_classifications(rng, instruments, product_types, n_segments):
+    classifications = {
+        "Product": instruments,
+        "Product type": product_types,
+        "Issuer": np.array([f"ISSUER {i}" for i in rng.integers(0, max(len(instruments) // 5, 1), len(instruments))], dtype=object),
+        "Product description": np.array([f"{instrument} DESC" for instrument in instruments], dtype=object)
+    }
+    for criteria in CLASSIFICATION_CRITERIA_COLUMNS:
+        values = np.array([f"{criteria} {k + 1}" for k in range(n_segments)], dtype=object)
+        classifications[criteria] = values[rng.integers(0, n_segments, len(instruments))]
+    return pd.DataFrame(classifications)[CLASSIFICATIONS_COLUMNS]
+
+
+def _generate_holdings(rng, name_column, name, instruments, taxonomies, start_dates, end_dates, holding_ratio):
+    # Each holder keeps the same instruments over all periods
+    held = np.flatnonzero(rng.random(len(instruments)) < holding_ratio)
+    n_periods = len(start_dates)
+    n_rows = len(held) * n_periods
+
+    previous_mv = rng.lognormal(mean=13, sigma=1.5, size=n_rows)
+    delta_mv = previous_mv * rng.normal(0.005, 0.04, size=n_rows)
+    # Effects decompose DeltaMv with random weights summing to one
+    weights = rng.dirichlet(np.ones(len(EFFECT_COLUMNS)), size=n_rows)
+
+    holdings_df = pd.DataFrame({
+        name_column: name,
+        "Instrument": np.tile(instruments[held], n_periods),
+        "ProductTaxonomy": np.tile(taxonomies[held], n_periods),
+        "Start Date": np.repeat(start_dates, len(held)),
+        "End Date": np.repeat(end_dates, len(held)),
+        "DeltaMv": delta_mv,
+        "PreviousMv": previous_mv
+    })
+    holdings_df[EFFECT_COLUMNS] = delta_mv[:, np.newaxis] * weights
+    return holdings_df
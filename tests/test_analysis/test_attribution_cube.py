@@ -0,0 +1,20 @@
+"""
+Segment sums of a cube shared by concurrent threads.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from analysis import AttributionCube
+from config.settings import CLASSIFICATION_CRITERIA
+
+
+def test_concurrent_segment_sums_are_reduced_once(equity_data):
+    cube = AttributionCube(equity_data)
+    criteria_list = CLASSIFICATION_CRITERIA["Equity"] * 8
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(cube.segment_sums, criteria_list))
+
+    for classification_criteria, (date_index, segment_index, sums) in zip(criteria_list, results):
+        # Every thread gets the single cached reduction of its criteria
+        assert cube.segment_sums(classification_criteria)[2] is sums
+        expected = equity_data.groupby(["Start Date", classification_criteria], observed=True)["DeltaMv_portfolio"].sum()
+        np.testing.assert_allclose(sums["DeltaMv_portfolio"], expected.to_numpy(), rtol=1e-12)
@@ -0,0 +1,60 @@
+"""
+Vectorized Brinson-Fachler against the row-wise brinson_fachler and brinson_fachler_instrument, on the sample
+data and on a synthetic frame with zero portfolio and benchmark weights.
+"""
+import pandas as pd
+import pytest
+from analysis import (
+    AttributionCube,
+    brinson_fachler,
+    brinson_fachler_instrument,
+    brinson_fachler_vectorized,
+    brinson_fachler_instrument_vectorized,
+    brinson_fachler_instrument_all_segments
+)
+from config.settings import CLASSIFICATION_CRITERIA
+
+
+def assert_same_frame(result, expected):
+    # Row labels differ between the row-wise filters and the array kernels, only the row order is compared
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-10, atol=1e-14)
+
+
+def assert_same_attribution(data_df, classification_criteria):
+    expected = brinson_fachler(data_df, classification_criteria)
+    values = data_df[classification_criteria].dropna().unique()
+    expected_instruments = {value: brinson_fachler_instrument(data_df, classification_criteria, value)
+                            for value in values}
+
+    # The models take the prepare_data DataFrame or the cube built from it
+    for data in (data_df, AttributionCube(data_df)):
+        assert_same_frame(brinson_fachler_vectorized(data, classification_criteria), expected)
+
+        all_segments = brinson_fachler_instrument_all_segments(data, classification_criteria)
+        assert set(all_segments) == set(values)
+        for value in values:
+            assert_same_frame(brinson_fachler_instrument_vectorized(data, classification_criteria, value),
+                              expected_instruments[value])
+            assert_same_frame(all_segments[value], expected_instruments[value])
+
+
+@pytest.mark.parametrize("classification_criteria", CLASSIFICATION_CRITERIA["Equity"])
+def test_sample_data(equity_data, classification_criteria):
+    assert_same_attribution(equity_data, classification_criteria)
+
+
+def test_zero_weights(zero_weight_data):
+    assert_same_attribution(zero_weight_data, "Segment")
+
+    # Zero benchmark weight: the allocation is the portfolio contribution less its weight times the benchmark
+    # return and there is no selection, zero portfolio weight: no selection either
+    attribution_df = brinson_fachler_vectorized(zero_weight_data, "Segment").set_index(["Segment", "Start Date"])
+    no_benchmark = zero_weight_data[zero_weight_data["Segment"] == "Zero benchmark weight"].set_index("Start Date")
+    weight_ptf = no_benchmark["PreviousMv_portfolio"] / no_benchmark["TotalPreviousMv_portfolio"]
+    contribution_ptf = no_benchmark["DeltaMv_portfolio"] / no_benchmark["TotalPreviousMv_portfolio"]
+    expected_allocation = contribution_ptf - weight_ptf * no_benchmark["TotalReturn_benchmark"]
+    pd.testing.assert_series_equal(attribution_df.loc["Zero benchmark weight", "Allocation"], expected_allocation,
+                                   check_names=False, rtol=1e-12)
+    assert (attribution_df.loc["Zero benchmark weight", "Selection"] == 0).all()
+    assert (attribution_df.loc["Zero portfolio weight", "Selection"] == 0).all()
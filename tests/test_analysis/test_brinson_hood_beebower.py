@@ -0,0 +1,61 @@
+"""
+Vectorized Brinson-Hood-Beebower against the row-wise brinson_hood_beebower and brinson_hood_beebower_instrument,
+on the sample data and on a synthetic frame with zero portfolio and benchmark weights.
+"""
+import pandas as pd
+import pytest
+from analysis import (
+    AttributionCube,
+    brinson_hood_beebower,
+    brinson_hood_beebower_instrument,
+    brinson_hood_beebower_vectorized,
+    brinson_hood_beebower_instrument_vectorized,
+    brinson_hood_beebower_instrument_all_segments
+)
+from config.settings import CLASSIFICATION_CRITERIA
+
+
+def assert_same_frame(result, expected):
+    # Row labels differ between the row-wise filters and the array kernels, only the row order is compared
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-10, atol=1e-14)
+
+
+def assert_same_attribution(data_df, classification_criteria):
+    expected = brinson_hood_beebower(data_df, classification_criteria)
+    values = data_df[classification_criteria].dropna().unique()
+    expected_instruments = {value: brinson_hood_beebower_instrument(data_df, classification_criteria, value)
+                            for value in values}
+
+    # The models take the prepare_data DataFrame or the cube built from it
+    for data in (data_df, AttributionCube(data_df)):
+        assert_same_frame(brinson_hood_beebower_vectorized(data, classification_criteria), expected)
+
+        all_segments = brinson_hood_beebower_instrument_all_segments(data, classification_criteria)
+        assert set(all_segments) == set(values)
+        for value in values:
+            assert_same_frame(brinson_hood_beebower_instrument_vectorized(data, classification_criteria, value),
+                              expected_instruments[value])
+            assert_same_frame(all_segments[value], expected_instruments[value])
+
+
+@pytest.mark.parametrize("classification_criteria", CLASSIFICATION_CRITERIA["Equity"])
+def test_sample_data(equity_data, classification_criteria):
+    assert_same_attribution(equity_data, classification_criteria)
+
+
+def test_zero_weights(zero_weight_data):
+    assert_same_attribution(zero_weight_data, "Segment")
+
+    # A segment without benchmark weight only has the portfolio contribution as allocation, a segment without
+    # portfolio weight only has the negative benchmark contribution: no selection nor interaction in either
+    attribution_df = brinson_hood_beebower_vectorized(zero_weight_data, "Segment").set_index(["Segment", "Start Date"])
+    segment_df = zero_weight_data.set_index(["Segment", "Start Date"]).sort_index()
+    for segment, side, sign in [("Zero benchmark weight", "_portfolio", 1), ("Zero portfolio weight", "_benchmark", -1)]:
+        contribution = segment_df.loc[segment, "DeltaMv" + side] / segment_df.loc[segment, "TotalPreviousMv" + side]
+        pd.testing.assert_series_equal(attribution_df.loc[segment, "Allocation"], sign * contribution,
+                                       check_names=False, rtol=1e-12)
+        assert (attribution_df.loc[segment, ["Selection", "Interaction"]] == 0).all().all()
+
+        instruments_df = brinson_hood_beebower_instrument_vectorized(zero_weight_data, "Segment", segment)
+        assert (instruments_df[["Selection", "Interaction"]] == 0).all().all()
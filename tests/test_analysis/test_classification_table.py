@@ -0,0 +1,22 @@
+"""
+Duplicated (Product, Product type) rows of the classifications.
+"""
+import pandas as pd
+import pytest
+from analysis import prepare_data
+from analysis.classification_table import ClassificationTable, duplicated_classifications
+from tests.conftest import SAMPLE_PAIRS, SAMPLE_START_DATE, SAMPLE_END_DATE
+
+
+def test_duplicated_classifications_keep_the_first_row(sample_inputs, equity_data):
+    portfolio_df, benchmark_df, classifications_df = sample_inputs
+    duplicated_rows = classifications_df.iloc[:3].assign(**{"GICS sector": "Duplicated sector"})
+    duplicated_df = pd.concat([classifications_df, duplicated_rows], ignore_index=True)
+    assert duplicated_classifications(duplicated_df) == list(
+        classifications_df.iloc[:3][["Product", "Product type"]].itertuples(index=False, name=None))
+
+    with pytest.warns(UserWarning, match="Duplicated classifications"):
+        table = ClassificationTable(duplicated_df)
+    portfolios, benchmark = SAMPLE_PAIRS["Equity"]
+    data = prepare_data(portfolios, benchmark, portfolio_df, benchmark_df, table, SAMPLE_START_DATE, SAMPLE_END_DATE)
+    pd.testing.assert_frame_equal(data, equity_data)
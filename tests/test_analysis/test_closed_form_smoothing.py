@@ -0,0 +1,80 @@
+"""
+Carino and Menchero linking: the linked effects add up to the compounded excess return, per segment and in
+total, including periods where the portfolio and the benchmark have the same return and a single period.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import carino_smoothing, menchero_smoothing
+
+SMOOTHING_FUNCTIONS = [carino_smoothing, menchero_smoothing]
+SEGMENTS = ["A", "B", "C"]
+EFFECTS = ["Allocation", "Selection"]
+
+
+def per_period_effects(ptf_returns, bm_returns, seed=0):
+    # Random effects per segment, scaled so that all the effects of a period add up to R_t - B_t
+    rng = np.random.default_rng(seed)
+    rows = []
+    for date, return_ptf, return_bm in zip(pd.date_range("2020-01-01", periods=len(ptf_returns), freq="MS"),
+                                           ptf_returns, bm_returns):
+        weights = rng.normal(size=(len(SEGMENTS), len(EFFECTS)))
+        if return_ptf != return_bm:
+            weights *= (return_ptf - return_bm) / weights.sum()
+        else:
+            # Effects that offset each other
+            weights -= weights.mean()
+        for segment, segment_effects in zip(SEGMENTS, weights):
+            rows.append({"Start Date": date, "TotalReturn_portfolio": return_ptf, "TotalReturn_benchmark": return_bm,
+                         "Segment": segment, "Excess return": segment_effects.sum(), **dict(zip(EFFECTS, segment_effects))})
+    return pd.DataFrame(rows)
+
+
+def assert_links_excess_return(smoothing, effects_df):
+    returns_df = effects_df.groupby("Start Date")[["TotalReturn_portfolio", "TotalReturn_benchmark"]].first()
+    excess_return = (1 + returns_df["TotalReturn_portfolio"]).prod() - (1 + returns_df["TotalReturn_benchmark"]).prod()
+
+    result = smoothing(effects_df, "Segment").set_index("Segment")
+    assert np.isfinite(result[EFFECTS].to_numpy()).all()
+    # The effects of each segment add up to its linked excess return, the segments add up to the Total row and
+    # the Total row to R - B
+    np.testing.assert_allclose(result[EFFECTS].sum(axis=1), result["Excess return"], rtol=1e-12, atol=1e-14)
+    np.testing.assert_allclose(result.loc[SEGMENTS, EFFECTS + ["Excess return"]].sum(),
+                               result.loc["Total", EFFECTS + ["Excess return"]], rtol=1e-12, atol=1e-14)
+    np.testing.assert_allclose(result.loc["Total", "Excess return"], excess_return, rtol=1e-10, atol=1e-14)
+    return result
+
+
+@pytest.mark.parametrize("smoothing", SMOOTHING_FUNCTIONS)
+def test_multiple_periods(smoothing):
+    # The third period has the same portfolio and benchmark return
+    effects_df = per_period_effects([0.02, -0.015, 0.01, 0.03, -0.04], [0.01, -0.02, 0.01, 0.025, -0.03])
+    assert_links_excess_return(smoothing, effects_df)
+
+
+@pytest.mark.parametrize("smoothing", SMOOTHING_FUNCTIONS)
+def test_same_returns_every_period(smoothing):
+    # R_t = B_t every period: R = B and the coefficients take their limits, the effects offset each other
+    returns = [0.02, -0.015, 0.01]
+    effects_df = per_period_effects(returns, returns)
+    result = assert_links_excess_return(smoothing, effects_df)
+
+    # Carino: k_t / K = (1 + R) / (1 + R_t), Menchero: M = (1 + R)^((T - 1) / T) and no residual
+    growth = np.prod(1 + np.array(returns))
+    if smoothing is carino_smoothing:
+        factors = growth / (1 + np.array(returns))
+    else:
+        factors = np.full(len(returns), growth ** ((len(returns) - 1) / len(returns)))
+    expected = (effects_df[EFFECTS].mul(np.repeat(factors, len(SEGMENTS)), axis=0)
+                .groupby(effects_df["Segment"]).sum())
+    np.testing.assert_allclose(result.loc[SEGMENTS, EFFECTS], expected.loc[SEGMENTS], rtol=1e-12, atol=1e-14)
+
+
+@pytest.mark.parametrize("same_returns", [False, True])
+@pytest.mark.parametrize("smoothing", SMOOTHING_FUNCTIONS)
+def test_single_period(smoothing, same_returns):
+    # A single period is not rescaled
+    effects_df = per_period_effects([0.02], [0.02 if same_returns else 0.005])
+    result = assert_links_excess_return(smoothing, effects_df)
+    np.testing.assert_allclose(result.loc[SEGMENTS, EFFECTS], effects_df.set_index("Segment").loc[SEGMENTS, EFFECTS],
+                               rtol=1e-12, atol=1e-14)
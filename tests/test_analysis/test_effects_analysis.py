@@ -0,0 +1,75 @@
+"""
+Vectorized fixed income effects analysis against the row-wise effects_analysis and effects_analysis_instrument,
+for both credit modes and every effects list, on the sample data and on a synthetic frame with zero weights.
+"""
+import pandas as pd
+import pytest
+from analysis import (
+    AttributionCube,
+    effects_analysis,
+    effects_analysis_instrument,
+    effects_analysis_vectorized,
+    effects_analysis_instrument_vectorized,
+    effects_analysis_instrument_all_segments
+)
+from config.settings import CLASSIFICATION_CRITERIA, FIXED_INCOME_EFFECTS
+
+EFFECTS_LISTS = ["default", "full_list"]
+
+
+def master_effects(effects, credit_mode):
+    # The Brinson credit mode splits Credit in allocation and selection in the master table only
+    if credit_mode == "standard":
+        return effects
+    return [split for effect in effects
+            for split in (["Credit allocation", "Credit selection"] if effect == "Credit" else [effect])]
+
+
+def assert_same_frame(result, expected):
+    # Row labels differ between the row-wise filters and the array kernels, only the row order is compared
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-10, atol=1e-14)
+
+
+def assert_same_master(data_df, classification_criteria, effects, credit_mode):
+    effects = master_effects(effects, credit_mode)
+    expected = effects_analysis(data_df, classification_criteria, effects, credit_mode)
+
+    # The models take the prepare_data DataFrame or the cube built from it
+    for data in (data_df, AttributionCube(data_df)):
+        assert_same_frame(effects_analysis_vectorized(data, classification_criteria, effects, credit_mode), expected)
+
+
+def assert_same_instruments(data_df, classification_criteria, effects):
+    values = data_df[classification_criteria].dropna().unique()
+    expected = {value: effects_analysis_instrument(data_df, classification_criteria, value, effects)
+                for value in values}
+
+    for data in (data_df, AttributionCube(data_df)):
+        all_segments = effects_analysis_instrument_all_segments(data, classification_criteria, effects)
+        assert set(all_segments) == set(values)
+        for value in values:
+            assert_same_frame(effects_analysis_instrument_vectorized(data, classification_criteria, value, effects),
+                              expected[value])
+            assert_same_frame(all_segments[value], expected[value])
+
+
+@pytest.mark.parametrize("credit_mode", ["standard", "brinson"])
+@pytest.mark.parametrize("effects_list", EFFECTS_LISTS)
+@pytest.mark.parametrize("classification_criteria", CLASSIFICATION_CRITERIA["Fixed income"])
+def test_sample_data(fixed_income_data, classification_criteria, effects_list, credit_mode):
+    assert_same_master(fixed_income_data, classification_criteria, FIXED_INCOME_EFFECTS[effects_list], credit_mode)
+
+
+# Instrument tables do not depend on the credit mode: Credit is never split per instrument
+@pytest.mark.parametrize("effects_list", EFFECTS_LISTS)
+@pytest.mark.parametrize("classification_criteria", CLASSIFICATION_CRITERIA["Fixed income"])
+def test_sample_data_instruments(fixed_income_data, classification_criteria, effects_list):
+    assert_same_instruments(fixed_income_data, classification_criteria, FIXED_INCOME_EFFECTS[effects_list])
+
+
+@pytest.mark.parametrize("credit_mode", ["standard", "brinson"])
+@pytest.mark.parametrize("effects_list", EFFECTS_LISTS)
+def test_zero_weights(zero_weight_data, effects_list, credit_mode):
+    assert_same_master(zero_weight_data, "Segment", FIXED_INCOME_EFFECTS[effects_list], credit_mode)
+    assert_same_instruments(zero_weight_data, "Segment", FIXED_INCOME_EFFECTS[effects_list])
@@ -0,0 +1,69 @@
+"""
+LinkedAttributionAccumulator against the smoothing functions on the full history.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import (
+    LinkedAttributionAccumulator,
+    brinson_fachler_vectorized,
+    contribution,
+    grap_smoothing,
+    modified_frongello_smoothing,
+    contribution_smoothing
+)
+
+SMOOTHING_FUNCTIONS = {
+    "Frongello": grap_smoothing,
+    "Modified Frongello": modified_frongello_smoothing,
+    "Contribution": contribution_smoothing
+}
+
+
+def linked_one_period_at_a_time(df, breakdown, method):
+    accumulator = LinkedAttributionAccumulator(breakdown, method)
+    for _, period_df in df.groupby("Start Date", sort=True):
+        accumulator.add_period(period_df)
+    return accumulator.result()
+
+
+def assert_same_linking(df, breakdown, method):
+    expected = SMOOTHING_FUNCTIONS[method](df, breakdown)
+    result = linked_one_period_at_a_time(df, breakdown, method)
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-10, atol=1e-14)
+
+
+@pytest.mark.parametrize("method", ["Frongello", "Modified Frongello"])
+@pytest.mark.parametrize("breakdown", ["GICS sector", "Region"])
+def test_attribution_matches_smoothing(equity_data, breakdown, method):
+    assert_same_linking(brinson_fachler_vectorized(equity_data, breakdown), breakdown, method)
+
+
+@pytest.mark.parametrize("breakdown", ["GICS sector", "Region"])
+def test_contribution_matches_smoothing(equity_data, breakdown):
+    assert_same_linking(contribution(equity_data, breakdown), breakdown, "Contribution")
+
+
+@pytest.mark.parametrize("method", ["Frongello", "Modified Frongello"])
+def test_repeated_and_unclassified_rows(method):
+    # Several rows of a segment on a date are compounded one after another by modified_frongello_smoothing,
+    # rows without a segment only count in the Total row of grap_smoothing
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2020-01-01", periods=6, freq="MS")
+    rows = []
+    for date in dates:
+        return_ptf, return_bm = rng.normal(0.01, 0.05, size=2)
+        for segment in ["A", "A", "B", None, "C", "A"][:rng.integers(3, 7)]:
+            rows.append({"Start Date": date, "TotalReturn_portfolio": return_ptf, "TotalReturn_benchmark": return_bm,
+                         "Sector": segment, "Allocation": rng.normal(0, 0.01), "Selection": rng.normal(0, 0.01)})
+    assert_same_linking(pd.DataFrame(rows), "Sector", method)
+
+
+def test_periods_must_be_in_order(equity_data):
+    master_df = brinson_fachler_vectorized(equity_data, "GICS sector")
+    periods = [period_df for _, period_df in master_df.groupby("Start Date", sort=True)]
+    accumulator = LinkedAttributionAccumulator("GICS sector")
+    accumulator.add_period(periods[1])
+    with pytest.raises(ValueError):
+        accumulator.add_period(periods[0])
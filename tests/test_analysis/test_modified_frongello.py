@@ -0,0 +1,49 @@
+"""
+modified_frongello_smoothing_vectorized against the row-wise modified_frongello_smoothing, on every criteria of the
+sample data and on dates where the average growth is zero.
+"""
+import pandas as pd
+import pytest
+from analysis import (
+    PeriodQueryEngine,
+    brinson_fachler_vectorized,
+    effects_analysis_vectorized,
+    modified_frongello_smoothing,
+    modified_frongello_smoothing_vectorized
+)
+from config.settings import CLASSIFICATION_CRITERIA, FIXED_INCOME_EFFECTS
+
+
+@pytest.mark.parametrize("asset_class, data", [("Equity", "equity_data"), ("Fixed income", "fixed_income_data")])
+def test_sample_data(request, asset_class, data):
+    data = request.getfixturevalue(data)
+    for criteria in CLASSIFICATION_CRITERIA[asset_class]:
+        if asset_class == "Equity":
+            effects_df = brinson_fachler_vectorized(data, criteria)
+        else:
+            effects_df = effects_analysis_vectorized(data, criteria, FIXED_INCOME_EFFECTS["default"], credit_mode="standard")
+        pd.testing.assert_frame_equal(modified_frongello_smoothing_vectorized(effects_df, criteria),
+                                      modified_frongello_smoothing(effects_df, criteria),
+                                      check_dtype=False, rtol=1e-10, atol=1e-14)
+
+
+def test_zero_average_growth():
+    # (R_t + B_t) / 2 = -1 on the second date: the growth has no inverse nor logarithm
+    effects_df = pd.DataFrame({
+        "Start Date": pd.to_datetime(["2020-01-01", "2020-01-01", "2020-01-02", "2020-01-02", "2020-01-03", "2020-01-03"]),
+        "TotalReturn_portfolio": [0.1, 0.1, -1.0, -1.0, 0.05, 0.05],
+        "TotalReturn_benchmark": [0.05, 0.05, -1.0, -1.0, 0.02, 0.02],
+        "Segment": ["a", "b", "a", "b", "a", "b"],
+        "Allocation": [0.01, 0.02, -0.3, 0.1, 0.01, -0.02],
+        "Selection": [0.003, -0.001, -0.2, -0.5, 0.002, 0.004]
+    })
+    expected = modified_frongello_smoothing(effects_df, "Segment")
+    assert expected[["Allocation", "Selection"]].notna().all().all()
+    pd.testing.assert_frame_equal(modified_frongello_smoothing_vectorized(effects_df, "Segment"), expected)
+
+    engine = PeriodQueryEngine(effects_df, "Segment", "modified_frongello")
+    for start, end in [("2020-01-01", "2020-01-03"), ("2020-01-02", "2020-01-03"), ("2020-01-03", "2020-01-03")]:
+        period_df = effects_df[(effects_df["Start Date"] >= start) & (effects_df["Start Date"] <= end)]
+        pd.testing.assert_frame_equal(engine.query(start, end), modified_frongello_smoothing(period_df, "Segment"),
+                                      check_dtype=False, rtol=1e-12)
+    assert len(engine.query("2021-01-01", "2021-01-31")) == 1
@@ -0,0 +1,71 @@
+"""
+PeriodQueryEngine queries against the smoothing functions on the data of the sliced period, for every linking
+method on the sample data.
+"""
+import datetime
+import pandas as pd
+import pytest
+from analysis import (
+    PeriodQueryEngine,
+    brinson_fachler_vectorized,
+    effects_analysis_vectorized,
+    contribution,
+    grap_smoothing,
+    modified_frongello_smoothing,
+    carino_smoothing,
+    menchero_smoothing,
+    contribution_smoothing,
+    period_end_dates,
+    prepare_data
+)
+from config.settings import CLASSIFICATION_CRITERIA, FIXED_INCOME_EFFECTS
+from tests.conftest import SAMPLE_PAIRS, SAMPLE_START_DATE, SAMPLE_END_DATE
+
+# Smoothing function giving the result of each linking method of the engine
+LINKING_SMOOTHING = {
+    "grap": grap_smoothing,
+    "modified_frongello": modified_frongello_smoothing,
+    "carino": carino_smoothing,
+    "menchero": menchero_smoothing,
+    "contribution": contribution_smoothing
+}
+
+# Performance periods within the sample history, including periods starting or ending between two dates
+PERIODS = [
+    (SAMPLE_START_DATE, SAMPLE_END_DATE),
+    (datetime.date(2020, 1, 1), SAMPLE_END_DATE),
+    (datetime.date(2020, 1, 1), datetime.date(2020, 6, 15)),
+    (datetime.date(2019, 12, 15), datetime.date(2020, 10, 2)),
+    (datetime.date(2020, 10, 5), SAMPLE_END_DATE)
+]
+
+
+def per_period_effects(data, asset_class, criteria, linking):
+    # Per-period effects before smoothing, as fed to the smoothing functions and the engine
+    if linking == "contribution":
+        return contribution(data, criteria)
+    if asset_class == "Equity":
+        return brinson_fachler_vectorized(data, criteria)
+    return effects_analysis_vectorized(data, criteria, FIXED_INCOME_EFFECTS["default"], credit_mode="standard")
+
+
+def prepare_pair(sample_inputs, portfolios, benchmark, start_date, end_date):
+    portfolio_df, benchmark_df, classifications_df = sample_inputs
+    return prepare_data(portfolios, benchmark, portfolio_df, benchmark_df, classifications_df, start_date, end_date)
+
+
+@pytest.mark.parametrize("asset_class", list(SAMPLE_PAIRS))
+@pytest.mark.parametrize("linking", list(LINKING_SMOOTHING))
+def test_queries_match_smoothing(sample_inputs, asset_class, linking):
+    portfolios, benchmark = SAMPLE_PAIRS[asset_class]
+    portfolio_df, benchmark_df, _ = sample_inputs
+    period_ends = period_end_dates(portfolios, benchmark, portfolio_df, benchmark_df)
+    full_data = prepare_pair(sample_inputs, portfolios, benchmark, SAMPLE_START_DATE, SAMPLE_END_DATE)
+    period_data = {period: prepare_pair(sample_inputs, portfolios, benchmark, *period) for period in PERIODS}
+
+    for criteria in CLASSIFICATION_CRITERIA[asset_class][:3]:
+        engine = PeriodQueryEngine(per_period_effects(full_data, asset_class, criteria, linking), criteria, linking,
+                                   period_ends)
+        for period, data in period_data.items():
+            expected = LINKING_SMOOTHING[linking](per_period_effects(data, asset_class, criteria, linking), criteria)
+            pd.testing.assert_frame_equal(engine.query(*period), expected, check_dtype=False, rtol=1e-8, atol=1e-14)
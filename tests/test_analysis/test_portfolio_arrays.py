@@ -0,0 +1,32 @@
+"""
+Composites of PortfolioArrays against prepare_data on the portfolio DataFrame, for every combination of the
+sample portfolios.
+"""
+import datetime
+import itertools
+import pandas as pd
+from analysis import PortfolioArrays, prepare_data
+from tests.conftest import SAMPLE_PAIRS, SAMPLE_START_DATE, SAMPLE_END_DATE
+
+# Full history and periods starting or ending between two dates of the sample data
+PERIODS = [
+    (SAMPLE_START_DATE, SAMPLE_END_DATE),
+    (datetime.date(2020, 1, 1), SAMPLE_END_DATE),
+    (datetime.date(2020, 1, 1), datetime.date(2020, 6, 15))
+]
+
+
+def test_composites(sample_inputs):
+    portfolio_df, benchmark_df, classifications_df = sample_inputs
+    arrays = PortfolioArrays(portfolio_df)
+    portfolios = sorted(portfolio_df["Portfolio"].unique())
+    benchmarks = [benchmark for _, benchmark in SAMPLE_PAIRS.values()]
+
+    for count in range(1, len(portfolios) + 1):
+        for composite in itertools.combinations(portfolios, count):
+            for benchmark, period in itertools.product(benchmarks, PERIODS):
+                expected = prepare_data(list(composite), benchmark, portfolio_df, benchmark_df, classifications_df, *period)
+                result = prepare_data(list(composite), benchmark, arrays, benchmark_df, classifications_df, *period)
+                # A single portfolio is the same to the last bit, composites add per-portfolio sums
+                pd.testing.assert_frame_equal(result, expected, check_exact=count == 1, rtol=1e-12)
+
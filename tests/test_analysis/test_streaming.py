@@ -0,0 +1,41 @@
+"""
+prepare_data on streamed ChunkedCsvInput inputs against prepare_data on the files loaded in memory.
+"""
+import datetime
+import os
+import pandas as pd
+import pytest
+from analysis import ChunkedCsvInput, period_end_dates, prepare_data
+from tests.conftest import DATA_DIR, SAMPLE_PAIRS, SAMPLE_START_DATE, SAMPLE_END_DATE
+
+# Portfolios and benchmarks of the sample pairs, and a composite of two portfolios
+SELECTIONS = [*SAMPLE_PAIRS.values(), (["PENSION EQ GROW", "EUR EQ LARGE CP"], "EURO STOXX 50")]
+
+PERIODS = [(SAMPLE_START_DATE, SAMPLE_END_DATE), (datetime.date(2020, 1, 1), datetime.date(2020, 6, 15))]
+
+
+@pytest.fixture(scope="module")
+def csv_inputs(sample_inputs):
+    # The streamed chunks are parsed with the default read_csv arguments, as these DataFrames
+    return (pd.read_csv(os.path.join(DATA_DIR, "portfolios.csv")),
+            pd.read_csv(os.path.join(DATA_DIR, "benchmarks.csv")),
+            sample_inputs[2])
+
+
+@pytest.mark.parametrize("chunksize", [97, 1000])
+@pytest.mark.parametrize("period", PERIODS)
+@pytest.mark.parametrize("portfolios, benchmark", SELECTIONS)
+def test_streamed_inputs(csv_inputs, portfolios, benchmark, period, chunksize):
+    portfolio_df, benchmark_df, classifications_df = csv_inputs
+    portfolio_input = ChunkedCsvInput(os.path.join(DATA_DIR, "portfolios.csv"), "Portfolio", chunksize)
+    benchmark_input = ChunkedCsvInput(os.path.join(DATA_DIR, "benchmarks.csv"), "Benchmark", chunksize)
+
+    # Partial sums of instrument-periods split between chunks are added, not the raw rows
+    pd.testing.assert_frame_equal(
+        prepare_data(portfolios, benchmark, portfolio_input, benchmark_input, classifications_df, *period),
+        prepare_data(portfolios, benchmark, portfolio_df, benchmark_df, classifications_df, *period),
+        rtol=1e-12
+    )
+    pd.testing.assert_series_equal(period_end_dates(portfolios, benchmark, portfolio_input, benchmark_input),
+                                   period_end_dates(portfolios, benchmark, portfolio_df, benchmark_df))
+
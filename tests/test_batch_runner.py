@@ -0,0 +1,28 @@
+"""
+Models of the batch grid per (portfolio, benchmark) pair of the sample data.
+"""
+import batch_runner
+from tests.conftest import DATA_DIR
+
+
+def test_pairs_only_run_the_models_of_their_asset_class():
+    portfolios, benchmarks, _, _ = batch_runner._input_summary(DATA_DIR)
+    all_models = list(batch_runner.MODEL_REGISTRY) + [batch_runner.CONTRIBUTION_MODEL]
+
+    asset_classes = {
+        (portfolio, benchmark): batch_runner._pair_asset_class(portfolios[portfolio], benchmarks[benchmark])
+        for portfolio in portfolios for benchmark in benchmarks
+    }
+    assert asset_classes[("EUR EQ LARGE CP", "EURO STOXX 50")] == "Equity"
+    assert asset_classes[("PENSION FI GROW", "IBOXX E LIQ COR")] == "Fixed income"
+    assert asset_classes[("LIQ EUR CORP", "EURO STOXX 50")] is None
+
+    for asset_class in asset_classes.values():
+        models = batch_runner._pair_models(all_models, asset_class, explicit_models=False)
+        assert batch_runner.CONTRIBUTION_MODEL in models
+        assert all(model == batch_runner.CONTRIBUTION_MODEL or batch_runner.MODEL_ASSET_CLASS[model] == asset_class
+                   for model in models)
+
+    # Models given explicitly are all run on pairs without a shared asset class
+    assert batch_runner._pair_models(["Brinson-Fachler"], None, explicit_models=True) == ["Brinson-Fachler"]
+    assert batch_runner._pair_models(["Brinson-Fachler"], "Fixed income", explicit_models=True) == []
@@ -0,0 +1,118 @@
+"""
+Comparison runs, whose tasks run in worker threads, the single pass over every classification criteria and the
+effects of the attribution models.
+"""
+from contextlib import contextmanager
+import pandas as pd
+import pytest
+from analysis import period_end_dates
+from config.settings import CLASSIFICATION_CRITERIA
+from tests.conftest import SAMPLE_PAIRS, SAMPLE_START_DATE, SAMPLE_END_DATE
+from ui.analysis_runner import build_period_engines, prepare_cube, run_all_criteria, run_analysis, run_comparison
+from ui.background import AnalysisCancelled, ProgressRecorder
+from ui.model_registry import model_effects
+from utils.instrumentation import recording
+
+COMBINATIONS = [("Brinson-Fachler", "Frongello"), ("Brinson-Fachler", "Modified Frongello"),
+                ("Brinson-Hood-Beebower", "Frongello")]
+
+
+@pytest.fixture(scope="module")
+def equity_settings():
+    portfolios, benchmark = SAMPLE_PAIRS["Equity"]
+    return {'asset_class': "Equity", 'portfolios': portfolios, 'benchmark': benchmark,
+            'start_date': SAMPLE_START_DATE, 'end_date': SAMPLE_END_DATE, 'effects': None}
+
+
+def test_comparison_stages_are_recorded_under_the_comparison(sample_inputs, equity_settings):
+    with recording() as recorder:
+        run_comparison(equity_settings, *sample_inputs, "GICS sector", COMBINATIONS)
+
+    records = recorder.to_frame()
+    comparison_depth = records.loc[records["stage"] == "comparison", "depth"].iloc[0]
+    task_records = records[records["stage"].isin(
+        ["Brinson-Fachler master", "Brinson-Hood-Beebower master", "Frongello smoothing", "Modified Frongello smoothing"]
+    )]
+    assert len(task_records) == 5
+    assert (task_records["depth"] == comparison_depth + 1).all()
+    assert task_records["seconds"].notna().all()
+
+
+class CancelledInComparison(ProgressRecorder):
+    # Cancelled by its session once the comparison stage has started, before its tasks start
+    @contextmanager
+    def stage(self, name):
+        with super().stage(name) as stage:
+            if name == "comparison":
+                self.cancelled.set()
+            yield stage
+
+
+def test_cancelled_comparison_stops_in_its_tasks(sample_inputs, equity_settings):
+    recorder = CancelledInComparison()
+    with recording(recorder=recorder), pytest.raises(AnalysisCancelled):
+        run_comparison(equity_settings, *sample_inputs, "GICS sector", COMBINATIONS)
+
+    assert not any(record["stage"].endswith((" master", " smoothing")) and record["seconds"] is not None
+                   for record in recorder.records)
+
+
+# Analyses run for every criteria: contribution and each attribution model with one of its smoothing algorithms
+ALL_CRITERIA_ANALYSES = [
+    ("Equity", {'analysis_type': "Contribution"}),
+    ("Equity", {'analysis_type': "Attribution", 'model': "Brinson-Fachler", 'smoothing': "Frongello"}),
+    ("Equity", {'analysis_type': "Attribution", 'model': "Brinson-Hood-Beebower", 'smoothing': "Modified Frongello"}),
+    ("Fixed income", {'analysis_type': "Attribution", 'model': "Standard fixed income attribution",
+                      'smoothing': "Frongello"}),
+    ("Fixed income", {'analysis_type': "Attribution", 'model': "with Brinson Fachler on credit (POC)",
+                      'smoothing': "Modified Frongello"})
+]
+
+
+def analysis_settings(asset_class, analysis):
+    portfolios, benchmark = SAMPLE_PAIRS[asset_class]
+    return {'asset_class': asset_class, 'portfolios': portfolios, 'benchmark': benchmark,
+            'start_date': SAMPLE_START_DATE, 'end_date': SAMPLE_END_DATE,
+            'effects': model_effects(analysis.get('model')), **analysis}
+
+
+def assert_same_frame(result, expected, rtol=1e-10):
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False, rtol=rtol, atol=1e-14)
+
+
+@pytest.mark.parametrize("asset_class, analysis", ALL_CRITERIA_ANALYSES)
+def test_all_criteria_in_one_pass(sample_inputs, asset_class, analysis):
+    settings = analysis_settings(asset_class, analysis)
+    portfolio_df, benchmark_df, _ = sample_inputs
+    cube = prepare_cube(settings, *sample_inputs)
+    results = run_all_criteria(settings, *sample_inputs, cube=cube)
+    period_ends = period_end_dates(settings['portfolios'], settings['benchmark'], portfolio_df, benchmark_df)
+    engines = build_period_engines(settings, prepare_cube(settings, *sample_inputs), period_ends)
+    assert list(results) == list(engines) == CLASSIFICATION_CRITERIA[asset_class]
+
+    for classification_criteria in CLASSIFICATION_CRITERIA[asset_class]:
+        # Each criteria on its own, with a cube that has not reduced the other criteria
+        expected_df, expected_instruments = run_analysis(settings, *sample_inputs, classification_criteria)
+        master_df, instrument_function = results[classification_criteria]
+        master_engine, instrument_engine = engines[classification_criteria]
+        assert_same_frame(master_df, expected_df)
+        # The engines link the per-period effects of the full history, queried over that history
+        assert_same_frame(master_engine.query(SAMPLE_START_DATE, SAMPLE_END_DATE), expected_df, rtol=1e-8)
+
+        for classification_value in expected_df[classification_criteria].iloc[1:3]:
+            expected_instruments_df = expected_instruments(classification_value)
+            assert_same_frame(instrument_function(classification_value), expected_instruments_df)
+            assert_same_frame(instrument_engine(classification_value).query(SAMPLE_START_DATE, SAMPLE_END_DATE),
+                              expected_instruments_df, rtol=1e-8)
+
+
+@pytest.mark.parametrize("model, effects, expected", [
+    ("Brinson-Fachler", None, None),
+    ("Standard fixed income attribution", None, ["Income", "Yield curve", "Credit"]),
+    ("with Brinson Fachler on credit (POC)", None, ["Income", "Yield curve", "Credit allocation", "Credit selection"]),
+    ("Standard fixed income attribution", ["Credit allocation", "Credit selection", "Rolldown"], ["Credit", "Rolldown"]),
+    ("with Brinson Fachler on credit (POC)", ["Rolldown", "Credit"], ["Rolldown", "Credit allocation", "Credit selection"])
+])
+def test_model_effects(model, effects, expected):
+    assert model_effects(model, effects) == expected
@@ -0,0 +1,37 @@
+"""
+Content hashes of the input DataFrames, keyed on the DataFrame objects.
+"""
+import gc
+import os
+import pandas as pd
+from tests.conftest import DATA_DIR
+from ui.analysis_cache import content_hash
+from utils.caching import ObjectHashes
+from utils.ingestion import CONTENT_HASHES, read_csv_cached
+
+
+def test_derived_frames_are_hashed_on_their_own_content():
+    portfolio_df = read_csv_cached(os.path.join(DATA_DIR, "portfolios.csv"))
+    loaded_hash = content_hash(portfolio_df)
+    assert loaded_hash == CONTENT_HASHES.get(portfolio_df)
+
+    # pandas copies df.attrs to derived frames, their hash must not be the one of the loaded file
+    first_portfolio = portfolio_df["Portfolio"].iloc[0]
+    filtered_df = portfolio_df[portfolio_df["Portfolio"] == first_portfolio]
+    head_df = portfolio_df.head(10)
+    assert content_hash(filtered_df) != loaded_hash
+    assert content_hash(head_df) != loaded_hash
+    assert content_hash(head_df) != content_hash(filtered_df)
+    assert content_hash(head_df.copy()) == content_hash(head_df)
+
+
+def test_hashes_are_dropped_with_their_object():
+    hashes = ObjectHashes()
+    df = pd.DataFrame({"a": [1.0, 2.0]})
+    hashes.set(df, "hash")
+    assert hashes.get(df) == "hash"
+    assert hashes.get(pd.DataFrame({"a": [1.0, 2.0]})) is None
+
+    del df
+    gc.collect()
+    assert len(hashes) == 0
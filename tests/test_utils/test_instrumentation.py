@@ -0,0 +1,45 @@
+"""
+Memory tracing of concurrent recorded runs.
+"""
+import threading
+import tracemalloc
+from utils.instrumentation import recording, record_stage
+
+
+def test_traced_runs_are_serialized():
+    first_started = threading.Event()
+    release_first = threading.Event()
+    second_started = threading.Event()
+    errors = []
+
+    def first_run():
+        with recording(trace_memory=True):
+            with record_stage("first"):
+                first_started.set()
+                release_first.wait(5)
+                # Still tracing: the second run didn't stop tracemalloc nor reset the peak meanwhile
+                if not tracemalloc.is_tracing():
+                    errors.append("tracing stopped by the second run")
+
+    def second_run():
+        with recording(trace_memory=True) as recorder:
+            second_started.set()
+            with record_stage("second"):
+                pass
+        if recorder.records[0]["peak_mib"] is None:
+            errors.append("second run not traced")
+
+    first = threading.Thread(target=first_run)
+    first.start()
+    assert first_started.wait(5)
+    second = threading.Thread(target=second_run)
+    second.start()
+    # The second traced run waits for the first one
+    assert not second_started.wait(0.2)
+    release_first.set()
+    first.join(5)
+    second.join(5)
+
+    assert second_started.is_set()
+    assert errors == []
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,97 @@
+"""
+ResultStore in a temporary directory: round trips, version tags of the keys, reads during a write of another
+connection and a store path that can't be written.
+"""
+import sqlite3
+import time
+import pandas as pd
+from utils import result_store
+from utils.result_store import ResultStore, source_hash
+
+
+class Computation:
+    # Counts the calls of compute, returning a new DataFrame each time
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return pd.DataFrame({"Segment": ["Total", "A"], "Allocation": [0.01 * self.calls, 0.02]})
+
+
+def test_round_trip(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"), max_bytes=10 ** 6)
+    compute = Computation()
+    key = ("version", "settings", "GICS sector", "master")
+
+    expected = store.get_or_compute(key, compute)
+    pd.testing.assert_frame_equal(store.get_or_compute(key, compute), expected)
+    pd.testing.assert_frame_equal(store.get(store.hash_key(key)), expected)
+    # Another store on the same file, as in another process of the app
+    pd.testing.assert_frame_equal(ResultStore(store.path, max_bytes=10 ** 6).get_or_compute(key, compute), expected)
+    assert compute.calls == 1
+    assert store.get(store.hash_key(("version", "other settings"))) is None
+
+
+def test_source_change_misses(tmp_path):
+    source = tmp_path / "model.py"
+    source.write_text("def model():\n    return 1\n")
+    pattern = str(tmp_path / "*.py")
+    store = ResultStore(str(tmp_path / "store" / "results.sqlite"), max_bytes=10 ** 6)
+    compute = Computation()
+
+    version = source_hash([pattern])
+    first = store.get_or_compute((version, "settings"), compute)
+    assert source_hash([pattern]) == version
+
+    # Outputs of the previous version of the code are not served
+    source.write_text("def model():\n    return 2\n")
+    new_version = source_hash([pattern])
+    assert new_version != version
+    second = store.get_or_compute((new_version, "settings"), compute)
+    assert compute.calls == 2
+    assert not second.equals(first)
+    pd.testing.assert_frame_equal(store.get(store.hash_key((version, "settings"))), first)
+
+
+def test_reads_during_a_write(tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path / "results.sqlite"), max_bytes=10 ** 6)
+    expected = store.get_or_compute("key", Computation())
+    store_key = store.hash_key("key")
+
+    # Reads write the access times on each call, without waiting for the lock
+    monkeypatch.setattr(result_store, "TOUCH_INTERVAL", 0.0)
+    writer = sqlite3.connect(store.path, timeout=0)
+    try:
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("UPDATE results SET last_access = 0")
+        start = time.monotonic()
+        for _ in range(3):
+            pd.testing.assert_frame_equal(store.get(store_key), expected)
+        assert time.monotonic() - start < result_store.BUSY_TIMEOUT / 2
+        # The access times could not be written, they are kept for the next write
+        assert store_key in store._touched
+        writer.commit()
+    finally:
+        writer.close()
+
+    store.put(store.hash_key("other key"), "value")
+    assert not store._touched
+    with sqlite3.connect(store.path) as reader:
+        last_access = reader.execute("SELECT last_access FROM results WHERE key = ?", (store_key,)).fetchone()[0]
+    assert last_access > 0
+
+
+def test_unwritable_path(tmp_path):
+    # The store directory is a file: the database can't be created, outputs are computed as without a store
+    (tmp_path / "not a directory").write_text("")
+    store = ResultStore(str(tmp_path / "not a directory" / "results.sqlite"), max_bytes=10 ** 6)
+    compute = Computation()
+
+    assert store.get(store.hash_key("key")) is None
+    store.put(store.hash_key("key"), "value")
+    store.get_or_compute("key", compute)
+    store.get_or_compute("key", compute)
+    assert compute.calls == 2
+    assert store.total_bytes() == 0
+    store.clear()
@@ -0,0 +1,93 @@
+"""
+Vectorized cell styles against the cell-by-cell styling they replaced, and paging of large tables.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from config.settings import STYLED_ROWS_LIMIT, DISPLAY_PAGE_SIZE
+from utils import page_count, page_rows, style_dataframe
+
+
+def applymap_style_dataframe(df, decimals):
+    # Styling before the vectorization: a function per row for the first row and a function per cell for the font
+    format_dict = {}
+    numeric_cols = df.select_dtypes(exclude="object").columns
+    for col in numeric_cols:
+        format_dict[col] = f"{{:.{decimals}%}}"
+
+    def highlight_first_row(row):
+        if row.name == df.index[0]:
+            return ["background-color: rgba(248, 249, 251, 1);"] * len(row)
+        else:
+            return [""] * len(row)
+
+    def highlight_negative(val):
+        try:
+            val_float = float(val)
+            color = "red" if val_float < 0 else "black"
+        except ValueError:
+            color = "black"
+        return f"color: {color}"
+
+    return (
+        df.style
+          .format(format_dict)
+          .apply(highlight_first_row, axis=1)
+          .map(highlight_negative)
+    )
+
+
+def cell_css(styler):
+    # CSS declarations of every cell, keyed by (row position, column position)
+    styler._compute()
+    return dict(styler.ctx)
+
+
+@pytest.fixture
+def master_df():
+    rng = np.random.default_rng(0)
+    n_rows = 12
+    df = pd.DataFrame({
+        "GICS sector": ["Total"] + [f"Sector {i}" for i in range(1, n_rows)],
+        "Allocation": rng.normal(0, 0.01, n_rows),
+        "Selection": rng.normal(0, 0.01, n_rows),
+        "Weight": np.abs(rng.normal(0, 0.1, n_rows)),
+        "Comment": ["-0.5", "0.25", "n/a", "", "-3", "1e-3", "-1e-3", "text", "0", "-0", "7", "-7"]
+    })
+    df.loc[3, "Selection"] = np.nan
+    df.loc[4, "Allocation"] = 0.0
+    return df
+
+
+def test_cell_styles_match_applymap(master_df):
+    for df in (master_df, master_df.set_index("GICS sector")):
+        assert cell_css(style_dataframe(df, 2)) == cell_css(applymap_style_dataframe(df, 2))
+        # Same formats and CSS rules in the rendered table
+        assert (style_dataframe(df, 2).set_uuid("table").to_html()
+                == applymap_style_dataframe(df, 2).set_uuid("table").to_html())
+
+
+def test_cell_styles_of_a_page(master_df):
+    # A page without the first row of the table has no highlighted row
+    expected = cell_css(applymap_style_dataframe(master_df, 2))
+    first, stop = 5, 9
+    page_css = cell_css(style_dataframe(master_df.iloc[first:stop], 2, first_label=master_df.index[0]))
+    assert page_css == {(row - first, col): css for (row, col), css in expected.items() if first <= row < stop}
+
+
+@pytest.mark.parametrize("n_rows, pages", [
+    (0, [(0, 0)]),
+    (STYLED_ROWS_LIMIT, [(0, STYLED_ROWS_LIMIT)]),
+    # Exact multiple of the page size
+    (3 * DISPLAY_PAGE_SIZE, [(0, DISPLAY_PAGE_SIZE), (DISPLAY_PAGE_SIZE, 2 * DISPLAY_PAGE_SIZE),
+                             (2 * DISPLAY_PAGE_SIZE, 3 * DISPLAY_PAGE_SIZE)]),
+    # Partial last pages
+    (STYLED_ROWS_LIMIT + 1, [(0, DISPLAY_PAGE_SIZE), (DISPLAY_PAGE_SIZE, 2 * DISPLAY_PAGE_SIZE),
+                             (2 * DISPLAY_PAGE_SIZE, STYLED_ROWS_LIMIT + 1)]),
+    (2 * DISPLAY_PAGE_SIZE + 201, [(0, DISPLAY_PAGE_SIZE), (DISPLAY_PAGE_SIZE, 2 * DISPLAY_PAGE_SIZE),
+                                   (2 * DISPLAY_PAGE_SIZE, 2 * DISPLAY_PAGE_SIZE + 201)])
+])
+def test_pages(n_rows, pages):
+    df = pd.DataFrame({"Allocation": np.zeros(n_rows)})
+    assert page_count(df) == len(pages)
+    assert [page_rows(df, page) for page in range(1, len(pages) + 1)] == pages
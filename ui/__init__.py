@@ -3,13 +3,24 @@ UI components and analysis orchestration for Streamlit application.
 """
 
 from .model_registry import MODEL_REGISTRY, SMOOTHING_REGISTRY
-from .analysis_runner import run_analysis
-from .components import render_settings, render_analysis_results
+from .analysis_runner import run_analysis, run_all_criteria, run_comparison
+from .analysis_cache import get_analysis_results
 
 __all__ = [
     'MODEL_REGISTRY',
     'SMOOTHING_REGISTRY',
     'run_analysis',
+    'run_all_criteria',
+    'run_comparison',
+    'get_analysis_results',
     'render_settings',
     'render_analysis_results'
 ]
+
+
+def __getattr__(name):
+    # Streamlit components are imported on first use, so that headless callers (batch runner) do not need Streamlit
+    if name in ('render_settings', 'render_analysis_results'):
+        from . import components
+        return getattr(components, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,284 @@
+"""
+Caching of prepared data and analysis results, shared by all Streamlit sessions.
+
+Bounded LRU tiers avoid recomputation on widget interactions:
+    - parsed input files, keyed by file content hash (utils.ingestion.PARSED_CSV_CACHE)
+    - portfolio and benchmark inputs partitioned by name and date, and portfolio inputs summed per portfolio
+      and instrument-period for composites, keyed by file content hash (PARTITION_CACHE)
+    - classification lookup tables, keyed by file content hash (CLASSIFICATION_CACHE)
+    - prepared attribution cubes, keyed by inputs, portfolios, benchmark and date range (CUBE_CACHE)
+    - period query engines of the full history, keyed by inputs and the analysis settings but the dates (PERIOD_ENGINE_CACHE)
+    - master results and drill-downs, keyed by inputs and the analysis settings (RESULT_CACHE)
+    - master results, drill-downs and rolling risk analytics persisted on disk for all sessions and processes (RESULT_STORE),
+      keyed by inputs, the analysis settings, the criteria and ANALYSIS_VERSION (a hash of the analysis
+      sources), with the outputs read in this process kept in memory (STORED_OUTPUT_CACHE)
+Display-only settings such as the decimal places are not part of the keys. Attribution and contribution
+results of a performance period are queried from the period engines, so changing the period does not
+prepare the data or run the models again.
+
+The app computes the results in a background run (ui.background) with warm_analysis_results, keyed by
+analysis_run_key, and its result fragments then read them from these caches.
+"""
+import os
+import pandas as pd
+from analysis import ClassificationTable, DatePartitionedFrame, PortfolioArrays, period_end_dates
+from config.settings import RESULT_STORE_PATH, RESULT_STORE_MAX_MIB
+from utils.caching import LRUCache, freeze
+from utils.ingestion import CONTENT_HASHES
+from utils.result_store import ResultStore, source_hash
+from utils.instrumentation import record_stage
+from .analysis_runner import prepare_cube, run_analysis, run_rolling_analytics, build_period_engines
+
+PARTITION_CACHE = LRUCache(max_entries=8)
+CLASSIFICATION_CACHE = LRUCache(max_entries=4)
+CUBE_CACHE = LRUCache(max_entries=16)
+PERIOD_ENGINE_CACHE = LRUCache(max_entries=8)
+RESULT_CACHE = LRUCache(max_entries=64)
+STORED_OUTPUT_CACHE = LRUCache(max_entries=512)
+
+# Persistent store of the master results and drill-downs, shared by the sessions and processes
+RESULT_STORE = ResultStore(RESULT_STORE_PATH, RESULT_STORE_MAX_MIB * 2 ** 20) if RESULT_STORE_PATH else None
+
+# Sources of the analysis outputs: the models and smoothing, their orchestration and the settings they read
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANALYSIS_SOURCES = [
+    os.path.join(_PACKAGE_DIR, "analysis", "*.py"),
+    os.path.join(_PACKAGE_DIR, "ui", "analysis_runner.py"),
+    os.path.join(_PACKAGE_DIR, "ui", "analysis_cache.py"),
+    os.path.join(_PACKAGE_DIR, "ui", "model_registry.py"),
+    os.path.join(_PACKAGE_DIR, "config", "settings.py")
+]
+
+# Version tag of the analysis code in the result store keys, computed from its sources at import
+ANALYSIS_VERSION = source_hash(ANALYSIS_SOURCES)
+
+# Number of measurement drill-downs kept per cached result
+DRILL_DOWN_CACHE_SIZE = 256
+
+# Settings that only affect the display of the results
+DISPLAY_SETTINGS = ('decimals',)
+
+# Settings of the performance period, answered by the period engines
+PERIOD_SETTINGS = ('start_date', 'end_date')
+
+
+def content_hash(df):
+    """
+    Content hash of an input DataFrame, set by utils.ingestion or computed once per DataFrame.
+
+    The hash is kept for the DataFrame object itself (utils.ingestion.CONTENT_HASHES), not in df.attrs
+    which pandas copies to the frames derived from it.
+    """
+    return CONTENT_HASHES.get_or_compute(df, lambda: str(pd.util.hash_pandas_object(df, index=False).sum()))
+
+
+def get_partitioned_frame(df, key_column):
+    """
+    Date-partitioned index of a portfolio or benchmark input, built once per file content.
+    """
+    return PARTITION_CACHE.get_or_compute(
+        (content_hash(df), key_column),
+        lambda: DatePartitionedFrame(df, key_column)
+    )
+
+
+def get_portfolio_arrays(portfolio_df):
+    """
+    Per-portfolio instrument-period sums of a portfolio input, built once per file content, from which
+    the composite of any selection of portfolios is added up.
+    """
+    return PARTITION_CACHE.get_or_compute(
+        (content_hash(portfolio_df), "PortfolioArrays"),
+        lambda: PortfolioArrays(portfolio_df, "Portfolio")
+    )
+
+
+def get_classification_table(classifications_df):
+    """
+    Classification lookup table of a classifications input, built once per file content.
+    """
+    return CLASSIFICATION_CACHE.get_or_compute(
+        content_hash(classifications_df),
+        lambda: ClassificationTable(classifications_df)
+    )
+
+
+def get_prepared_cube(settings, portfolio_df, benchmark_df, classifications_df):
+    """
+    Attribution cube for the settings selection, prepared once per inputs, portfolios, benchmark and date range.
+    """
+    key = (
+        content_hash(portfolio_df),
+        content_hash(benchmark_df),
+        content_hash(classifications_df),
+        tuple(sorted(settings['portfolios'])),
+        settings['benchmark'],
+        settings['start_date'],
+        settings['end_date']
+    )
+    return CUBE_CACHE.get_or_compute(
+        key,
+        lambda: prepare_cube(
+            settings,
+            get_portfolio_arrays(portfolio_df),
+            get_partitioned_frame(benchmark_df, "Benchmark"),
+            get_classification_table(classifications_df)
+        )
+    )
+
+
+def get_analysis_results(settings, portfolio_df, benchmark_df, classifications_df, classification_criteria):
+    """
+    Cached equivalent of run_analysis.
+
+    The master results and every drill-down are read from the persistent result store when a session or
+    process computed them before, and only computed on a miss. Attribution and contribution results are
+    then queried for every classification criteria at once from the period engines of the full history,
+    see get_period_engines.
+
+    Returns:
+        Tuple of (master_df, instrument_function)
+    """
+    analysis_settings = {key: value for key, value in settings.items() if key not in DISPLAY_SETTINGS}
+    key = analysis_run_key(settings, portfolio_df, benchmark_df, classifications_df)
+
+    def compute():
+        if analysis_settings['analysis_type'] == "Measurement & Analytics":
+            cube = get_prepared_cube(analysis_settings, portfolio_df, benchmark_df, classifications_df)
+            master_df, instrument_func = run_analysis(analysis_settings, portfolio_df, benchmark_df, classifications_df, None, cube=cube)
+            return {None: (master_df, _cache_drill_downs(instrument_func))}
+
+        # Attribution and contribution results are queried from the engines of the full history,
+        # the drill-downs of a criteria are built for all its classification values at once
+        engines = get_period_engines(analysis_settings, portfolio_df, benchmark_df, classifications_df)
+        start_date, end_date = analysis_settings['start_date'], analysis_settings['end_date']
+        return {
+            classification_criteria: (master_engine.query(start_date, end_date),
+                                      _query_drill_downs(instrument_engine, start_date, end_date))
+            for classification_criteria, (master_engine, instrument_engine) in engines.items()
+        }
+
+    def computed_results():
+        return RESULT_CACHE.get_or_compute(key, compute)[classification_criteria]
+
+    master_df = _stored_output(
+        (ANALYSIS_VERSION, key, classification_criteria, "master"),
+        lambda: computed_results()[0]
+    )
+
+    def get_instruments(classification_value=None):
+        return _stored_output(
+            (ANALYSIS_VERSION, key, classification_criteria, "instruments", classification_value),
+            lambda: computed_results()[1](classification_value)
+        )
+
+    return master_df, get_instruments
+
+
+def get_rolling_analytics(settings, portfolio_df, benchmark_df, classifications_df):
+    """
+    Cached equivalent of run_rolling_analytics, read from the persistent result store when computed before.
+    """
+    analysis_settings = {key: value for key, value in settings.items() if key not in DISPLAY_SETTINGS}
+    key = analysis_run_key(settings, portfolio_df, benchmark_df, classifications_df)
+    return _stored_output(
+        (ANALYSIS_VERSION, key, None, "rolling"),
+        lambda: run_rolling_analytics(
+            analysis_settings, portfolio_df, benchmark_df, classifications_df,
+            cube=get_prepared_cube(analysis_settings, portfolio_df, benchmark_df, classifications_df)
+        )
+    )
+
+
+def analysis_run_key(settings, portfolio_df, benchmark_df, classifications_df):
+    """
+    Key of the analysis of the settings on the inputs, the display settings excluded.
+    """
+    analysis_settings = {key: value for key, value in settings.items() if key not in DISPLAY_SETTINGS}
+    return (
+        content_hash(portfolio_df),
+        content_hash(benchmark_df),
+        content_hash(classifications_df),
+        freeze(analysis_settings)
+    )
+
+
+def warm_analysis_results(settings, portfolio_df, benchmark_df, classifications_df, classification_criteria):
+    """
+    Compute and cache the master results of the settings and the drill-down of the first classification
+    value (the measurement analytics and rolling risk analytics for Measurement & Analytics), which the
+    app displays first.
+
+    Returns:
+        Tuple of (master_df, details_df)
+    """
+    with record_stage("analysis results") as stage:
+        master_df, get_instruments = get_analysis_results(settings, portfolio_df, benchmark_df, classifications_df,
+                                                          classification_criteria)
+        stage.rows = len(master_df)
+
+    classification_value = None
+    if classification_criteria is not None:
+        classification_values = [val for val in master_df[classification_criteria].to_list() if val != "Total"]
+        if not classification_values:
+            return master_df, None
+        classification_value = classification_values[0]
+
+    with record_stage("instruments details") as stage:
+        details_df = get_instruments(classification_value)
+        stage.rows = len(details_df)
+    if settings['analysis_type'] == "Measurement & Analytics":
+        get_rolling_analytics(settings, portfolio_df, benchmark_df, classifications_df)
+    return master_df, details_df
+
+
+def get_period_engines(settings, portfolio_df, benchmark_df, classifications_df):
+    """
+    Period query engines of the attribution or contribution analysis over the full history of the inputs,
+    built once per inputs and analysis settings whatever the performance period.
+    """
+    engine_settings = {key: value for key, value in settings.items()
+                       if key not in DISPLAY_SETTINGS + PERIOD_SETTINGS}
+    key = (
+        content_hash(portfolio_df),
+        content_hash(benchmark_df),
+        content_hash(classifications_df),
+        freeze(engine_settings)
+    )
+
+    def compute():
+        portfolio_input = get_partitioned_frame(portfolio_df, "Portfolio")
+        benchmark_input = get_partitioned_frame(benchmark_df, "Benchmark")
+        period_ends = period_end_dates(settings['portfolios'], settings['benchmark'], portfolio_input, benchmark_input)
+        full_history = dict(
+            engine_settings,
+            start_date=period_ends.index.min() if len(period_ends) else settings['start_date'],
+            end_date=period_ends.max() if len(period_ends) else settings['end_date']
+        )
+        cube = get_prepared_cube(full_history, portfolio_df, benchmark_df, classifications_df)
+        return build_period_engines(full_history, cube, period_ends)
+
+    return PERIOD_ENGINE_CACHE.get_or_compute(key, compute)
+
+
+def _stored_output(key, compute):
+    # Outputs read from the store in this process are kept in memory for the reruns of the sessions
+    if RESULT_STORE is None:
+        return STORED_OUTPUT_CACHE.get_or_compute(key, compute)
+    return STORED_OUTPUT_CACHE.get_or_compute(key, lambda: RESULT_STORE.get_or_compute(key, compute))
+
+
+def _query_drill_downs(instrument_engine, start_date, end_date):
+    def get_instruments(classification_value):
+        return instrument_engine(classification_value).query(start_date, end_date)
+
+    return get_instruments
+
+
+def _cache_drill_downs(instrument_func):
+    drill_downs = LRUCache(max_entries=DRILL_DOWN_CACHE_SIZE)
+
+    def get_instruments(classification_value=None):
+        return drill_downs.get_or_compute(classification_value, lambda: instrument_func(classification_value))
+
+    return get_instruments
@@ -1,17 +1,46 @@
 """
 Analysis orchestration logic for running attribution and contribution analysis.
 """
-from analysis import prepare_data
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from analysis import PeriodQueryEngine, build_attribution_cube
+from config.settings import CLASSIFICATION_CRITERIA
+from utils.instrumentation import record_stage
 from .model_registry import (
     MODEL_REGISTRY,
     CONTRIBUTION_REGISTRY,
     SMOOTHING_REGISTRY,
     CONTRIBUTION_SMOOTHING,
-    MEASUREMENT_REGISTRY
+    MEASUREMENT_REGISTRY,
+    PERIOD_LINKING,
+    FIXED_INCOME_MODELS,
+    model_effects
 )
 
 
-def run_analysis(settings, portfolio_df, benchmark_df, classifications_df, classification_criteria):
+def prepare_cube(settings, portfolio_df, benchmark_df, classifications_df):
+    """
+    Prepare the attribution cube for the portfolios, benchmark and date range of the settings.
+
+    The cube only depends on this selection, so it can be reused when the model, the smoothing
+    algorithm or the classification criteria change.
+    """
+    with record_stage("prepare_data") as stage:
+        cube = build_attribution_cube(
+            settings['portfolios'],
+            settings['benchmark'],
+            portfolio_df,
+            benchmark_df,
+            classifications_df,
+            settings['start_date'],
+            settings['end_date']
+        )
+        stage.rows = cube.n_rows
+    return cube
+
+
+def run_analysis(settings, portfolio_df, benchmark_df, classifications_df, classification_criteria, cube=None):
     """
     Run the analysis based on user settings.
 
@@ -21,48 +50,47 @@ def run_analysis(settings, portfolio_df, benchmark_df, classifications_df, class
         benchmark_df: Benchmark data DataFrame
         classifications_df: Classifications data DataFrame
         classification_criteria: Selected classification criteria
+        cube: Optional AttributionCube already prepared for the settings selection
 
     Returns:
         Tuple of (master_df, instrument_function) where instrument_function
         can be called to get instrument-level details
     """
-    # Prepare the data
-    data_df = prepare_data(
-        settings['portfolios'],
-        settings['benchmark'],
-        portfolio_df,
-        benchmark_df,
-        classifications_df,
-        settings['start_date'],
-        settings['end_date']
-    )
+    # Prepare the data, unless a cube for the same selection is provided
+    if cube is None:
+        cube = prepare_cube(settings, portfolio_df, benchmark_df, classifications_df)
 
     if settings['analysis_type'] == "Contribution":
         master_df, instrument_func = _run_contribution_analysis(
-            data_df,
+            cube,
             classification_criteria
         )
     elif settings['analysis_type'] == "Measurement & Analytics":
         # Run measurement & analytics using the registry
         frequency = settings.get('frequency', 'daily')
-        master_df = MEASUREMENT_REGISTRY["master"](
-            data_df,
-            classification_criteria=None,
-            frequency=frequency
-        )
-        # Create an instruments-style function (to keep the same interface as other analyses)
-        def get_instruments(classification_value=None):
-            return MEASUREMENT_REGISTRY["instrument"](
-                data_df,
-                classification_criteria,
-                classification_value,
+        with record_stage("measurement master") as stage:
+            master_df = MEASUREMENT_REGISTRY["master"](
+                cube,
+                classification_criteria=None,
                 frequency=frequency
             )
+            stage.rows = len(master_df)
+        # Create an instruments-style function (to keep the same interface as other analyses)
+        def get_instruments(classification_value=None):
+            with record_stage("measurement instruments") as stage:
+                instruments_df = MEASUREMENT_REGISTRY["instrument"](
+                    cube,
+                    classification_criteria,
+                    classification_value,
+                    frequency=frequency
+                )
+                stage.rows = len(instruments_df)
+            return instruments_df
 
         instrument_func = get_instruments
     else:
         master_df, instrument_func = _run_attribution_analysis(
-            data_df,
+            cube,
             classification_criteria,
             settings['model'],
             settings['smoothing'],
@@ -72,16 +100,205 @@ def run_analysis(settings, portfolio_df, benchmark_df, classifications_df, class
     return master_df, instrument_func
 
 
+def run_all_criteria(settings, portfolio_df, benchmark_df, classifications_df, cube=None):
+    """
+    Run the attribution or contribution analysis for every classification criteria of the asset class.
+
+    The instrument rows are reduced once per criteria in a single pass over the cube, so the
+    returned results can be cached and switching the criteria becomes a dictionary lookup.
+
+    Returns:
+        Dictionary {classification_criteria: (master_df, instrument_function)}
+    """
+    if cube is None:
+        cube = prepare_cube(settings, portfolio_df, benchmark_df, classifications_df)
+
+    def run_criteria(classification_criteria):
+        with record_stage(f"criteria {classification_criteria}"):
+            return run_analysis(settings, portfolio_df, benchmark_df, classifications_df, classification_criteria, cube=cube)
+
+    return _for_each_criteria(settings, cube, run_criteria)
+
+
+def run_rolling_analytics(settings, portfolio_df, benchmark_df, classifications_df, cube=None):
+    """
+    Run the rolling window risk analytics of the Measurement & Analytics analysis.
+
+    Returns:
+        DataFrame with one row per rolling window and date, see analysis.rolling_risk_analytics
+    """
+    if cube is None:
+        cube = prepare_cube(settings, portfolio_df, benchmark_df, classifications_df)
+
+    with record_stage("rolling risk analytics") as stage:
+        rolling_df = MEASUREMENT_REGISTRY["rolling"](cube, frequency=settings.get('frequency', 'daily'))
+        stage.rows = len(rolling_df)
+    return rolling_df
+
+
+def build_period_engines(settings, cube, period_ends):
+    """
+    Period query engines of the attribution or contribution analysis, for every classification criteria.
+
+    The cube holds the full history of the settings selection. Per-period effects are computed once on
+    it, in the same single pass over every criteria as run_all_criteria, the linked results of any
+    performance period are then queried from the engines without preparing the data or running the
+    model again.
+
+    Args:
+        settings: Dictionary containing user selections, the dates are not used
+        cube: AttributionCube of the full history
+        period_ends: End Date of every Start Date, from analysis.period_end_dates
+
+    Returns:
+        Dictionary {classification_criteria: (master_engine, instrument_engine_function)} where
+        instrument_engine_function returns the engine of a classification value's instruments
+    """
+    if settings['analysis_type'] == "Contribution":
+        linking = "contribution"
+        model_funcs = CONTRIBUTION_REGISTRY
+        instrument_args = ()
+    else:
+        linking = PERIOD_LINKING[settings['smoothing']]
+        model_funcs = MODEL_REGISTRY[settings['model']]
+        instrument_args = _instrument_args(settings['model'], settings.get('effects', None))
+
+    def build_engines(classification_criteria):
+        with record_stage(f"period engine {classification_criteria}") as stage:
+            if settings['analysis_type'] == "Contribution":
+                with record_stage("contribution master"):
+                    master_df = CONTRIBUTION_REGISTRY["master"](cube, classification_criteria)
+            else:
+                master_df = _attribution_master(cube, classification_criteria, settings['model'], settings.get('effects', None))
+            master_engine = PeriodQueryEngine(master_df, classification_criteria, linking, period_ends)
+            stage.rows = len(master_df)
+
+        # Engines of the drill-downs, built for all classification values on the first call
+        def compute_instruments(classification_value):
+            instruments_df = model_funcs["instrument"](cube, classification_criteria, classification_value, *instrument_args)
+            return PeriodQueryEngine(instruments_df, "Product description", linking, period_ends)
+
+        def compute_all_instruments():
+            instruments_by_value = model_funcs["all_instruments"](cube, classification_criteria, *instrument_args)
+            return {
+                classification_value: PeriodQueryEngine(instruments_df, "Product description", linking, period_ends)
+                for classification_value, instruments_df in instruments_by_value.items()
+            }
+
+        return master_engine, _drill_down_lookup(compute_all_instruments, compute_instruments)
+
+    return _for_each_criteria(settings, cube, build_engines)
+
+
+def _for_each_criteria(settings, cube, run_criteria):
+    # Single pass over the cube for every criteria of the asset class: the segment sums of all criteria are
+    # reduced first, each criteria then only reads its own
+    criteria_list = CLASSIFICATION_CRITERIA[settings['asset_class']]
+    cube.precompute_segment_sums(criteria_list)
+    return {classification_criteria: run_criteria(classification_criteria) for classification_criteria in criteria_list}
+
+
+def run_comparison(settings, portfolio_df, benchmark_df, classifications_df, classification_criteria,
+                   combinations, cube=None, max_workers=None):
+    """
+    Compare attribution models and smoothing algorithms side by side on the same data.
+
+    The data is prepared once. The master of every model is computed once and smoothed with each of its
+    smoothing algorithms, all of them concurrently in a thread pool: the models share the cube, whose
+    segment sums are computed beforehand, and most of their work is in numpy and pandas.
+
+    Args:
+        settings: Dictionary containing user selections, model and smoothing are not used
+        portfolio_df: Portfolio data DataFrame
+        benchmark_df: Benchmark data DataFrame
+        classifications_df: Classifications data DataFrame
+        classification_criteria: Selected classification criteria
+        combinations: List of (model, smoothing) pairs, the first one is the reference of the differences
+        cube: Optional AttributionCube already prepared for the settings selection
+        max_workers: Number of threads, defaults to one per task
+
+    Returns:
+        Tuple of (comparison_df, results) where comparison_df has one row per classification value (Total
+        first), the effects of every combination as "<effect> [<model> / <smoothing>]" columns and their
+        differences with the reference combination as "<effect> diff [<model> / <smoothing>]" columns,
+        and results maps each (model, smoothing) pair to its master_df
+    """
+    if not combinations:
+        raise ValueError("No model and smoothing combination to compare")
+    combinations = list(dict.fromkeys(combinations))
+
+    if cube is None:
+        cube = prepare_cube(settings, portfolio_df, benchmark_df, classifications_df)
+    cube.precompute_segment_sums([classification_criteria])
+
+    models = list(dict.fromkeys(model for model, _ in combinations))
+    with record_stage("comparison") as stage, ThreadPoolExecutor(max_workers=max_workers or len(combinations)) as executor:
+        # Unsmoothed master of every model, then one smoothing task per combination waiting for its master.
+        # The master tasks are queued first, so they are all running before a smoothing task waits on them.
+        # Each task runs in a copy of the caller's context, where the stage recorder of the run is active.
+        master_futures = {
+            model: executor.submit(contextvars.copy_context().run, _attribution_master, cube, classification_criteria,
+                                   model, model_effects(model, settings.get('effects', None)))
+            for model in models
+        }
+        smoothing_futures = {
+            (model, smoothing): executor.submit(contextvars.copy_context().run, _smooth_master, master_futures[model],
+                                                smoothing, classification_criteria)
+            for model, smoothing in combinations
+        }
+        results = {combination: future.result() for combination, future in smoothing_futures.items()}
+        stage.rows = sum(len(master_df) for master_df in results.values())
+
+    return _comparison_table(results, classification_criteria), results
+
+
+def _smooth_master(master_future, smoothing, classification_criteria):
+    master_df = master_future.result()
+    with record_stage(f"{smoothing} smoothing") as stage:
+        master_df = SMOOTHING_REGISTRY[smoothing](master_df, classification_criteria)
+        stage.rows = len(master_df)
+    return master_df
+
+
+def _comparison_table(results, classification_criteria):
+    # Align the results on the classification values and add the differences with the first combination
+    labelled = []
+    for (model, smoothing), master_df in results.items():
+        label = f"{model} / {smoothing}"
+        labelled.append((label, master_df.rename(columns={
+            col: f"{col} [{label}]" for col in master_df.columns if col != classification_criteria
+        })))
+
+    # Rows keep the order of the first result (Total first), values missing from it come last
+    comparison_df = pd.concat([master_df.set_index(classification_criteria) for _, master_df in labelled],
+                              axis=1, sort=False).reset_index()
+
+    reference_label = labelled[0][0]
+    reference_df = next(iter(results.values()))
+    for label, _ in labelled[1:]:
+        for col in reference_df.columns:
+            column = f"{col} [{label}]"
+            if col == classification_criteria or column not in comparison_df.columns:
+                continue
+            comparison_df[f"{col} diff [{label}]"] = comparison_df[column] - comparison_df[f"{col} [{reference_label}]"]
+
+    return comparison_df
+
+
 def _run_contribution_analysis(data_df, classification_criteria):
     """
     Run contribution analysis.
     """
     # Run master-level analysis
-    master_df = CONTRIBUTION_REGISTRY["master"](data_df, classification_criteria)
-    master_df = CONTRIBUTION_SMOOTHING(master_df, classification_criteria)
+    with record_stage("contribution master") as stage:
+        master_df = CONTRIBUTION_REGISTRY["master"](data_df, classification_criteria)
+        stage.rows = len(master_df)
+    with record_stage("contribution smoothing") as stage:
+        master_df = CONTRIBUTION_SMOOTHING(master_df, classification_criteria)
+        stage.rows = len(master_df)
 
-    # Create instrument-level function
-    def get_instruments(classification_value):
+    # Create instrument-level function, the drill-downs of all classification values are computed on the first call
+    def compute_instruments(classification_value):
         instruments_df = CONTRIBUTION_REGISTRY["instrument"](
             data_df,
             classification_criteria,
@@ -89,7 +306,14 @@ def _run_contribution_analysis(data_df, classification_criteria):
         )
         return CONTRIBUTION_SMOOTHING(instruments_df, "Product description")
 
-    return master_df, get_instruments
+    def compute_all_instruments():
+        instruments_by_value = CONTRIBUTION_REGISTRY["all_instruments"](data_df, classification_criteria)
+        return {
+            classification_value: CONTRIBUTION_SMOOTHING(instruments_df, "Product description")
+            for classification_value, instruments_df in instruments_by_value.items()
+        }
+
+    return master_df, _drill_down_lookup(compute_all_instruments, compute_instruments)
 
 
 def _run_attribution_analysis(data_df, classification_criteria, model, smoothing, effects=None):
@@ -100,41 +324,90 @@ def _run_attribution_analysis(data_df, classification_criteria, model, smoothing
     model_funcs = MODEL_REGISTRY[model]
 
     # Run master-level analysis
-    if model == "Standard fixed income attribution":
-        master_df = model_funcs["master"](data_df, classification_criteria, effects, credit_mode="standard")
-    elif model == "with Brinson Fachler on credit (POC)":
-        master_df = model_funcs["master"](data_df, classification_criteria, effects, credit_mode="brinson")
-    else:
-        master_df = model_funcs["master"](data_df, classification_criteria)
+    master_df = _attribution_master(data_df, classification_criteria, model, effects)
 
     # Apply smoothing
     smoothing_func = SMOOTHING_REGISTRY[smoothing]
-    master_df = smoothing_func(master_df, classification_criteria)
+    with record_stage(f"{smoothing} smoothing") as stage:
+        master_df = smoothing_func(master_df, classification_criteria)
+        stage.rows = len(master_df)
 
-    # Create instrument-level function
-    def get_instruments(classification_value):
-        if model in ("Standard fixed income attribution", "with Brinson Fachler on credit (POC)"):
-            # Normalize effects: map display names back to actual column names for instruments
-            effects_normalized = None
-            if effects is not None:
-                effects_normalized = list(dict.fromkeys([
-                    "Credit" if effect in ["Credit allocation", "Credit selection"] else effect
-                    for effect in effects
-                ]))
-            instruments_df = model_funcs["instrument"](
-                data_df,
-                classification_criteria,
-                classification_value,
-                effects_normalized
-            )
-        else:
-            instruments_df = model_funcs["instrument"](
-                data_df,
-                classification_criteria,
-                classification_value
-            )
+    instrument_args = _instrument_args(model, effects)
+
+    # Create instrument-level function, the drill-downs of all classification values are computed on the first call
+    def compute_instruments(classification_value):
+        instruments_df = model_funcs["instrument"](
+            data_df,
+            classification_criteria,
+            classification_value,
+            *instrument_args
+        )
 
         # Apply smoothing to instruments
         return smoothing_func(instruments_df, "Product description")
 
-    return master_df, get_instruments
+    def compute_all_instruments():
+        instruments_by_value = model_funcs["all_instruments"](data_df, classification_criteria, *instrument_args)
+        # Smoothing is applied per classification value, on the dates of its instruments
+        return {
+            classification_value: smoothing_func(instruments_df, "Product description")
+            for classification_value, instruments_df in instruments_by_value.items()
+        }
+
+    return master_df, _drill_down_lookup(compute_all_instruments, compute_instruments)
+
+
+def _attribution_master(data_df, classification_criteria, model, effects=None):
+    """
+    Per-period effects of the attribution model, before smoothing.
+    """
+    model_funcs = MODEL_REGISTRY[model]
+    with record_stage(f"{model} master") as stage:
+        if model == "Standard fixed income attribution":
+            master_df = model_funcs["master"](data_df, classification_criteria, effects, credit_mode="standard")
+        elif model == "with Brinson Fachler on credit (POC)":
+            master_df = model_funcs["master"](data_df, classification_criteria, effects, credit_mode="brinson")
+        else:
+            master_df = model_funcs["master"](data_df, classification_criteria)
+        stage.rows = len(master_df)
+    return master_df
+
+
+def _instrument_args(model, effects=None):
+    """
+    Extra arguments of the instrument-level function of the attribution model.
+    """
+    # Normalize effects: map display names back to actual column names for instruments
+    effects_normalized = None
+    if effects is not None:
+        effects_normalized = list(dict.fromkeys([
+            "Credit" if effect in ["Credit allocation", "Credit selection"] else effect
+            for effect in effects
+        ]))
+    if model in FIXED_INCOME_MODELS:
+        return (effects_normalized,)
+    return ()
+
+
+def _drill_down_lookup(compute_all_instruments, compute_instruments):
+    """
+    Instrument-level function backed by the drill-downs of every classification value.
+
+    They are computed in one grouped pass on the first call, later calls are dictionary lookups.
+    Values without instruments fall back to compute_instruments.
+    """
+    drill_downs = {}
+
+    def get_instruments(classification_value):
+        if not drill_downs:
+            with record_stage("drill-down, all values") as stage:
+                drill_downs.update(compute_all_instruments())
+                stage.rows = sum(len(instruments_df) for instruments_df in drill_downs.values())
+        if classification_value in drill_downs:
+            return drill_downs[classification_value]
+        with record_stage("drill-down") as stage:
+            instruments_df = compute_instruments(classification_value)
+            stage.rows = len(instruments_df)
+        return instruments_df
+
+    return get_instruments
@@ -0,0 +1,116 @@
+"""
+Background execution of the analysis runs of the Streamlit sessions.
+
+Runs are submitted to a thread pool shared by all sessions, so that the script of a session only waits
+for its run and can be interrupted by any widget change. Each session keeps its current run in its
+session state: a run with the same key is reused across reruns, and a run with another key (the settings
+changed mid-run) cancels the previous one. Cancellation stops a run at the start of its next pipeline
+stage (utils.instrumentation.record_stage), and the progress of a run is the stage it is in.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from config.settings import ANALYSIS_WORKERS
+from utils.instrumentation import StageRecorder, instrumented_run
+
+ANALYSIS_EXECUTOR = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+
+# Session state key of the current run of a session
+RUN_STATE_KEY = 'analysis_run'
+
+
+class AnalysisCancelled(Exception):
+    """
+    Raised in a background run cancelled by its session.
+    """
+
+
+class ProgressRecorder(StageRecorder):
+    """
+    Stage recorder of a background run, tracking the current stage and checking for cancellation.
+    """
+
+    def __init__(self, trace_memory=False):
+        super().__init__(trace_memory)
+        self.cancelled = threading.Event()
+        self.current_stage = None
+        self.completed_stages = 0
+
+    @contextmanager
+    def stage(self, name):
+        if self.cancelled.is_set():
+            raise AnalysisCancelled(name)
+        self.current_stage = name
+        with super().stage(name) as stage:
+            yield stage
+        self.completed_stages += 1
+
+
+class BackgroundRun:
+    """
+    Analysis run of a session in the background executor, with its stage records and optional profile.
+    """
+
+    def __init__(self, key, func, trace_memory=False, profile_dir=None):
+        self.key = key
+        self.recorder = ProgressRecorder(trace_memory)
+        self.profile = None
+        self.started = time.perf_counter()
+        self.future = ANALYSIS_EXECUTOR.submit(self._run, func, profile_dir)
+
+    def _run(self, func, profile_dir):
+        with instrumented_run(profile_dir=profile_dir, recorder=self.recorder) as (_, profile):
+            self.profile = profile
+            return func()
+
+    def cancel(self):
+        self.recorder.cancelled.set()
+        self.future.cancel()
+
+    def cancelled(self):
+        return self.recorder.cancelled.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+    def progress_text(self):
+        stage = self.recorder.current_stage or "waiting for a worker"
+        return f"Running analysis: {stage} ({self.recorder.completed_stages} stages done, {time.perf_counter() - self.started:.1f} s)"
+
+
+def session_run(session_state, key, func, trace_memory=False, profile_dir=None):
+    """
+    Current run of the session for key, submitted if the session has no run for this key.
+
+    A previous run of the session for another key is cancelled. A finished run is kept, with its result
+    or error, until the key changes or it is discarded.
+    """
+    run = session_state.get(RUN_STATE_KEY)
+    if run is not None and run.key == key:
+        return run
+    if run is not None:
+        run.cancel()
+    run = BackgroundRun(key, func, trace_memory, profile_dir)
+    session_state[RUN_STATE_KEY] = run
+    return run
+
+
+def cancel_run(session_state):
+    """
+    Cancel the current run of the session, it stops at the start of its next stage.
+    """
+    run = session_state.get(RUN_STATE_KEY)
+    if run is not None:
+        run.cancel()
+
+
+def discard_run(session_state):
+    """
+    Forget the current run of the session, so that the next session_run submits it again.
+    """
+    cancel_run(session_state)
+    session_state.pop(RUN_STATE_KEY, None)
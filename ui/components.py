@@ -11,7 +11,9 @@ from config.settings import (
     FIXED_INCOME_EFFECTS,
     CUSTOM_DATE_DEFAULTS
 )
-from utils import style_dataframe, dataframe_height
+from utils import style_dataframe, dataframe_height, page_rows, page_count
+from utils.instrumentation import StageRecorder, record_stage
+from .analysis_cache import get_analysis_results, get_rolling_analytics
 
 
 def render_settings(portfolio_df, benchmark_df, data_source_toggle):
@@ -58,7 +60,7 @@ def render_settings(portfolio_df, benchmark_df, data_source_toggle):
 
         settings['smoothing'] = settings_row1[4].pills(
             "Smoothing algorithm",
-            ["Frongello", "Modified Frongello"],
+            ["Frongello", "Modified Frongello", "Carino", "Menchero"],
             default="Frongello"
         )
     else:
@@ -147,21 +149,11 @@ def render_analysis_results(master_df, details_df, classification_criteria, deci
 
     # Render master analysis
     analysis_master_row[1].markdown("**Performance analysis:**")
-    analysis_master_row[1].dataframe(
-        style_dataframe(master_df, decimal_places),
-        hide_index=True,
-        width=1000,
-        height=dataframe_height(master_df)
-    )
+    render_dataframe(analysis_master_row[1], master_df, decimal_places, key='master_page')
 
     # Render details analysis
     analysis_details_row[1].markdown("**Instruments details:**")
-    analysis_details_row[1].dataframe(
-        style_dataframe(details_df, decimal_places),
-        hide_index=True,
-        width=1000,
-        height=dataframe_height(details_df)
-    )
+    render_dataframe(analysis_details_row[1], details_df, decimal_places, key='details_page')
 
     return classification_value
 
@@ -182,3 +174,163 @@ def render_classification_selector_with_results(master_df, classification_criter
     )
 
     return classification_value
+
+
+@st.fragment
+def render_attribution_results(settings, portfolio_df, benchmark_df, classifications_df):
+    """
+    Render the attribution or contribution results: decimal places, allocation criteria and master table.
+
+    The fragment reruns on its own when the decimal places or the criteria change, the results of every
+    criteria being cached by the run of the settings. The drill-down is a nested fragment.
+    """
+    analysis_master_row = st.columns([0.25, 0.75])
+    decimal_places = analysis_master_row[0].segmented_control("Decimal places", [2, 4, 8, 12], default=2, key='decimal_places')
+    classification_criteria = analysis_master_row[0].radio(
+        "Allocation criteria",
+        CLASSIFICATION_CRITERIA[settings['asset_class']],
+        key="classification_criteria"
+    )
+
+    with record_stage("cached results") as stage:
+        master_df, get_instruments = get_analysis_results(
+            settings,
+            portfolio_df,
+            benchmark_df,
+            classifications_df,
+            classification_criteria
+        )
+        stage.rows = len(master_df)
+
+    analysis_master_row[1].markdown("**Performance analysis:**")
+    with record_stage("render master") as stage:
+        render_dataframe(analysis_master_row[1], master_df, decimal_places, key='master_page')
+        stage.rows = len(master_df)
+
+    classification_values = [
+        val for val in master_df[classification_criteria].to_list()
+        if val not in ["Total"]
+    ]
+    render_instrument_details(get_instruments, classification_criteria, classification_values, decimal_places)
+
+
+@st.fragment
+def render_instrument_details(get_instruments, classification_criteria, classification_values, decimal_places):
+    """
+    Render the drill-down of a classification value, rerun on its own when the value changes.
+    """
+    analysis_details_row = st.columns([0.25, 0.75])
+    classification_value = analysis_details_row[0].radio(
+        f"Select a {classification_criteria}:",
+        classification_values,
+        key="classification_value"
+    )
+
+    with record_stage("instruments details") as stage:
+        details_df = get_instruments(classification_value)
+        stage.rows = len(details_df)
+
+    analysis_details_row[1].markdown("**Instruments details:**")
+    with record_stage("render details") as stage:
+        render_dataframe(analysis_details_row[1], details_df, decimal_places, key='details_page')
+        stage.rows = len(details_df)
+
+
+@st.fragment
+def render_measurement_results(settings, portfolio_df, benchmark_df, classifications_df):
+    """
+    Render the return chart, the measurement analytics and the rolling risk analytics, rerun on its own
+    when the decimal places, rolling window or metric change.
+    """
+    analysis_master_row = st.columns([0.25, 0.75])
+    analysis_details_row = st.columns([0.25, 0.75])
+    analysis_rolling_row = st.columns([0.25, 0.75])
+    decimal_places = analysis_master_row[0].segmented_control("Decimal places", [2, 4, 8, 12], default=2, key='decimal_places')
+
+    with record_stage("cached results") as stage:
+        master_df, get_instruments = get_analysis_results(settings, portfolio_df, benchmark_df, classifications_df, None)
+        stage.rows = len(master_df)
+
+    analysis_master_row[1].markdown("**Return vs Benchmark chart**")
+    analysis_master_row[1].line_chart(master_df.set_index("Date"))
+
+    analysis_details_row[1].markdown("**Measurement analytics:**")
+    with record_stage("instruments details") as stage:
+        details_df = get_instruments(None)
+        stage.rows = len(details_df)
+    with record_stage("render details") as stage:
+        render_dataframe(analysis_details_row[1], details_df, decimal_places, key='details_page')
+        stage.rows = len(details_df)
+
+    analysis_rolling_row[1].markdown("**Rolling risk analytics:**")
+    with record_stage("rolling analytics") as stage:
+        rolling_df = get_rolling_analytics(settings, portfolio_df, benchmark_df, classifications_df)
+        stage.rows = len(rolling_df)
+    windows = list(dict.fromkeys(rolling_df["Window"]))
+    if not windows:
+        analysis_rolling_row[1].info("The analysed period has fewer periods than the shortest rolling window.")
+        return
+    window = analysis_rolling_row[0].segmented_control("Rolling window", windows, default=windows[0], key='rolling_window')
+    if window not in windows:
+        window = windows[0]
+    metrics = [col for col in rolling_df.columns if col not in ("Window", "Date")]
+    metric = analysis_rolling_row[0].selectbox("Rolling metric", metrics, key='rolling_metric')
+
+    window_df = rolling_df[rolling_df["Window"] == window].drop(columns="Window").reset_index(drop=True)
+    analysis_rolling_row[1].line_chart(window_df.set_index("Date")[[metric]])
+    with record_stage("render rolling analytics") as stage:
+        render_dataframe(analysis_rolling_row[1], window_df, decimal_places, key=f'rolling_page_{window}')
+        stage.rows = len(window_df)
+
+
+def render_dataframe(column, df, decimal_places, key):
+    """
+    Render a result table in column, page by page when it has more than STYLED_ROWS_LIMIT rows so that
+    only the displayed page is styled.
+    """
+    n_pages = page_count(df)
+    page_df = df
+    if n_pages > 1:
+        # The key includes the row count, so that another table starts on its first page
+        page = column.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1,
+                                   key=f"{key}_{len(df)}")
+        first, stop = page_rows(df, page)
+        column.caption(f"Rows {first + 1} to {stop} of {len(df)}")
+        page_df = df.iloc[first:stop]
+    column.dataframe(
+        style_dataframe(page_df, decimal_places, first_label=df.index[0] if len(df.index) else None),
+        hide_index=True,
+        width=1000,
+        height=dataframe_height(page_df)
+    )
+
+
+def render_debug_panel(stage_recorder, run_profile, render_recorder=None):
+    """
+    Render the performance debug panel: switches for the instrumentation of the next runs, stage
+    timings of the current run (analysis stages of the background run, then the rendering stages of
+    the script run in render_recorder) with their JSON/CSV export, and the saved profile.
+    """
+    with st.expander("Performance debug"):
+        switches = st.columns(3)
+        switches[0].toggle("Record stage timings", key='debug_timings')
+        switches[1].toggle("Trace memory (slower)", key='debug_trace_memory')
+        switches[2].toggle("Profile the run", key='debug_profile')
+
+        if stage_recorder is not None and render_recorder is not None:
+            # Timings of both recorders, exported together
+            merged_recorder = StageRecorder(stage_recorder.trace_memory)
+            merged_recorder.records = stage_recorder.records + render_recorder.records
+            stage_recorder = merged_recorder
+        if stage_recorder is not None:
+            timings_df = stage_recorder.to_frame()
+            # Indent nested stages
+            timings_df["stage"] = [" " * depth + stage for depth, stage in zip(timings_df["depth"], timings_df["stage"])]
+            st.dataframe(timings_df.drop(columns="depth"), hide_index=True, width=1000)
+            exports = st.columns(6)
+            exports[0].download_button("Timings JSON", stage_recorder.to_json(), "stage_timings.json", "application/json")
+            exports[1].download_button("Timings CSV", stage_recorder.to_csv(), "stage_timings.csv", "text/csv")
+
+        if run_profile is not None:
+            st.markdown(f"Profile saved to `{run_profile.path}`")
+            st.code(run_profile.summary)
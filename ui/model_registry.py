@@ -3,52 +3,95 @@ Model registry for attribution and contribution analysis.
 """
 
 from analysis import (
-    brinson_fachler,
-    brinson_fachler_instrument,
-    brinson_hood_beebower,
-    brinson_hood_beebower_instrument,
-    effects_analysis,
-    effects_analysis_instrument,
+    brinson_fachler_vectorized,
+    brinson_fachler_instrument_vectorized,
+    brinson_fachler_instrument_all_segments,
+    brinson_hood_beebower_vectorized,
+    brinson_hood_beebower_instrument_vectorized,
+    brinson_hood_beebower_instrument_all_segments,
+    effects_analysis_vectorized,
+    effects_analysis_instrument_vectorized,
+    effects_analysis_instrument_all_segments,
     contribution,
     contribution_instrument,
+    contribution_instrument_all_segments,
     grap_smoothing,
-    modified_frongello_smoothing,
+    modified_frongello_smoothing_vectorized,
+    carino_smoothing,
+    menchero_smoothing,
     contribution_smoothing,
     measurement_analytics_master,
-    measurement_analytics_instrument
+    measurement_analytics_instrument,
+    rolling_risk_analytics
 )
+from config.settings import FIXED_INCOME_EFFECTS
 
 # Attribution model registry
-# Structure: {model_name: (master_function, instrument_function)}
+# Structure: {model_name: {"master": master_function, "instrument": instrument_function,
+#                          "all_instruments": instrument function for every classification value at once}}
 MODEL_REGISTRY = {
     "Brinson-Fachler": {
-        "master": brinson_fachler,
-        "instrument": brinson_fachler_instrument
+        "master": brinson_fachler_vectorized,
+        "instrument": brinson_fachler_instrument_vectorized,
+        "all_instruments": brinson_fachler_instrument_all_segments
     },
     "Brinson-Hood-Beebower": {
-        "master": brinson_hood_beebower,
-        "instrument": brinson_hood_beebower_instrument
+        "master": brinson_hood_beebower_vectorized,
+        "instrument": brinson_hood_beebower_instrument_vectorized,
+        "all_instruments": brinson_hood_beebower_instrument_all_segments
     },
     "Standard fixed income attribution": {
-        "master": effects_analysis,
-        "instrument": effects_analysis_instrument
+        "master": effects_analysis_vectorized,
+        "instrument": effects_analysis_instrument_vectorized,
+        "all_instruments": effects_analysis_instrument_all_segments
     },
     "with Brinson Fachler on credit (POC)": {
-        "master": effects_analysis,
-        "instrument": effects_analysis_instrument
+        "master": effects_analysis_vectorized,
+        "instrument": effects_analysis_instrument_vectorized,
+        "all_instruments": effects_analysis_instrument_all_segments
     }
 }
 
+# Fixed income models, whose master and instrument functions take the effects to compute
+FIXED_INCOME_MODELS = ["Standard fixed income attribution", "with Brinson Fachler on credit (POC)"]
+
+
+def model_effects(model, effects=None):
+    """
+    Effects of an attribution model: the selected fixed income effects (the default ones when None), with
+    Credit split in allocation and selection for the Brinson credit model. Other models have no effects.
+    """
+    if model not in FIXED_INCOME_MODELS:
+        return effects
+    effects = list(FIXED_INCOME_EFFECTS["default"] if effects is None else effects)
+    credit_effects = ["Credit allocation", "Credit selection"] if model == "with Brinson Fachler on credit (POC)" else ["Credit"]
+    expanded_effects = []
+    for effect in effects:
+        expanded_effects.extend(credit_effects if effect in ("Credit", "Credit allocation", "Credit selection") else [effect])
+    return list(dict.fromkeys(expanded_effects))
+
+
 # Contribution analysis registry
 CONTRIBUTION_REGISTRY = {
     "master": contribution,
-    "instrument": contribution_instrument
+    "instrument": contribution_instrument,
+    "all_instruments": contribution_instrument_all_segments
 }
 
 # Smoothing algorithm registry
 SMOOTHING_REGISTRY = {
     "Frongello": grap_smoothing,
-    "Modified Frongello": modified_frongello_smoothing
+    "Modified Frongello": modified_frongello_smoothing_vectorized,
+    "Carino": carino_smoothing,
+    "Menchero": menchero_smoothing
+}
+
+# Linking method of the period query engine (analysis.PeriodQueryEngine) for each smoothing algorithm
+PERIOD_LINKING = {
+    "Frongello": "grap",
+    "Modified Frongello": "modified_frongello",
+    "Carino": "carino",
+    "Menchero": "menchero"
 }
 
 # Contribution smoothing function
@@ -57,5 +100,6 @@ CONTRIBUTION_SMOOTHING = contribution_smoothing
 # Measurement & Analytics registry
 MEASUREMENT_REGISTRY = {
     "master": measurement_analytics_master,
-    "instrument": measurement_analytics_instrument
+    "instrument": measurement_analytics_instrument,
+    "rolling": rolling_risk_analytics
 }
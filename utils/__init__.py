@@ -2,12 +2,23 @@
 Utility functions for CSV loading and dataframe styling.
 """
 
-from .csv_loading import load_csv_files, validate_dataframes
-from .styling import style_dataframe, dataframe_height
+from .ingestion import read_csv_cached
+from .styling import style_dataframe, dataframe_height, page_rows, page_count
 
 __all__ = [
     'load_csv_files',
     'validate_dataframes',
+    'read_csv_cached',
     'style_dataframe',
     'dataframe_height',
+    'page_rows',
+    'page_count',
 ]
+
+
+def __getattr__(name):
+    # Streamlit-based loading is imported on first use, so that headless callers (batch runner) do not need Streamlit
+    if name in ('load_csv_files', 'validate_dataframes'):
+        from . import csv_loading
+        return getattr(csv_loading, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used cache.
+
+    Streamlit runs every session in its own thread of the same process, so module-level caches are
+    shared by all sessions. Values are computed outside the lock: two sessions missing the same key at
+    the same time both compute it and the last one is kept.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ObjectHashes:
+    """
+    Hashes of live objects, such as the content hash of an input DataFrame.
+
+    DataFrames are not hashable, so entries are keyed by id and hold a weak reference to their object:
+    a hash is only returned for the object it was set for, never for a later object reusing its id nor
+    for frames derived from it, and the entry is dropped when the object is garbage collected.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, obj):
+        entry = self._entries.get(id(obj))
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+        return None
+
+    def set(self, obj, value):
+        key = id(obj)
+
+        def forget(ref):
+            # Only the entry of the collected object, the id may already be reused by another one
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is ref:
+                self._entries.pop(key, None)
+
+        self._entries[key] = (weakref.ref(obj, forget), value)
+
+    def get_or_compute(self, obj, compute):
+        value = self.get(obj)
+        if value is None:
+            value = compute()
+            self.set(obj, value)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def freeze(value):
+    """
+    Hashable version of a settings value (lists and dicts become tuples).
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, set):
+        return tuple(sorted(freeze(item) for item in value))
+    return value
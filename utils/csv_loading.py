@@ -1,17 +1,19 @@
 import streamlit as st
 import pandas as pd
+from analysis.classification_table import duplicated_classifications
+from .ingestion import read_csv_cached
 
 
 def load_csv_files(data_source, file_upload_row):
 
     classifications_file = "./data/classifications.csv"
-    classifications_df = pd.read_csv(classifications_file)
+    classifications_df = read_csv_cached(classifications_file)
 
     if data_source == "Use TPK data":
         portfolios_file = "./data/portfolios.csv"
         benchmarks_file = "./data/benchmarks.csv"
-        portfolios_df = pd.read_csv(portfolios_file)
-        benchmarks_df = pd.read_csv(benchmarks_file)
+        portfolios_df = read_csv_cached(portfolios_file)
+        benchmarks_df = read_csv_cached(benchmarks_file)
     else:
         portfolios_file = file_upload_row[0].file_uploader("portfolios.csv file",
                                                            help="File produced by the Performance service")
@@ -19,8 +21,8 @@ def load_csv_files(data_source, file_upload_row):
                                                            help="File produced by the Performance service")
 
         if portfolios_file is not None and benchmarks_file is not None:
-            portfolios_df = pd.read_csv(portfolios_file)
-            benchmarks_df = pd.read_csv(benchmarks_file)
+            portfolios_df = read_csv_cached(portfolios_file)
+            benchmarks_df = read_csv_cached(benchmarks_file)
         else:
             portfolios_df = pd.DataFrame()
             benchmarks_df = pd.DataFrame()
@@ -30,7 +32,7 @@ def load_csv_files(data_source, file_upload_row):
 
 
 
-def validate_dataframes(portfolios_df, benchmarks_df):
+def validate_dataframes(portfolios_df, benchmarks_df, classifications_df=None):
 
         correct_format = False
 
@@ -61,6 +63,14 @@ def validate_dataframes(portfolios_df, benchmarks_df):
                 st.stop()
             else:
                 correct_format = True
+
+            # Duplicated classifications don't stop the analysis, the first row of each product is used
+            duplicates = duplicated_classifications(classifications_df) if classifications_df is not None else []
+            if duplicates:
+                st.warning(
+                    f'⚠️ {len(duplicates)} products have several rows in classifications.csv, the first row of each '
+                    f'is used: {", ".join(f"{product} ({product_type})" for product, product_type in duplicates[:10])}'
+                    f'{", ..." if len(duplicates) > 10 else ""}')
         except Exception as e:
             st.error(f"Error reading file: {str(e)}")
             st.stop()
@@ -0,0 +1,160 @@
+"""
+Typed ingestion of the input csv files with a columnar on-disk cache.
+
+Files are parsed once with explicit dtypes: dates as datetime64, market values as float64 and
+instrument, taxonomy and portfolio/benchmark names as categoricals. The parsed DataFrame is written
+as a feather file, next to the csv for local files (invalidated by the csv mtime and size) and in
+INGESTION_CACHE_DIR for uploaded files (identified by their content hash). Later loads read the
+feather file and skip csv parsing. Without pyarrow the disk cache is skipped.
+"""
+import io
+import json
+import os
+import threading
+import pandas as pd
+from config.settings import INGESTION_CACHE_DIR
+from .caching import LRUCache, ObjectHashes, hash_bytes
+
+try:
+    import pyarrow  # noqa: F401 - required by DataFrame.to_feather / pd.read_feather
+    FEATHER_AVAILABLE = True
+except ImportError:
+    FEATHER_AVAILABLE = False
+
+# Bump when the parsing below changes, so that existing disk caches are not reused
+INGESTION_VERSION = 1
+
+MV_COLUMNS = ["DeltaMv", "PreviousMv", "DeltaMvPrice", "DeltaMvTrading", "DeltaMvCurrency", "DeltaMvGlobalOther",
+              "DeltaMvRolldown", "DeltaMvIncome", "DeltaMvYieldCurves", "DeltaMvCredit"]
+
+DATE_COLUMNS = ["Start Date", "End Date"]
+
+# Explicit dtypes of the known input columns, other columns are left to pandas
+INPUT_DTYPES = {
+    "Portfolio": "category",
+    "Benchmark": "category",
+    "Instrument": "category",
+    "ProductTaxonomy": "category",
+    **{column: "float64" for column in MV_COLUMNS}
+}
+
+# Parsed input files keyed by the hash of their content, shared by all sessions
+# The cached DataFrames are shared and must not be modified by callers
+PARSED_CSV_CACHE = LRUCache(max_entries=8)
+
+# Content hashes of the parsed DataFrames, only set for the DataFrames returned by read_csv_cached
+CONTENT_HASHES = ObjectHashes()
+
+
+def parse_csv(source):
+    """
+    Parse a csv file (path or file-like object) with the input dtypes.
+    """
+    df = pd.read_csv(source, dtype=INPUT_DTYPES)
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], format="%Y-%m-%d")
+    return df
+
+
+def read_csv_cached(file):
+    """
+    Read an input csv file (path or uploaded file), parsing it only if its content was not loaded before.
+
+    The content hash is stored in CONTENT_HASHES so that later cache tiers can key on it.
+    """
+    if isinstance(file, str):
+        content_hash, content = _file_content_hash(file)
+        cache_file = _local_cache_file(file)
+        # The csv content is only read when the sidecar does not match it, the cache file is then stale
+        cache_valid = content is None
+    else:
+        content = file.getvalue()
+        content_hash = hash_bytes(content)
+        cache_file = os.path.join(INGESTION_CACHE_DIR, f"{content_hash}.v{INGESTION_VERSION}.feather")
+        cache_valid = True
+
+    def load():
+        df = _read_cache_file(cache_file) if cache_valid else None
+        if df is None:
+            source = io.BytesIO(content) if content is not None else file
+            df = parse_csv(source)
+            _write_cache_file(df, cache_file)
+            if isinstance(file, str):
+                _write_sidecar(file, content_hash)
+        CONTENT_HASHES.set(df, content_hash)
+        return df
+
+    return PARSED_CSV_CACHE.get_or_compute(content_hash, load)
+
+
+def _local_cache_file(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.v{INGESTION_VERSION}.feather")
+
+
+def _sidecar_file(path):
+    return _local_cache_file(path) + ".json"
+
+
+def _file_content_hash(path):
+    # The sidecar stores the content hash of the csv with its mtime and size, the csv is only read when they changed
+    stat = os.stat(path)
+    try:
+        with open(_sidecar_file(path)) as f:
+            sidecar = json.load(f)
+        if sidecar["size"] == stat.st_size and sidecar["mtime_ns"] == stat.st_mtime_ns \
+                and os.path.exists(_local_cache_file(path)):
+            return sidecar["content_hash"], None
+    except (OSError, ValueError, KeyError):
+        pass
+
+    with open(path, "rb") as f:
+        content = f.read()
+    return hash_bytes(content), content
+
+
+def _write_sidecar(path, content_hash):
+    stat = os.stat(path)
+    sidecar = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "content_hash": content_hash}
+    try:
+        _atomic_write(_sidecar_file(path), lambda temp_file: _dump_json(sidecar, temp_file))
+    except OSError:
+        pass
+
+
+def _dump_json(data, file_path):
+    with open(file_path, "w") as f:
+        json.dump(data, f)
+
+
+def _read_cache_file(cache_file):
+    if not FEATHER_AVAILABLE or not os.path.exists(cache_file):
+        return None
+    try:
+        return pd.read_feather(cache_file)
+    except (OSError, ValueError):
+        # Unreadable or partially written cache, the csv is parsed again
+        return None
+
+
+def _write_cache_file(df, cache_file):
+    if not FEATHER_AVAILABLE:
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        _atomic_write(cache_file, df.to_feather)
+    except OSError:
+        # Read-only data directory: the files are parsed on every load
+        pass
+
+
+def _atomic_write(file_path, write):
+    # Write to a temporary file and rename it, so that concurrent readers never see a partial file
+    temp_file = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(temp_file)
+        os.replace(temp_file, file_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
@@ -0,0 +1,189 @@
+"""
+Per-stage timing and profiling instrumentation of the analysis pipeline.
+
+Pipeline code marks its stages with record_stage(name). Stages are only recorded inside a
+recording() block, which activates a StageRecorder for the current thread (every Streamlit session
+runs in its own thread); outside of it record_stage costs a context variable lookup. Each stage
+records its wall time, the row count set by the caller and, when memory tracing is enabled, the peak
+memory allocated during the stage (tracemalloc, which slows the run down).
+
+tracemalloc is process-wide: runs tracing memory are serialized by a process-wide lock, so that one run
+never resets the peak of or stops tracing for another. Allocations of the other threads (runs not
+tracing memory, concurrent tasks of the run) are still counted, the memory figures are only exact for a
+run alone in the process.
+
+profiling() wraps a run in cProfile and saves the profile file, to be read with pstats or snakeviz.
+"""
+import contextvars
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+import pandas as pd
+
+_ACTIVE_RECORDER = contextvars.ContextVar("active_stage_recorder", default=None)
+
+# (recorder, stage) of the innermost stage being recorded in the current context, the parent of the next stage
+_PARENT_STAGE = contextvars.ContextVar("parent_stage", default=(None, None))
+
+# Held by the run tracing memory, the others wait for it to finish
+_MEMORY_TRACING_LOCK = threading.RLock()
+
+RECORD_COLUMNS = ["stage", "depth", "seconds", "rows", "peak_mib"]
+
+
+class Stage:
+    """
+    A stage being recorded, the caller sets rows to the size of the stage output.
+    """
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.rows = None
+        # Highest traced memory of the nested stages, tracemalloc's peak is reset for each of them
+        self.nested_peak = 0
+
+
+class StageRecorder:
+    """
+    Records of the stages of one run, in the order they started.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        # Stages nest per context, so that tasks run in copies of the context (worker threads of a
+        # stage) record their stages under it
+        parent_recorder, parent = _PARENT_STAGE.get()
+        if parent_recorder is not self:
+            parent = None
+        stage = Stage(name, 0 if parent is None else parent.depth + 1)
+        record = {"stage": name, "depth": stage.depth, "seconds": None, "rows": None, "peak_mib": None}
+        self.records.append(record)
+
+        if self.trace_memory:
+            start_memory, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent.nested_peak = max(parent.nested_peak, peak)
+            tracemalloc.reset_peak()
+
+        token = _PARENT_STAGE.set((self, stage))
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            record["rows"] = stage.rows
+            _PARENT_STAGE.reset(token)
+
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], stage.nested_peak)
+                record["peak_mib"] = (peak - start_memory) / 2 ** 20
+                if parent is not None:
+                    parent.nested_peak = max(parent.nested_peak, peak)
+                tracemalloc.reset_peak()
+
+    def to_frame(self):
+        return pd.DataFrame(self.records, columns=RECORD_COLUMNS)
+
+    def to_json(self):
+        return json.dumps(self.records, indent=2)
+
+    def to_csv(self):
+        buffer = io.StringIO()
+        self.to_frame().to_csv(buffer, index=False)
+        return buffer.getvalue()
+
+
+@contextmanager
+def recording(trace_memory=False, recorder=None):
+    """
+    Record the stages of the block in recorder (a new StageRecorder by default), yields the recorder.
+
+    When the recorder traces memory, the block waits for the traced runs of other threads to finish.
+    """
+    if recorder is None:
+        recorder = StageRecorder(trace_memory)
+    with ExitStack() as stack:
+        if recorder.trace_memory:
+            stack.enter_context(_MEMORY_TRACING_LOCK)
+        started_tracing = recorder.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        token = _ACTIVE_RECORDER.set(recorder)
+        try:
+            yield recorder
+        finally:
+            _ACTIVE_RECORDER.reset(token)
+            if started_tracing:
+                tracemalloc.stop()
+
+
+@contextmanager
+def record_stage(name):
+    """
+    Record a stage of the pipeline in the active recorder, if any.
+
+    Yields a Stage whose rows attribute can be set to the size of the stage output.
+    """
+    recorder = _ACTIVE_RECORDER.get()
+    if recorder is None:
+        yield Stage(name, 0)
+        return
+    with recorder.stage(name) as stage:
+        yield stage
+
+
+class Profile:
+    """
+    Result of a profiled run: the path of the saved profile file and the top functions by cumulative time.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.summary = None
+
+
+@contextmanager
+def profiling(output_dir, top=30):
+    """
+    Profile the block with cProfile and save the profile file in output_dir, yields a Profile.
+    """
+    profile = Profile()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profile
+    finally:
+        profiler.disable()
+        os.makedirs(output_dir, exist_ok=True)
+        profile.path = os.path.join(output_dir, f"profile_{datetime.datetime.now():%Y%m%d_%H%M%S_%f}.prof")
+        profiler.dump_stats(profile.path)
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(top)
+        profile.summary = summary.getvalue()
+
+
+@contextmanager
+def instrumented_run(record=False, trace_memory=False, profile_dir=None, recorder=None):
+    """
+    Optionally record the stages and profile the block, yields (StageRecorder or None, Profile or None).
+
+    The stages are always recorded when a recorder is given.
+    """
+    with ExitStack() as stack:
+        if record or recorder is not None:
+            recorder = stack.enter_context(recording(trace_memory, recorder))
+        profile = stack.enter_context(profiling(profile_dir)) if profile_dir else None
+        yield recorder, profile
@@ -0,0 +1,190 @@
+"""
+Persistent store of analysis outputs shared by the sessions and processes of the app.
+
+Outputs are pickled in a SQLite database in WAL mode, so that readers never wait for a writer and
+several processes can read and write the store at the same time (writes are serialized by SQLite,
+waiting up to BUSY_TIMEOUT seconds for the lock). Keys are hashed with their repr, they must contain
+everything the output depends on: input content hashes, settings and the version of the analysis code.
+The store is bounded by size: after a write the least recently read or written entries are evicted.
+Reads only run a SELECT: the access times of the entries read are kept in memory and written with the
+next write, or at most every TOUCH_INTERVAL seconds without waiting for the lock.
+
+Store errors (read-only or full disk, lock timeouts, unreadable entries) are not raised: the output is
+computed as without a store.
+"""
+import glob
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from .caching import hash_bytes
+
+# Seconds a connection waits for the lock of another writer before giving up
+BUSY_TIMEOUT = 5.0
+
+# Seconds between two attempts to write the access times of the entries read, which only order the eviction
+TOUCH_INTERVAL = 30.0
+
+
+def source_hash(patterns):
+    """
+    Content hash of the source files matching the glob patterns, a version tag of the code that computes
+    the stored outputs: any change to these files changes the keys, so outputs of another version of the
+    code are never served.
+    """
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    contents = []
+    for path in paths:
+        with open(path, "rb") as f:
+            contents.append(os.path.basename(path).encode() + b"\0" + f.read())
+    return hash_bytes(b"\0".join(contents))
+
+
+class ResultStore:
+    """
+    Size-bounded persistent key-value store of analysis outputs, in a SQLite file at path.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        # Access times of the entries read since the last write of the access times
+        self._touched = {}
+        self._touch_lock = threading.Lock()
+        self._last_touch_write = time.monotonic()
+
+    def get_or_compute(self, key, compute):
+        """
+        Stored output of key, computed and stored if the store doesn't hold it.
+        """
+        store_key = self.hash_key(key)
+        value = self.get(store_key)
+        if value is not None:
+            return value
+        value = compute()
+        self.put(store_key, value)
+        return value
+
+    @staticmethod
+    def hash_key(key):
+        return hash_bytes(repr(key).encode())
+
+    def get(self, store_key):
+        """
+        Stored output of a hashed key, None if it isn't stored or can't be read.
+        """
+        try:
+            connection = self._connection()
+            row = connection.execute("SELECT value FROM results WHERE key = ?", (store_key,)).fetchone()
+            if row is None:
+                return None
+            value = pickle.loads(row[0])
+        except (sqlite3.Error, OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+        with self._touch_lock:
+            self._touched[store_key] = time.time()
+            write_touches = time.monotonic() - self._last_touch_write >= TOUCH_INTERVAL
+        if write_touches:
+            self._write_touches()
+        return value
+
+    def put(self, store_key, value):
+        """
+        Store the output of a hashed key, then evict the least recently used entries above max_bytes.
+        """
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_bytes:
+                return
+            connection = self._connection()
+            touched = self._take_touches()
+            try:
+                with connection:
+                    # Access times of the entries read, before the eviction that they order
+                    connection.executemany("UPDATE results SET last_access = MAX(last_access, ?) WHERE key = ?",
+                                           [(access, key) for key, access in touched.items()])
+                    connection.execute(
+                        "INSERT OR REPLACE INTO results (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                        (store_key, data, len(data), time.time())
+                    )
+                    self._evict(connection)
+            except sqlite3.Error:
+                self._restore_touches(touched)
+                raise
+        except (sqlite3.Error, OSError, pickle.PicklingError):
+            pass
+
+    def _write_touches(self):
+        # Write the access times without waiting: when another process holds the lock they are kept for later
+        touched = self._take_touches()
+        if not touched:
+            return
+        try:
+            connection = self._connection()
+            connection.execute("PRAGMA busy_timeout = 0")
+            try:
+                with connection:
+                    connection.executemany("UPDATE results SET last_access = MAX(last_access, ?) WHERE key = ?",
+                                           [(access, key) for key, access in touched.items()])
+            finally:
+                connection.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+        except (sqlite3.Error, OSError):
+            self._restore_touches(touched)
+
+    def _take_touches(self):
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._last_touch_write = time.monotonic()
+        return touched
+
+    def _restore_touches(self, touched):
+        with self._touch_lock:
+            for key, access in touched.items():
+                self._touched[key] = max(access, self._touched.get(key, access))
+
+    def total_bytes(self):
+        try:
+            return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        except (sqlite3.Error, OSError):
+            return 0
+
+    def clear(self):
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("DELETE FROM results")
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _evict(self, connection):
+        # Keep the most recently used entries within max_bytes, in the transaction of the write
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM results ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def _connection(self):
+        # One connection per thread: sqlite3 connections can't be shared by the session threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+            self._local.connection = connection
+        return connection
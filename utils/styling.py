@@ -1,39 +1,75 @@
-def style_dataframe(df, decimals):
+import math
+import numpy as np
+import pandas as pd
+from config.settings import STYLED_ROWS_LIMIT, DISPLAY_PAGE_SIZE, DATAFRAME_MAX_ROWS
 
+FIRST_ROW_STYLE = "background-color: rgba(248, 249, 251, 1);"
+
+
+def style_dataframe(df, decimals, first_label=None):
+    """
+    Percentage formatting of the numeric columns, first row background and red negative values.
+
+    first_label is the label of the highlighted first row, the first label of df by default (the first
+    label of the full table when df is one of its pages).
+    """
     # Create a dictionary that formats only float columns to the desired decimals
     format_dict = {}
     numeric_cols = df.select_dtypes(exclude="object").columns
     for col in numeric_cols:
         format_dict[col] = f"{{:.{decimals}%}}"
 
-    # Function to highlight the last row
-    def highlight_first_row(row):
-        # Check if row index is the last row in the DataFrame
-        if row.name == df.index[0]:
-            return ["background-color: rgba(248, 249, 251, 1);"] * len(row)
-        else:
-            return [""] * len(row)
-
-    # Function to apply red font for negative numeric values
-    def highlight_negative(val):
-        try:
-            # Attempt to convert to float and check if negative
-            val_float = float(val)
-            color = "red" if val_float < 0 else "black"
-        except ValueError:
-            # Handle non-numeric values
-            color = "black"
-        return f"color: {color}"
-
-    # Combine all styling in one chain
+    # Combine all styling in one chain, the styles of all cells being computed column by column
     styled = (
         df.style
           .format(format_dict)                   # Apply number formatting
-          .apply(highlight_first_row, axis=1)     # Highlight last row
-          .map(highlight_negative)
+          .apply(cell_styles, axis=None, first_label=first_label)  # Highlight first row and negative values
     )
     return styled
 
 
+def cell_styles(df, first_label=None):
+    """
+    CSS of every cell of df: red font for negative values and background of the first (Total) row.
+
+    Values are compared column by column, text columns being converted with pd.to_numeric so that
+    numeric text is highlighted as well.
+    """
+    colors = {}
+    for position, col in enumerate(df.columns):
+        values = df.iloc[:, position]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors="coerce")
+        colors[position] = np.where(values.to_numpy(dtype=float) < 0, "color: red", "color: black")
+    styles = pd.DataFrame(colors, index=df.index)
+    styles.columns = df.columns
+
+    if first_label is None and len(df.index):
+        first_label = df.index[0]
+    first_row = df.index == first_label
+    styles.loc[first_row] = FIRST_ROW_STYLE + styles.loc[first_row]
+    return styles
+
+
+def page_count(df):
+    """
+    Number of pages of DISPLAY_PAGE_SIZE rows of df, 1 when it has at most STYLED_ROWS_LIMIT rows and is styled in full.
+    """
+    if len(df.index) <= STYLED_ROWS_LIMIT:
+        return 1
+    return math.ceil(len(df.index) / DISPLAY_PAGE_SIZE)
+
+
+def page_rows(df, page):
+    """
+    Positions (first, stop) of the rows of page (starting at 1) of df, all rows when it is styled in full.
+    """
+    if page_count(df) == 1:
+        return 0, len(df.index)
+    first = (page - 1) * DISPLAY_PAGE_SIZE
+    return first, min(first + DISPLAY_PAGE_SIZE, len(df.index))
+
+
 def dataframe_height(df):
-    return (len(df.index) + 1) * 35 + 3
+    # Height of at most DATAFRAME_MAX_ROWS rows, longer tables scroll within the grid
+    return (min(len(df.index), DATAFRAME_MAX_ROWS) + 1) * 35 + 3